@@ -12,57 +12,50 @@ from py_noir_code.src.shanoir_object.dataset.dataset_service import find_dataset
 logger = get_logger()
 
 def generate_comete_moelle_json():
-    examinations = dict()
+    """ Yield the executions of every examination as soon as its datasets are found
+    :return:
+    """
     identifier = 0
-    executions = []
+    seen_exam_ids = set()
 
     exam_ids_to_exec = get_ids_from_file("ids_to_exec.txt", "r")
 
     logger.info("Getting datasets, building json content... ")
 
     for exam_id in exam_ids_to_exec:
+        # an examination listed twice is processed once
+        if exam_id in seen_exam_ids:
+            continue
+        seen_exam_ids.add(exam_id)
         datasets = find_datasets_by_examination_id(exam_id)
-
-        for dataset in datasets:
-            ds_id = dataset["id"]
-            study_id = dataset["studyId"]
-
-            if exam_id not in examinations:
-                examinations[exam_id] = {}
-                examinations[exam_id]["studyId"] = study_id
-                examinations[exam_id]["FLAIR"] = []
-
-            if "T3DFLAIR" == dataset["updatedMetadata"]["name"]:
-                examinations[exam_id]["FLAIR"].append(ds_id)
-
-
-    for key, value in examinations.items():
-        if value["FLAIR"] :
-            for flair in value["FLAIR"] :
-                execution = {
-                    "identifier":identifier,
-
-                    "name": "FLAIR_1_exam_{}_{}".format(key,
-                                                        datetime.now(timezone.utc).strftime('%F_%H%M%S%f')[:-3]),
-                    "pipelineIdentifier": "comete_brain_flair/1.3",
-                    "inputParameters": {},
-                    "datasetParameters": [
-                        {
-                            "name": "flair_archive",
-                            "groupBy": "EXAMINATION",
-                            "exportFormat": "nii",
-                            "datasetIds": [flair],
-                            "converterId": 2
-                        }
-                    ],
-                    "studyIdentifier": value["studyId"],
-                    "outputProcessing": "",
-                    "processingType": "SEGMENTATION",
-                    "refreshToken": APIContext.refresh_token,
-                    "client": APIContext.clientId,
-                    "converterId": 2
-                }
-                executions.append(execution)
-                identifier = identifier + 1
-
-    return executions
\ No newline at end of file
+        if not datasets:
+            continue
+        study_id = datasets[0]["studyId"]
+        flairs = [dataset["id"] for dataset in datasets if "T3DFLAIR" == dataset["updatedMetadata"]["name"]]
+
+        for flair in flairs :
+            execution = {
+                "identifier":identifier,
+
+                "name": "FLAIR_1_exam_{}_{}".format(exam_id,
+                                                    datetime.now(timezone.utc).strftime('%F_%H%M%S%f')[:-3]),
+                "pipelineIdentifier": "comete_brain_flair/1.3",
+                "inputParameters": {},
+                "datasetParameters": [
+                    {
+                        "name": "flair_archive",
+                        "groupBy": "EXAMINATION",
+                        "exportFormat": "nii",
+                        "datasetIds": [flair],
+                        "converterId": 2
+                    }
+                ],
+                "studyIdentifier": study_id,
+                "outputProcessing": "",
+                "processingType": "SEGMENTATION",
+                "refreshToken": APIContext.refresh_token,
+                "client": APIContext.clientId,
+                "converterId": 2
+            }
+            yield execution
+            identifier = identifier + 1
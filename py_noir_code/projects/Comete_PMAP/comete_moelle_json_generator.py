@@ -12,38 +12,30 @@ from py_noir_code.src.shanoir_object.dataset.dataset_service import find_dataset
 logger = get_logger()
 
 def generate_comete_moelle_json():
-    examinations = dict()
+    """ Yield the execution of every examination as soon as its datasets are found
+    :return:
+    """
     identifier = 0
-    executions = []
+    seen_exam_ids = set()
 
     exam_ids_to_exec = get_ids_from_file("ids_to_exec.txt", "r")
 
     logger.info("Getting datasets, building json content... ")
 
     for exam_id in exam_ids_to_exec:
+        # an examination listed twice is processed once
+        if exam_id in seen_exam_ids:
+            continue
+        seen_exam_ids.add(exam_id)
         datasets = find_datasets_by_examination_id(exam_id, True)
+        t2s = [dataset["id"] for dataset in datasets if "T2DSAGT2" == dataset["updatedMetadata"]["name"]]
+        pmaps = [dataset["id"] for dataset in datasets if "pmap.nii.gz" == dataset["updatedMetadata"]["name"]]
 
-        for dataset in datasets:
-            ds_id = dataset["id"]
-            study_id = dataset["studyId"]
-
-            if exam_id not in examinations:
-                examinations[exam_id] = {}
-                examinations[exam_id]["studyId"] = study_id
-                examinations[exam_id]["T2"] = []
-                examinations[exam_id]["PMAP"] = []
-            if "pmap.nii.gz" == dataset["updatedMetadata"]["name"]:
-                examinations[exam_id]["PMAP"].append(ds_id)
-            elif "T2DSAGT2" == dataset["updatedMetadata"]["name"]:
-                examinations[exam_id]["T2"].append(ds_id)
-
-
-    for key, value in examinations.items():
-        if value["T2"] and value["PMAP"] :
+        if t2s and pmaps :
             execution = {
                 "identifier":identifier,
 
-                "name": "comete_pmap_01_exam_{}_{}".format(key,
+                "name": "comete_pmap_01_exam_{}_{}".format(exam_id,
                                                              datetime.now(timezone.utc).strftime('%F_%H%M%S%f')[:-3]),
                 "pipelineIdentifier": "comete_sc_pmap_fusion/1.3",
                 "inputParameters": {},
@@ -52,23 +44,21 @@ def generate_comete_moelle_json():
                         "name": "t2_archive",
                         "groupBy": "EXAMINATION",
                         "exportFormat": "nii",
-                        "datasetIds": value["T2"],
+                        "datasetIds": t2s,
                         "converterId": 2
                     },
                     {
                         "name": "pmap_archive",
                         "groupBy": "EXAMINATION",
-                        "datasetIds": value["PMAP"],
+                        "datasetIds": pmaps,
                     }
                 ],
-                "studyIdentifier": value["studyId"],
+                "studyIdentifier": datasets[0]["studyId"],
                 "outputProcessing": "",
                 "processingType": "SEGMENTATION",
                 "refreshToken": APIContext.refresh_token,
                 "client": APIContext.clientId,
                 "converterId": 2
             }
-            executions.append(execution)
+            yield execution
         identifier = identifier + 1
-
-    return executions
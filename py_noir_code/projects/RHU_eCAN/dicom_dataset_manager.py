@@ -1,4 +1,5 @@
 import os
+import threading
 from datetime import datetime
 from typing import Tuple, List, Dict
 
@@ -12,17 +13,21 @@ from py_noir_code.src.orthanc.orthanc_service import set_orthanc_study_label, up
     delete_orthanc_study, get_orthanc_patients, get_orthanc_patient_meta, get_all_orthanc_studies, \
     get_study_orthanc_id_by_uid, download_orthanc_study, get_orthanc_study_metadata, get_orthanc_series_metadata, \
     get_orthanc_instance_metadata
-from py_noir_code.src.shanoir_object.dataset.dataset_service import find_processed_dataset_ids_by_input_dataset_id, \
+from py_noir_code.src.shanoir_object.dataset.dataset_service import wait_for_processed_datasets, \
     download_dataset_processing, get_dataset_processing, get_dataset, upload_dataset_processing
 
 from py_noir_code.src.utils.file_utils import get_values_from_csv, save_dict_to_csv, get_dict_from_csv
 from py_noir_code.src.utils.log_utils import get_logger
+from py_noir_code.src.utils.polling_utils import ReadinessTimeoutError
 
 logger = get_logger()
 
 SEQUENCE_TAG = (0x0040,0x0275)
 SEQUENCE_ITEM_TAG = (0x0040,0x0008)
 
+# Serializes the updates of the studies CSV file by the executions post-processed concurrently
+studies_registry_lock = threading.Lock()
+
 
 def update_studies_registry(studies, studies_csv):
     """
@@ -35,44 +40,89 @@ def update_studies_registry(studies, studies_csv):
     if not studies:
         return
 
-    existing_studies = get_dict_from_csv(studies_csv)
+    with studies_registry_lock:
+        existing_studies = get_dict_from_csv(studies_csv)
 
-    if existing_studies is None:
-        save_dict_to_csv(studies, studies_csv)
-        return
+        if existing_studies is None:
+            save_dict_to_csv(studies, studies_csv)
+            return
 
-    # Filter out duplicates
-    new_studies = [s for s in studies if s not in existing_studies]
+        # Filter out duplicates
+        new_studies = [s for s in studies if s not in existing_studies]
 
-    if new_studies:
-        existing_studies.extend(new_studies)
-        save_dict_to_csv(existing_studies, studies_csv)
+        if new_studies:
+            existing_studies.extend(new_studies)
+            save_dict_to_csv(existing_studies, studies_csv)
 
 
-def fetch_datasets_from_json(ecan_json_path: str, executions_csv: str, output_dir: str) -> None:
+def fetch_datasets_from_json(ecan_json_path: str, executions_csv: str, output_dir: str,
+                             import_timeout: float = 600) -> None:
     """
-    Fetch and download processed datasets based on an ECAN JSON export file.
+    Fetch and download processed datasets based on an ECAN JSON export file, once imported in Shanoir.
 
     Args:
         ecan_json_path (str): Path to the ECAN JSON file containing dataset IDs.
         executions_csv (str): Path to the executions csv file containing the successful executions IDs.
         output_dir (str): Output directory path for the downloaded datasets.
+        import_timeout (float): Seconds to wait for the processed datasets imports, the datasets imported by then
+            being downloaded.
     """
     # Load JSON content safely
     dataset_ids_list = get_values_from_csv(ecan_json_path, "DatasetId")
 
     # Map each subject ID to its related processed dataset IDs
-    processing_ids_list = []
     execution_ids = get_values_from_csv(executions_csv, "ExecutionId")
-    for dataset_id in dataset_ids_list:
-        processing_list = find_processed_dataset_ids_by_input_dataset_id(dataset_id)
-        processing_ids_list.extend([item["id"] for item in processing_list if str(item["parentId"]) in execution_ids])
+    try:
+        processing_list = wait_for_processed_datasets(dataset_ids_list, execution_ids, import_timeout)
+    except ReadinessTimeoutError as e:
+        logger.error(f"{e}. Their outputs are not downloaded.")
+        processing_list = e.last_value
+    processing_ids_list = [item["id"] for item in processing_list]
 
     # Download all processed datasets grouped by subject
     os.makedirs(output_dir, exist_ok=True)
     download_dataset_processing(processing_ids_list, output_dir, unzip=True)
 
 
+def fetch_execution_datasets(dataset_id: str, execution_id: str, output_dir: str, import_timeout: float = 600) -> None:
+    """
+    Download the datasets processed by one execution, as soon as they are imported in Shanoir.
+
+    Args:
+        dataset_id (str): Input dataset ID of the execution.
+        execution_id (str): ID of the succeeded execution.
+        output_dir (str): Output directory path for the downloaded datasets.
+        import_timeout (float): Seconds to wait for the processed datasets import, ReadinessTimeoutError being raised
+            after.
+    """
+    processing_list = wait_for_processed_datasets([dataset_id], [execution_id], import_timeout)
+    processing_ids_list = [item["id"] for item in processing_list]
+
+    os.makedirs(output_dir, exist_ok=True)
+    download_dataset_processing(processing_ids_list, output_dir, unzip=True)
+
+
+def post_process_execution(dataset_id: str, execution_id: str, output_dir: str, studies_csv: str,
+                           import_timeout: float = 600) -> None:
+    """
+    Download, fix and upload to the PACS the datasets processed by one execution, in their own
+    output_dir/execution_id directory, so that executions can be post-processed concurrently.
+
+    Args:
+        dataset_id (str): Input dataset ID of the execution.
+        execution_id (str): ID of the succeeded execution.
+        output_dir (str): Root directory of the downloaded datasets.
+        studies_csv (str): Path to the csv file to save the uploaded study IDs.
+        import_timeout (float): Seconds to wait for the processed datasets import.
+    """
+    execution_dir = os.path.join(output_dir, str(execution_id))
+    fetch_execution_datasets(dataset_id, execution_id, execution_dir, import_timeout)
+    if not os.path.isdir(execution_dir) or not os.listdir(execution_dir):
+        return
+    inspect_and_fix_study_tags(execution_dir)
+    upload_to_pacs_rest(execution_dir, studies_csv)
+
+
 def inspect_and_fix_study_tags(input_dir: str) -> None:
     """
     Inspect and correct DICOM tag inconsistencies across all studies in a dataset
@@ -3,7 +3,7 @@ import shutil
 import sys
 import os
 import tempfile
-from typing import List, Any, Tuple
+from typing import List, Any, Iterator
 
 import pydicom
 
@@ -18,7 +18,7 @@ from datetime import datetime
 from py_noir_code.src.API.api_context import APIContext
 from py_noir_code.src.shanoir_object.solr_query.solr_query_model import SolrQuery
 from py_noir_code.src.shanoir_object.solr_query.solr_query_service import solr_search
-from py_noir_code.src.utils.file_utils import get_values_from_csv
+from py_noir_code.src.utils.file_utils import get_values_from_csv, save_values_to_csv
 from py_noir_code.src.utils.log_utils import get_logger
 
 logger = get_logger()
@@ -117,26 +117,28 @@ def download_and_filter_datasets(subjects_datasets: defaultdict[Any, defaultdict
     return filtered_datasets
 
 
-def generate_rhu_ecan_json(download_dir: str) -> Tuple[List[Any], List[Any]]:
+def generate_rhu_ecan_json(download_dir: str, filtered_datasets_csv: str) -> Iterator[dict]:
     """
     Generate JSON configurations for RHU eCAN executions.
 
     The function:
     - Reads subject IDs from predefined CSV files.
     - Queries and filters their datasets.
-    - Builds JSON payloads for each selected dataset.
-
-    Returns
-    -------
-    Tuple[List[Any], List[Any]
-        A tuple containing: executions, dataset_ids_list
+    - Saves the ids of the filtered datasets so far to filtered_datasets_csv.
+    - Yields the JSON payload of each selected dataset, so that the executions of a subset start while the datasets of
+      the next one are downloaded.
+
+    Yields
+    ------
+    dict
+        An execution
     """
     csv_paths = [
         "py_noir_code/projects/RHU_eCAN/ican_subset.csv",
         "py_noir_code/projects/RHU_eCAN/angptl6_subset.csv"
     ]
 
-    executions, dataset_ids_list, identifier = [], [], 0
+    dataset_ids_list, identifier = [], 0
     for csv_path in csv_paths:
         subject_name_list = get_values_from_csv(csv_path, "SubjectName")
         subjects_datasets = query_datasets(subject_name_list)
@@ -144,10 +146,11 @@ def generate_rhu_ecan_json(download_dir: str) -> Tuple[List[Any], List[Any]]:
         filtered_datasets = download_and_filter_datasets(subjects_datasets, download_dir)
 
         dataset_ids_list.extend(ds["id"] for ds in filtered_datasets)
+        save_values_to_csv(dataset_ids_list, "DatasetId", filtered_datasets_csv)
         logger.info("Building json content...")
         for dataset in filtered_datasets:
             dt = datetime.now().strftime('%F_%H%M%S%f')[:-3]
-            executions.append({
+            yield {
                 "identifier": identifier,
                 "name": f"landmarkDetection_0_4_exam_{dataset['examinationId']}_{dt}",
                 "pipelineIdentifier": "landmarkDetection/0.4",
@@ -163,8 +166,7 @@ def generate_rhu_ecan_json(download_dir: str) -> Tuple[List[Any], List[Any]]:
                     "name": "dicom_input_zip",
                     "exportFormat": "dcm"
                 }],
-            })
+            }
 
             identifier += 1
         logging.info(f"Finished processing {csv_path}.")
-    return executions, dataset_ids_list
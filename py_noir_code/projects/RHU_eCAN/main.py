@@ -1,6 +1,5 @@
 import os
 import sys
-import time
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
 
@@ -10,7 +9,11 @@ from py_noir_code.src.utils.context_utils import load_context
 from py_noir_code.src.utils.file_utils import get_project_name, find_project_root, create_file_path, save_values_to_csv
 from py_noir_code.projects.RHU_eCAN.dicom_dataset_manager import fetch_datasets_from_json, inspect_and_fix_study_tags, \
     upload_to_pacs_rest, assign_label_to_pacs_study, download_from_pacs_rest, upload_processed_dataset, \
-    delete_studies_from_pacs, get_patient_ids_from_pacs, purge_pacs_studies, get_orthanc_study_details
+    delete_studies_from_pacs, get_patient_ids_from_pacs, purge_pacs_studies, get_orthanc_study_details, \
+    post_process_execution
+
+# Maximum seconds to wait for the data imports of an execution to finish in shanoir
+IMPORT_TIMEOUT = 600
 
 if __name__ == '__main__':
     load_context("context.conf", with_orthanc=True)
@@ -24,6 +27,7 @@ if __name__ == '__main__':
     create_file_path(ecan_tracing_dir)
     filtered_datasets_csv = ecan_tracing_dir + "/ecan_filtered_datasets.csv"
     executions_csv = ecan_tracing_dir + "/successful_executions_ids.csv"
+    remaining_executions_csv = ecan_tracing_dir + "/remaining_executions_ids.csv"
     studies_csv = ecan_tracing_dir + "/orthanc_studies.csv"
 
     download_dir = find_project_root(__file__) + "/py_noir_code/resources/downloads"
@@ -31,19 +35,32 @@ if __name__ == '__main__':
     vip_output = os.path.join(download_dir, "vip_output")
     orthanc_output = os.path.join(download_dir, "orthanc_output")
 
+    post_processed_executions = set()
+
+    def post_process(item, execution_id):
+        # Download, fix and upload the outputs of each execution as soon as they are imported in shanoir
+        post_process_execution(item["datasetParameters"][0]["datasetIds"][0], execution_id, vip_output, studies_csv,
+                               IMPORT_TIMEOUT)
+        post_processed_executions.add(str(execution_id))
+
     if not os.path.exists(json_save_path + json_file_name):
-        executions_dict, filtered_datasets_ids = generate_rhu_ecan_json(shanoir_output)
-        save_values_to_csv(filtered_datasets_ids, "DatasetId", filtered_datasets_csv)
-        successful_executions = init_executions(json_file_path + json_file_name, executions_dict)
+        successful_executions = init_executions(json_file_path + json_file_name,
+                                                generate_rhu_ecan_json(shanoir_output, filtered_datasets_csv),
+                                                on_success=post_process)
     else:
-        successful_executions = resume_executions(json_file_path, json_save_path, json_file_name)
+        successful_executions = resume_executions(json_file_path, json_save_path, json_file_name,
+                                                  on_success=post_process)
     save_values_to_csv(successful_executions, "ExecutionId", executions_csv)
-    # Wait for 10 seconds for the data imports to finish in shanoir
-    time.sleep(10)
 
-    fetch_datasets_from_json(filtered_datasets_csv, executions_csv, vip_output)
-    inspect_and_fix_study_tags(vip_output)
-    upload_to_pacs_rest(vip_output, studies_csv)
+    # Executions succeeded in a former run, or whose post-processing failed
+    remaining_executions = [execution_id for execution_id in successful_executions
+                            if str(execution_id) not in post_processed_executions]
+    if remaining_executions:
+        save_values_to_csv(remaining_executions, "ExecutionId", remaining_executions_csv)
+        remaining_output = os.path.join(vip_output, "remaining")
+        fetch_datasets_from_json(filtered_datasets_csv, remaining_executions_csv, remaining_output, IMPORT_TIMEOUT)
+        inspect_and_fix_study_tags(remaining_output)
+        upload_to_pacs_rest(remaining_output, studies_csv)
     assign_label_to_pacs_study(studies_csv)
 
     # To be used later for the importation of GE AIDream processed output to Shanoir.
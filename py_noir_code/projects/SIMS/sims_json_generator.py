@@ -12,8 +12,10 @@ from py_noir_code.src.shanoir_object.dataset.dataset_service import find_dataset
 logger = get_logger()
 
 def generate_sims_json():
+    """ Yield the execution of every examination as soon as its datasets are found
+    :return:
+    """
     identifier = 0
-    executions = []
 
     exam_ids_to_exec = get_ids_from_file("ids_to_rename.txt", "r")
 
@@ -41,7 +43,5 @@ def generate_sims_json():
                 }
             ]
         }
-        executions.append(execution)
+        yield execution
         identifier = identifier + 1
-
-    return executions
\ No newline at end of file
@@ -0,0 +1,49 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures.thread import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../')))
+
+from py_noir_code.src.API import api_service, async_api_service
+from py_noir_code.src.stub.shanoir_stub_server import StubConfig, start_stub_server, use_stub_server
+
+
+def run_threaded(nb_requests: int, nb_threads: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=nb_threads) as executor:
+        list(executor.map(lambda index: api_service.get('/datasets/datasets/' + str(index)).json(),
+                          range(nb_requests)))
+    return time.perf_counter() - start
+
+
+async def run_async(nb_requests: int, concurrency: int) -> float:
+    async_api_service.set_max_concurrency(concurrency)
+    start = time.perf_counter()
+    responses = await asyncio.gather(*[async_api_service.get('/datasets/datasets/' + str(index))
+                                       for index in range(nb_requests)])
+    [response.json() for response in responses]
+    elapsed = time.perf_counter() - start
+    await async_api_service.close_async_session()
+    return elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the threaded and asyncio Shanoir clients on a local stub")
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+
+    server = start_stub_server(StubConfig(latency=args.latency))
+    use_stub_server(server)
+
+    threaded = run_threaded(args.requests, args.threads)
+    print("threaded (%s threads): %.2f s, %.0f req/s" % (args.threads, threaded, args.requests / threaded))
+    asynchronous = asyncio.run(run_async(args.requests, args.concurrency))
+    print("asyncio (%s in flight): %.2f s, %.0f req/s" % (args.concurrency, asynchronous,
+                                                         args.requests / asynchronous))
+    server.shutdown()
@@ -0,0 +1,47 @@
+import argparse
+import datetime
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../')))
+
+from py_noir_code.src.execution.execution_state_store import connect, get_status_summary, get_running_executions, \
+    get_failed_executions, get_slowest_executions, get_worker_leases
+
+
+def format_duration(seconds: float) -> str:
+    return str(datetime.timedelta(seconds=int(seconds)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Query the execution states of a batch run with state_store = sqlite or shared")
+    parser.add_argument('database', help="e.g. py_noir_code/resources/save_files/<project>.sqlite")
+    parser.add_argument('query', choices=['summary', 'running', 'failed', 'slowest', 'workers'], nargs='?', default='summary')
+    parser.add_argument('--limit', type=int, default=10, help="number of executions listed by 'slowest'")
+    args = parser.parse_args()
+
+    connection = connect(args.database, read_only=True)
+    if args.query == 'summary':
+        for status, count in sorted(get_status_summary(connection).items()):
+            print("%-10s %s" % (status, count))
+    elif args.query == 'running':
+        for execution in get_running_executions(connection):
+            print("item %s, execution %s (%s) running for %s, attempt %s" % (
+                execution['identifier'], execution['execution_id'], execution['monitoring_id'],
+                format_duration(execution['duration']), execution['attempts']))
+    elif args.query == 'failed':
+        for execution in get_failed_executions(connection):
+            print("item %s, execution %s failed at %s: %s" % (
+                execution['identifier'], execution['execution_id'],
+                datetime.datetime.fromtimestamp(execution['ended_at']).isoformat(timespec='seconds'),
+                (execution['error'] or '').strip()))
+    elif args.query == 'workers':
+        for worker in get_worker_leases(connection):
+            print("%s: %s items (%s running), lease until %s" % (
+                worker['owner'], worker['items'], worker['running'],
+                datetime.datetime.fromtimestamp(worker['lease_expires']).isoformat(timespec='seconds')))
+    else:
+        for execution in get_slowest_executions(connection, args.limit):
+            print("item %s, execution %s, %s: %s" % (execution['identifier'], execution['execution_id'],
+                                                     execution['status'], format_duration(execution['duration'])))
+    connection.close()
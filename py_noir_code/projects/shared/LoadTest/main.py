@@ -0,0 +1,253 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../')))
+
+from py_noir_code.src.API.api_context import APIContext
+from py_noir_code.src.execution import execution_management_service
+from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.execution.execution_init_service import init_executions, resume_executions
+from py_noir_code.src.stub.shanoir_stub_server import StubConfig, start_stub_server, use_stub_server, use_stub_port
+
+
+def generate_synthetic_items(nb_items: int) -> list[dict]:
+    """ Build [nb_items] execution items shaped like the project generators output
+    :param nb_items:
+    :return:
+    """
+    return [{
+        "name": "load_test_%s" % index,
+        "pipelineIdentifier": "load_test/1.0",
+        "studyIdentifier": 1,
+        "inputParameters": {},
+        "outputProcessing": "",
+        "processingType": "SEGMENTATION",
+        "refreshToken": APIContext.refresh_token,
+        "client": APIContext.clientId,
+        "datasetParameters": [{
+            "datasetIds": [index],
+            "groupBy": "EXAMINATION",
+            "name": "dicom_archive",
+            "exportFormat": "dcm"
+        }]
+    } for index in range(nb_items)]
+
+
+def stream_synthetic_items(nb_items: int, generation_delay: float):
+    """ Yield [nb_items] execution items, one every [generation_delay] seconds, like a generator querying Shanoir
+    :param nb_items:
+    :param generation_delay:
+    :return:
+    """
+    for item in generate_synthetic_items(nb_items):
+        time.sleep(generation_delay)
+        yield item
+
+
+def get_items(args):
+    if args.stream:
+        return stream_synthetic_items(args.items, args.generation_delay)
+    return generate_synthetic_items(args.items)
+
+
+def get_post_processing(args):
+    """ Build the success callback simulating [args.post_processing_duration] seconds of post-processing per execution
+    :param args:
+    :return: None if no post-processing is simulated
+    """
+    if args.post_processing_duration <= 0:
+        return None
+
+    def post_process(item, execution_id):
+        time.sleep(args.post_processing_duration)
+    return post_process
+
+
+def start_server(args):
+    return start_stub_server(StubConfig(latency=args.latency, failure_rate=args.failure_rate,
+                                        execution_duration=(args.min_duration, args.max_duration),
+                                        execution_failure_rate=args.execution_failure_rate))
+
+
+def create_work_dir() -> str:
+    work_dir = tempfile.mkdtemp(prefix="py_noir_load_test_")
+    os.makedirs(work_dir + "/WIP_files")
+    os.makedirs(work_dir + "/save_files")
+    return work_dir
+
+
+def configure_execution_context(args):
+    ExecutionContext.max_thread = args.threads
+    ExecutionContext.server_reboot_beginning_hour = -1
+    ExecutionContext.server_reboot_ending_hour = -1
+    ExecutionContext.maintenance_windows = args.maintenance_windows
+    ExecutionContext.poll_interval = args.poll_interval
+    ExecutionContext.max_running_executions = args.max_running
+    ExecutionContext.submit_rate = args.submit_rate
+    ExecutionContext.submit_burst = args.submit_burst
+    ExecutionContext.state_store = args.state_store
+    ExecutionContext.claim_size = args.claim_size
+    ExecutionContext.max_attempts = args.max_attempts
+    ExecutionContext.retry_delay = args.retry_delay
+    ExecutionContext.stream_buffer_size = args.stream_buffer
+    ExecutionContext.hook_threads = args.hook_threads
+    # the synthetic items are the same from one run to the other
+    ExecutionContext.skip_succeeded = False
+
+
+def run_load_test(args) -> dict:
+    server = start_server(args)
+    use_stub_server(server)
+    configure_execution_context(args)
+    work_dir = create_work_dir()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    executions = init_executions(work_dir + "/WIP_files/load_test.json", get_items(args), args.engine,
+                                 on_success=get_post_processing(args))
+    elapsed = time.perf_counter() - start
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    server.shutdown()
+
+    return dict(engine=args.engine, items=args.items, succeeded=len(executions), elapsed=elapsed, throughput=args.items / elapsed,
+                peak_python_memory_mb=peak_memory / 2 ** 20,
+                max_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                requests=dict(server.state.requests))
+
+
+def run_shared_load_test(args) -> dict:
+    """ Run the load test with [args.processes] processes working on the same batch (shared state store), each in its
+    own Python process, against one stub server
+    :param args:
+    :return: the aggregated report
+    """
+    server = start_server(args)
+    work_dir = create_work_dir()
+    arguments = [argument for argument in sys.argv[1:] if argument != '--json']
+    start = time.perf_counter()
+    workers = [subprocess.Popen([sys.executable, os.path.abspath(__file__), '--worker', str(index), '--stub-port',
+                                 str(server.server_port), '--work-dir', work_dir, '--json'] + arguments,
+                                stdout=subprocess.PIPE, text=True) for index in range(args.processes)]
+    reports = [json.loads(worker.communicate()[0].strip().splitlines()[-1]) for worker in workers]
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    return dict(engine="%s x %s processes" % (args.engine, args.processes), items=args.items,
+                succeeded=sum(report['succeeded'] for report in reports), elapsed=elapsed,
+                throughput=args.items / elapsed,
+                peak_python_memory_mb=max(report['peak_python_memory_mb'] for report in reports),
+                max_rss_mb=max(report['max_rss_mb'] for report in reports), requests=dict(server.state.requests),
+                created_per_process=[report['created'] for report in reports])
+
+
+def run_worker(args) -> dict:
+    """ Work on the shared batch of [args.work_dir]: the first worker creates it, the others join it
+    :param args:
+    :return: the worker report
+    """
+    use_stub_port(args.stub_port)
+    configure_execution_context(args)
+    json_file_name = "load_test.json"
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    if args.worker == 0:
+        executions = init_executions(args.work_dir + "/WIP_files/" + json_file_name, get_items(args), args.engine,
+                                     on_success=get_post_processing(args))
+    else:
+        # the batch is joined once its save file exists
+        while not os.path.exists(args.work_dir + "/save_files/" + json_file_name):
+            time.sleep(0.1)
+        executions = resume_executions(args.work_dir + "/WIP_files/", args.work_dir + "/save_files/",
+                                       json_file_name, args.engine, on_success=get_post_processing(args))
+    elapsed = time.perf_counter() - start
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return dict(worker=args.worker, succeeded=len(executions), created=execution_management_service.nb_created_executions, elapsed=elapsed,
+                peak_python_memory_mb=peak_memory / 2 ** 20,
+                max_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+
+
+def compare_engine(engine: str) -> dict:
+    """ Run the same load test with [engine] in a child process, so that memory figures are not mixed
+    :param engine:
+    :return: the child report
+    """
+    arguments = [argument for argument in sys.argv[1:] if not argument.startswith('--engine')]
+    if 'compare' in arguments:
+        arguments.remove('compare')
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--engine', engine, '--json'] + arguments,
+                            check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Drive start_executions against the local Shanoir stub server")
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--min-duration', type=float, default=5.0)
+    parser.add_argument('--max-duration', type=float, default=10.0)
+    parser.add_argument('--execution-failure-rate', type=float, default=0.0)
+    parser.add_argument('--max-attempts', type=int, default=3, help="attempts of an item failing on transient errors")
+    parser.add_argument('--retry-delay', type=float, default=5.0, help="backoff before the second attempt, in seconds")
+    parser.add_argument('--poll-interval', type=float, default=5.0)
+    parser.add_argument('--max-running', type=int, default=0, help="max executions running at once, 0 for no limit")
+    parser.add_argument('--submit-rate', type=float, default=1.0, help="execution creations per second, 0 for no pacing")
+    parser.add_argument('--submit-burst', type=int, default=1)
+    parser.add_argument('--engine', choices=['thread', 'asyncio', 'compare'], default='thread',
+                        help="execution engine, 'compare' runs both in separate processes")
+    parser.add_argument('--maintenance-windows', default=None,
+                        help="e.g. '02:10-02:12', creations and polls are paused during the windows")
+    parser.add_argument('--state-store', choices=['journal', 'sqlite', 'shared'], default='journal')
+    parser.add_argument('--processes', type=int, default=1,
+                        help="number of processes working on the batch, requires --state-store shared")
+    parser.add_argument('--claim-size', type=int, default=10, help="items claimed at once by a process (shared)")
+    parser.add_argument('--stream', action='store_true', help="pass the items to init_executions as a generator")
+    parser.add_argument('--generation-delay', type=float, default=0.0,
+                        help="seconds to produce a streamed item")
+    parser.add_argument('--stream-buffer', type=int, default=100, help="stream_buffer_size of the execution context")
+    parser.add_argument('--post-processing-duration', type=float, default=0.0,
+                        help="seconds of simulated post-processing per succeeded execution, in a success hook")
+    parser.add_argument('--hook-threads', type=int, default=2, help="hook_threads of the execution context")
+    # internal, for the processes started by --processes
+    parser.add_argument('--worker', type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--stub-port', type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--work-dir', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    if args.processes > 1 and args.state_store != 'shared':
+        parser.error("--processes requires --state-store shared")
+    if args.worker is not None:
+        print(json.dumps(run_worker(args)))
+        sys.exit(0)
+
+    if args.engine == 'compare':
+        reports = [compare_engine(engine) for engine in ('thread', 'asyncio')]
+    elif args.processes > 1:
+        reports = [run_shared_load_test(args)]
+    else:
+        reports = [run_load_test(args)]
+
+    for report in reports:
+        if args.json:
+            print(json.dumps(report))
+            continue
+        print("[%s] %s items (%s succeeded) in %.1f s: %.2f items/s" % (
+            report['engine'], report['items'], report['succeeded'], report['elapsed'], report['throughput']))
+        print("[%s] Peak Python memory %.1f MB, max RSS %.1f MB" % (
+            report['engine'], report['peak_python_memory_mb'], report['max_rss_mb']))
+        print("[%s] Stub requests: %s" % (report['engine'], report['requests']))
+        if 'created_per_process' in report:
+            print("[%s] Executions created per process: %s" % (report['engine'], report['created_per_process']))
@@ -0,0 +1,37 @@
+import argparse
+import datetime
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../')))
+
+from py_noir_code.src.execution.execution_scheduling_service import simulate_policies, get_predicted_duration
+from py_noir_code.src.execution.working_file_service import read_working_file
+
+
+def format_duration(seconds: float) -> str:
+    return str(datetime.timedelta(seconds=int(seconds)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulate the makespan of a batch of items under each scheduling "
+                                                 "policy, from their predicted execution durations")
+    parser.add_argument('items', help="items JSON file, e.g. py_noir_code/resources/WIP_files/<project>.json")
+    parser.add_argument('--slots', type=int, default=0,
+                        help="maximum number of executions running at once, 0 for no limit (default)")
+    parser.add_argument('--submit-rate', type=float, default=1.0,
+                        help="execution creations per second, 0 for no pacing (1 by default)")
+    parser.add_argument('--submit-burst', type=int, default=1,
+                        help="execution creations allowed at once before pacing (1 by default)")
+    args = parser.parse_args()
+
+    # working and save files start with the batch header
+    items = [item for item in read_working_file(args.items) if "identifier" in item]
+
+    nb_predicted = sum(get_predicted_duration(item) is not None for item in items)
+    print("%s items, %s with a predicted duration" % (len(items), nb_predicted))
+    if nb_predicted == 0:
+        print("No duration can be predicted: add an 'expectedDuration' field to the items or run the pipelines first")
+        sys.exit(1)
+    for policy, makespan in simulate_policies(items, args.slots, args.submit_rate, args.submit_burst).items():
+        print("%-5s %s" % (policy, format_duration(makespan)))
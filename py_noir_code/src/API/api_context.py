@@ -1,5 +1,6 @@
 import json
 
+from py_noir_code.src.security.token_cache_service import load_cached_tokens
 from py_noir_code.src.utils.custom_config_parser import CustomConfigParser
 
 
@@ -16,6 +17,14 @@ class APIContext(object):
     clientId: str = None
     access_token: str = None
     refresh_token: str = None
+    token_cache: bool = False
+    adaptive_concurrency: bool = True
+    min_concurrency: int = 1
+    max_concurrency: int = 32
+    max_retries: int = 3
+    retry_backoff: float = 1.0
+    breaker_failure_threshold: int = 5
+    breaker_reset_timeout: float = 60.0
 
     @classmethod
     def init(cls, config: CustomConfigParser):
@@ -28,6 +37,16 @@ class APIContext(object):
         cls.clientId = config.get('API context', 'clientId')
         cls.access_token = config.get('API context', 'access_token')
         cls.refresh_token = config.get('API context', 'refresh_token')
+        cls.token_cache = ("True" == config.get('API context', 'token_cache', fallback="False"))
+        cls.adaptive_concurrency = ("True" == config.get('API context', 'adaptive_concurrency', fallback="True"))
+        cls.min_concurrency = int(config.get('API context', 'min_concurrency', fallback="1"))
+        cls.max_concurrency = int(config.get('API context', 'max_concurrency', fallback="32"))
+        cls.max_retries = int(config.get('API context', 'max_retries', fallback="3"))
+        cls.retry_backoff = float(config.get('API context', 'retry_backoff', fallback="1.0"))
+        cls.breaker_failure_threshold = int(config.get('API context', 'breaker_failure_threshold', fallback="5"))
+        cls.breaker_reset_timeout = float(config.get('API context', 'breaker_reset_timeout', fallback="60"))
+        if cls.token_cache and cls.access_token is None and cls.refresh_token is None:
+            cls.access_token, cls.refresh_token = load_cached_tokens(cls.domain, cls.username)
 
     def __init__(self, config: CustomConfigParser):
         self.scheme = config.get('API context', 'scheme')
@@ -39,3 +58,11 @@ class APIContext(object):
         self.clientId = config.get('API context', 'clientId')
         self.access_token = config.get('API context', 'access_token')
         self.refresh_token = config.get('API context', 'refresh_token')
+        self.token_cache = ("True" == config.get('API context', 'token_cache', fallback="False"))
+        self.adaptive_concurrency = ("True" == config.get('API context', 'adaptive_concurrency', fallback="True"))
+        self.min_concurrency = int(config.get('API context', 'min_concurrency', fallback="1"))
+        self.max_concurrency = int(config.get('API context', 'max_concurrency', fallback="32"))
+        self.max_retries = int(config.get('API context', 'max_retries', fallback="3"))
+        self.retry_backoff = float(config.get('API context', 'retry_backoff', fallback="1.0"))
+        self.breaker_failure_threshold = int(config.get('API context', 'breaker_failure_threshold', fallback="5"))
+        self.breaker_reset_timeout = float(config.get('API context', 'breaker_reset_timeout', fallback="60"))
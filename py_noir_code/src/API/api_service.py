@@ -4,12 +4,19 @@ import getpass
 import zipfile
 from pathlib import Path
 import re
+import time
 from tqdm import tqdm
 
-import requests
+from requests.exceptions import Timeout, ConnectionError
 
 from py_noir_code.src.API.api_context import APIContext
-from py_noir_code.src.security.authentication_service import ask_access_token, refresh_access_token
+from py_noir_code.src.API.api_session import get_session, reset_session
+from py_noir_code.src.API.concurrency_limiter import get_limiter
+from py_noir_code.src.API.retry_policy import call_with_retry
+from py_noir_code.src.metrics.metrics_context import MetricsContext
+from py_noir_code.src.metrics.metrics_service import record_call
+from py_noir_code.src.security.authentication_service import ensure_access_token, refresh_access_token, \
+    refresh_expired_access_token
 from py_noir_code.src.utils.log_utils import get_logger
 
 logger = get_logger()
@@ -29,15 +36,22 @@ def rest_request(method: str, path, **kwargs):
     url = APIContext.scheme + "://" + APIContext.domain + "/shanoir-ng" + path
 
     response = None
-    if method == 'get':
-        response = requests.get(url, proxies=APIContext.proxies, verify=APIContext.verify, timeout=APIContext.timeout,
-                                **kwargs)
-    elif method == 'post':
-        response = requests.post(url, proxies=APIContext.proxies, verify=APIContext.verify, timeout=APIContext.timeout,
-                                 **kwargs)
-    elif method == 'put':
-        response = requests.put(url, proxies=APIContext.proxies, verify=APIContext.verify, timeout=APIContext.timeout,
-                                **kwargs)
+    if method in ('get', 'post', 'put'):
+        limiter = get_limiter()
+        start = limiter.acquire() if limiter is not None else time.perf_counter()
+        status_code, overloaded = None, False
+        try:
+            response = get_session().request(method, url, proxies=APIContext.proxies, verify=APIContext.verify,
+                                             timeout=APIContext.timeout, **kwargs)
+            status_code = response.status_code
+        except (Timeout, ConnectionError):
+            overloaded = True
+            raise
+        finally:
+            if limiter is not None:
+                limiter.release(start, status_code, overloaded)
+            if MetricsContext.enabled:
+                record_call('shanoir', method, path, response, time.perf_counter() - start, kwargs.get('stream'))
     else:
         logger.error('Error: unimplemented request type')
 
@@ -45,39 +59,57 @@ def rest_request(method: str, path, **kwargs):
 
 
 # perform a request on the given path, asks for a new access token if the current one is outdated
-def request(method, path, raise_for_status=True, content_type=None, **kwargs):
-    """ Authenticate / Re-authenticate user [APIContext.username] and execute a [method] HTTP query to [path] endpoint
+def request(method, path, raise_for_status=True, content_type=None, idempotent=None, **kwargs):
+    """ Authenticate / Re-authenticate user [APIContext.username] and execute a [method] HTTP query to [path] endpoint,
+    retrying transient failures if the query is idempotent
     :param method:
     :param path:
     :param raise_for_status:
     :param content_type:
+    :param idempotent: force (True) or forbid (False) retries, by default only non-POST queries are retried
     :param kwargs:
     :return:
     """
-    if APIContext.access_token is None:
-        ask_access_token()
+    response = call_with_retry(method, lambda: authenticated_request(method, path, content_type, **kwargs),
+                               idempotent)
+
+    if raise_for_status:
+        response.raise_for_status()
+
+    return response
+
+
+def authenticated_request(method, path, content_type=None, **kwargs):
+    """ Execute a [method] HTTP query to [path] endpoint, refreshing the access token once if it is outdated
+    :param method:
+    :param path:
+    :param content_type:
+    :param kwargs:
+    :return:
+    """
+    ensure_access_token()
 
-    headers = get_http_headers(content_type)
+    access_token = APIContext.access_token
+    headers = get_http_headers(content_type, access_token)
     response = rest_request(method, path, headers=headers, **kwargs)
 
-    # if the token is outdated, refresh it and try again
+    # if the token is outdated, refresh it (once for all threads) and try again
     if response.status_code == 401:
-        refresh_access_token()
+        refresh_expired_access_token(access_token)
         headers = get_http_headers(content_type)
         response = rest_request(method, path, headers=headers, **kwargs)
 
-    if raise_for_status:
-        response.raise_for_status()
-
     return response
 
 
-def get_http_headers(content_type=None):
-    """ Set HTTP headers with [APIContext.access_token]
+def get_http_headers(content_type=None, access_token=None):
+    """ Set HTTP headers with [access_token], [APIContext.access_token] by default
+    :param content_type:
+    :param access_token:
     :return:
     """
     headers = {
-        'Authorization': 'Bearer ' + APIContext.access_token,
+        'Authorization': 'Bearer ' + (access_token or APIContext.access_token),
         'content-type': 'application/json' if content_type is None else content_type,
         'charset': 'utf-8'
     }
@@ -96,7 +128,7 @@ def get(path: str, params=None, stream=None):
 
 
 def post(path: str, params=None, files=None, stream=None, json=None, data=None,
-         raise_for_status=True, content_type=None):
+         raise_for_status=True, content_type=None, idempotent=None):
     """ Perform a POST HTTP request on [path] endpoint with given [params]/[files]/[stream] /[data]
     :param path:
     :param params:
@@ -106,10 +138,11 @@ def post(path: str, params=None, files=None, stream=None, json=None, data=None,
     :param data:
     :param raise_for_status:
     :param content_type:
+    :param idempotent: True if the POST has no side effect (search, download) and can be retried
     :return:
     """
     return request('post', path, raise_for_status, params=params, files=files, stream=stream, json=json,
-                   data=data, content_type=content_type)
+                   data=data, content_type=content_type, idempotent=idempotent)
 
 
 def put(path: str, params=None, files=None, stream=None, json=None, data=None,
@@ -242,6 +275,7 @@ def initialize(args):
     APIContext.verify = verify
     APIContext.timeout = args.timeout
     APIContext.output_folder = args.output_folder
+    reset_session()
 
 def reset_token():
     if APIContext.access_token is None:
@@ -0,0 +1,105 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from py_noir_code.src.API.api_context import APIContext
+from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.utils.log_utils import get_logger
+
+"""
+Define the shared, pooled HTTP session used for every Shanoir call
+"""
+
+logger = get_logger()
+
+# Number of distinct hosts kept in the pool manager (Shanoir API and Keycloak are usually the same nginx)
+POOL_CONNECTIONS = 4
+# Number of pooled connections per host when no execution context is loaded
+DEFAULT_POOL_MAXSIZE = 10
+
+session: requests.Session = None
+session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """ Return the shared keep-alive session, building it on first use from [ExecutionContext]
+    :return: requests.Session
+    """
+    global session
+    if session is None:
+        with session_lock:
+            if session is None:
+                session = create_session()
+    return session
+
+
+def create_session() -> requests.Session:
+    """ Build a keep-alive session with one connection pool per host, sized from [ExecutionContext.max_thread].
+    Proxies and certificate verification are passed on each request, so that [APIContext.proxies] prevails over the
+    proxy environment variables
+    :return: requests.Session
+    """
+    pool_maxsize = get_pool_maxsize()
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=pool_maxsize, pool_block=False)
+
+    new_session = requests.Session()
+    new_session.mount('https://', adapter)
+    new_session.mount('http://', adapter)
+    new_session.headers.update({'Connection': 'keep-alive'})
+    logger.debug("HTTP session created with %s pooled connections per host" % pool_maxsize)
+    return new_session
+
+
+def get_pool_maxsize() -> int:
+    """ Size the per-host pool so that every worker thread can hold its own connection (plus one for auth calls), and
+    so that every call let through by the adaptive concurrency limiter finds a pooled connection
+    :return: int
+    """
+    pool_maxsize = DEFAULT_POOL_MAXSIZE if ExecutionContext.max_thread is None \
+        else max(int(ExecutionContext.max_thread) + 1, 2)
+    if APIContext.adaptive_concurrency:
+        pool_maxsize = max(pool_maxsize, APIContext.max_concurrency + 1)
+    return pool_maxsize
+
+
+def reset_session():
+    """ Close the shared session so that the next call rebuilds it (e.g. after an [APIContext] change)
+    """
+    global session
+    with session_lock:
+        if session is not None:
+            session.close()
+        session = None
+
+
+def get_pool_stats() -> dict:
+    """ Get connection pool counters of the shared session.
+    A pool "hit" is a request served by an already opened connection, a "miss" a request that opened a new one.
+    :return: dict
+    """
+    stats = dict(requests=0, connections=0, hits=0, misses=0)
+    if session is None:
+        return stats
+
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats['requests'] += pool.num_requests
+            stats['connections'] += pool.num_connections
+
+    stats['misses'] = stats['connections']
+    stats['hits'] = max(stats['requests'] - stats['connections'], 0)
+    return stats
+
+
+def log_pool_stats():
+    """ Log the connection pool counters of the shared session
+    """
+    stats = get_pool_stats()
+    ratio = stats['hits'] / stats['requests'] if stats['requests'] else 0
+    logger.info("HTTP pool: %s requests, %s hits, %s misses (reuse ratio %.2f)" % (
+        stats['requests'], stats['hits'], stats['misses'], ratio))
@@ -0,0 +1,351 @@
+import asyncio
+import json
+import os
+import ssl
+import time
+import zipfile
+from types import SimpleNamespace
+
+from requests.exceptions import HTTPError
+
+from py_noir_code.src.API.api_context import APIContext
+from py_noir_code.src.API.api_service import get_http_headers, get_filename_from_response
+from py_noir_code.src.API.concurrency_limiter import AsyncAIMDLimiter
+from py_noir_code.src.API.retry_policy import call_with_retry_async
+from py_noir_code.src.metrics.metrics_context import MetricsContext
+from py_noir_code.src.metrics.metrics_service import record_call
+from py_noir_code.src.security.authentication_service import ensure_access_token, refresh_expired_access_token, \
+    start_token_renewal
+from py_noir_code.src.utils.log_utils import get_logger
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = get_logger()
+
+"""
+Define asyncio counterparts of the api_service methods, sharing its authentication and token refresh logic
+"""
+
+# Maximum number of requests in flight at the same time on the event loop
+DEFAULT_MAX_CONCURRENCY = 100
+
+max_concurrency = DEFAULT_MAX_CONCURRENCY
+session = None
+semaphore: asyncio.Semaphore = None
+# adaptive limit of the requests in flight, up to [max_concurrency], None if disabled
+limiter: AsyncAIMDLimiter = None
+session_loop = None
+
+
+class AsyncResponse(object):
+    """
+    Minimal requests.Response look-alike returned by the asyncio client
+    """
+
+    def __init__(self, raw, content: bytes = None, body=None):
+        self.raw = raw
+        # sent body, for the metrics
+        self.request = SimpleNamespace(body=body)
+        self.status_code = raw.status
+        self.reason = raw.reason
+        self.headers = raw.headers
+        self.url = str(raw.url)
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8') if self.content is not None else ''
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise HTTPError('%s Error: %s for url: %s' % (self.status_code, self.reason, self.url), response=self)
+
+    async def iter_content(self, chunk_size: int = 1024):
+        """ Iterate over a streamed response body
+        :param chunk_size:
+        :return:
+        """
+        if self.content is not None:
+            yield self.content
+            return
+        async for chunk in self.raw.content.iter_chunked(chunk_size):
+            yield chunk
+
+    def release(self):
+        self.raw.release()
+
+
+def set_max_concurrency(limit: int):
+    """ Set the maximum number of requests in flight, applied to the next session
+    :param limit:
+    :return:
+    """
+    global max_concurrency
+    max_concurrency = limit
+
+
+def get_ssl_context():
+    """ Translate [APIContext.verify] (bool or CA bundle path) to aiohttp ssl parameter
+    :return:
+    """
+    if APIContext.verify is False:
+        return False
+    if isinstance(APIContext.verify, str):
+        return ssl.create_default_context(cafile=APIContext.verify)
+    return None
+
+
+def get_proxy():
+    """ Get the proxy url matching [APIContext.scheme] from [APIContext.proxies]
+    :return:
+    """
+    if not APIContext.proxies:
+        return None
+    return APIContext.proxies.get(APIContext.scheme)
+
+
+def get_async_session():
+    """ Return the aiohttp session of the running event loop, building it on first use with its concurrency limits
+    :return: aiohttp.ClientSession
+    """
+    global session, semaphore, limiter, session_loop
+    if aiohttp is None:
+        raise ImportError("The asyncio Shanoir client requires aiohttp, please install it (pip install aiohttp).")
+
+    loop = asyncio.get_running_loop()
+    if session is None or session.closed or session_loop is not loop:
+        timeout = aiohttp.ClientTimeout(total=float(APIContext.timeout) if APIContext.timeout else None)
+        connector = aiohttp.TCPConnector(limit=max_concurrency, ssl=get_ssl_context())
+        session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        # the asyncio client has its own limit, the limiter of the threads is sized for their connection pool
+        limiter = AsyncAIMDLimiter(max_concurrency, APIContext.min_concurrency, max_concurrency) \
+            if APIContext.adaptive_concurrency else None
+        session_loop = loop
+    return session
+
+
+def detach_async_session():
+    """ Make the next request build a new session, e.g. once the connections of the current one are broken
+    :return: the former session, to be closed by the caller
+    """
+    global session
+    former_session, session = session, None
+    return former_session
+
+
+def get_async_limiter():
+    """ Get the adaptive concurrency limiter of the current session, None if disabled or no session was built
+    :return: AsyncAIMDLimiter
+    """
+    return limiter
+
+
+async def close_async_session():
+    """ Close the aiohttp session, to be awaited before the event loop ends
+    :return:
+    """
+    global session
+    if session is not None and not session.closed:
+        await session.close()
+    session = None
+
+
+def get_transient_errors() -> tuple:
+    """ Get the aiohttp exceptions meaning a timeout or a connection error
+    :return:
+    """
+    return asyncio.TimeoutError, aiohttp.ClientConnectionError
+
+
+def get_form_data(files: dict):
+    """ Build the multipart body of [files], given as for requests: field name -> file or (filename, file or content
+    [, content type])
+    :param files:
+    :return: aiohttp.FormData
+    """
+    form_data = aiohttp.FormData()
+    for name, value in files.items():
+        filename, content, content_type = None, value, None
+        if isinstance(value, (tuple, list)):
+            filename, content = value[0], value[1]
+            content_type = value[2] if len(value) > 2 else None
+        elif hasattr(value, 'name'):
+            filename = os.path.basename(value.name)
+        # the same file may be sent again, on a retry or a token refresh
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        form_data.add_field(name, content, filename=filename, content_type=content_type)
+    return form_data
+
+
+async def rest_request(method: str, path, stream=False, files=None, **kwargs):
+    """ Execute a [method] HTTP query to [path] endpoint, within the adaptive concurrency limit of the asyncio client
+    :param method:
+    :param path:
+    :param stream: when True, the body is not read and the response must be released by the caller
+    :param files: multipart fields, see get_form_data
+    :param kwargs:
+    :return: AsyncResponse
+    """
+    url = APIContext.scheme + "://" + APIContext.domain + "/shanoir-ng" + path
+    if method not in ('get', 'post', 'put'):
+        logger.error('Error: unimplemented request type')
+        return None
+
+    # aiohttp does not accept None values in query parameters
+    if kwargs.get('params') is not None:
+        kwargs['params'] = {key: str(value) for key, value in kwargs['params'].items() if value is not None}
+    if files is not None:
+        kwargs['data'] = get_form_data(files)
+        # the multipart content type, with its boundary, is set by aiohttp
+        kwargs['headers'] = {key: value for key, value in kwargs['headers'].items() if key.lower() != 'content-type'}
+    body = kwargs.get('data') if isinstance(kwargs.get('data'), (str, bytes)) else \
+        json.dumps(kwargs['json']) if kwargs.get('json') is not None else None
+
+    request_limiter = limiter
+    async with semaphore:
+        start = await request_limiter.acquire_async() if request_limiter is not None else time.perf_counter()
+        response, status_code, overloaded = None, None, False
+        try:
+            raw = await get_async_session().request(method, url, proxy=get_proxy(), **kwargs)
+            status_code = raw.status
+            if stream:
+                response = AsyncResponse(raw, body=body)
+            else:
+                try:
+                    response = AsyncResponse(raw, await raw.read(), body)
+                finally:
+                    raw.release()
+            return response
+        except get_transient_errors():
+            overloaded = True
+            raise
+        finally:
+            if request_limiter is not None:
+                await request_limiter.release_async(start, status_code, overloaded)
+            if MetricsContext.enabled:
+                record_call('shanoir', method, path, response, time.perf_counter() - start, stream)
+
+
+async def authenticated_request(method, path, content_type=None, stream=False, **kwargs):
+    """ Execute a [method] HTTP query to [path] endpoint, refreshing the access token once if it is outdated
+    :param method:
+    :param path:
+    :param content_type:
+    :param stream:
+    :param kwargs:
+    :return: AsyncResponse
+    """
+    loop = asyncio.get_running_loop()
+    if APIContext.access_token is None:
+        await loop.run_in_executor(None, ensure_access_token)
+    start_token_renewal()
+
+    access_token = APIContext.access_token
+    response = await rest_request(method, path, stream=stream, headers=get_http_headers(content_type, access_token),
+                                  **kwargs)
+
+    # if the token is outdated, refresh it (once for all threads and tasks) and try again
+    if response.status_code == 401:
+        response.release()
+        await loop.run_in_executor(None, refresh_expired_access_token, access_token)
+        response = await rest_request(method, path, stream=stream, headers=get_http_headers(content_type), **kwargs)
+
+    return response
+
+
+async def request(method, path, raise_for_status=True, content_type=None, stream=False, idempotent=None, **kwargs):
+    """ Authenticate / Re-authenticate user [APIContext.username] and execute a [method] HTTP query to [path] endpoint,
+    through the circuit breaker and retry policy of the synchronous client
+    :param method:
+    :param path:
+    :param raise_for_status:
+    :param content_type:
+    :param stream:
+    :param idempotent: force (True) or forbid (False) retries, by default only non-POST queries are retried
+    :param kwargs:
+    :return: AsyncResponse
+    """
+    get_async_session()
+    kwargs = {key: value for key, value in kwargs.items() if value is not None}
+    response = await call_with_retry_async(method, lambda: authenticated_request(method, path, content_type, stream,
+                                                                                 **kwargs),
+                                           idempotent, get_transient_errors())
+
+    if raise_for_status:
+        response.raise_for_status()
+
+    return response
+
+
+async def get(path: str, params=None, stream=None):
+    """ Perform a GET HTTP request on [path] endpoint with given [params]
+    :param path: string
+    :param params:
+    :param stream:
+    :return:
+    """
+    return await request('get', path, params=params, stream=bool(stream))
+
+
+async def post(path: str, params=None, files=None, stream=None, json=None, data=None,
+               raise_for_status=True, content_type=None, idempotent=None):
+    """ Perform a POST HTTP request on [path] endpoint with given [params]/[files]/[stream] /[data]
+    :param path:
+    :param params:
+    :param files: multipart fields, see get_form_data
+    :param stream:
+    :param json:
+    :param data:
+    :param raise_for_status:
+    :param content_type:
+    :param idempotent: True if the POST has no side effect (search, download) and can be retried
+    :return:
+    """
+    return await request('post', path, raise_for_status, content_type, bool(stream), idempotent, params=params,
+                         files=files, json=json, data=data)
+
+
+async def put(path: str, params=None, files=None, stream=None, json=None, data=None,
+              raise_for_status=True):
+    """ Perform a PUT HTTP request on [path] endpoint with given [params]/[stream] /[data]
+    :param path:
+    :param params:
+    :param files: multipart fields, see get_form_data
+    :param stream:
+    :param json:
+    :param data:
+    :param raise_for_status:
+    :return:
+    """
+    return await request('put', path, raise_for_status, stream=bool(stream), params=params, files=files, json=json,
+                         data=data)
+
+
+async def download_file(output_folder, response: AsyncResponse, unzip):
+    """ Write the (streamed) [response] body into [output_folder], then unzip it if asked
+    :param output_folder:
+    :param response:
+    :param unzip:
+    :return:
+    """
+    try:
+        filename = get_filename_from_response(output_folder, response)
+        if not filename:
+            return
+        with open(filename, 'wb') as file:
+            async for data in response.iter_content(chunk_size=65536):
+                file.write(data)
+    finally:
+        response.release()
+    if unzip:
+        with zipfile.ZipFile(filename, 'r') as zip_ref:
+            zip_ref.extractall(output_folder)
+        os.remove(filename)
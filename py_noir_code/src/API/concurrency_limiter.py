@@ -0,0 +1,195 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+from py_noir_code.src.API.api_context import APIContext
+from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.utils.log_utils import get_logger
+from py_noir_code.src.utils.stats_utils import percentile
+
+"""
+Define an adaptive (AIMD) limiter of the number of Shanoir requests in flight
+"""
+
+logger = get_logger()
+
+# HTTP statuses meaning that the server is overloaded
+OVERLOAD_STATUSES = (429, 502, 503, 504)
+
+
+class AIMDLimiter(object):
+    """
+    Additive increase / multiplicative decrease concurrency limit.
+    The limit grows by one every [limit] successful calls while latency stays close to its baseline,
+    and is multiplied by [backoff_ratio] on overload statuses, timeouts or when latency rises.
+    The baseline is a slow moving average of the latency, compared with a fast one, so that a stable mix of quick
+    (status) and slow (creation, download) calls is seen as flat.
+    """
+
+    def __init__(self, initial_limit: int, min_limit: int, max_limit: int, latency_tolerance: float = 2.0,
+                 backoff_ratio: float = 0.7):
+        self.min_limit = max(min_limit, 1)
+        self.max_limit = max(max_limit, self.min_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self.in_flight = 0
+        self.condition = threading.Condition()
+        self.latencies = deque(maxlen=1000)
+        self.smoothed_latency = None
+        self.baseline_latency = None
+        self.last_decrease = 0.0
+        self.nb_increases = 0
+        self.nb_decreases = 0
+
+    def acquire(self):
+        """ Block until a slot is available under the current limit
+        :return: the acquisition time, to be given back to release()
+        """
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+        return time.perf_counter()
+
+    def try_acquire(self):
+        """ Take a slot if one is available under the current limit, without blocking (e.g. from an event loop)
+        :return: the acquisition time, to be given back to release(), None if no slot is available
+        """
+        with self.condition:
+            if self.in_flight >= int(self.limit):
+                return None
+            self.in_flight += 1
+        return time.perf_counter()
+
+    def release(self, start: float, status_code: int = None, overloaded: bool = False):
+        """ Free the slot taken at [start] and adapt the limit from the call outcome
+        :param start: value returned by acquire()
+        :param status_code: HTTP status of the response, None if the call failed
+        :param overloaded: True if the call failed on a timeout / connection error
+        :return:
+        """
+        latency = time.perf_counter() - start
+        with self.condition:
+            self.in_flight -= 1
+            overloaded = overloaded or status_code in OVERLOAD_STATUSES
+            if not overloaded:
+                self.latencies.append(latency)
+                self.smoothed_latency = latency if self.smoothed_latency is None \
+                    else 0.8 * self.smoothed_latency + 0.2 * latency
+                self.baseline_latency = latency if self.baseline_latency is None \
+                    else 0.98 * self.baseline_latency + 0.02 * latency
+
+            if overloaded or self.is_latency_rising():
+                self.decrease()
+            else:
+                self.limit = min(self.limit + 1 / self.limit, float(self.max_limit))
+                self.nb_increases += 1
+            self.condition.notify_all()
+
+    def is_latency_rising(self) -> bool:
+        """ Compare the fast moving latency average with the slow one
+        :return:
+        """
+        if self.smoothed_latency is None or len(self.latencies) < 10:
+            return False
+        return self.smoothed_latency > self.latency_tolerance * max(self.baseline_latency, 0.001)
+
+    def decrease(self):
+        """ Cut the limit, at most once per smoothed latency period so that one burst of errors cuts it only once
+        :return:
+        """
+        now = time.perf_counter()
+        if now - self.last_decrease < (self.smoothed_latency or 0.1):
+            return
+        self.last_decrease = now
+        previous_limit = int(self.limit)
+        self.limit = max(self.limit * self.backoff_ratio, float(self.min_limit))
+        self.nb_decreases += 1
+        if int(self.limit) != previous_limit:
+            logger.debug("Shanoir concurrency limit decreased to %s" % int(self.limit))
+
+    def get_stats(self) -> dict:
+        """ Get the current limit and latency percentiles (in seconds) of the recent calls
+        :return: dict
+        """
+        with self.condition:
+            latencies = list(self.latencies)
+            return dict(limit=int(self.limit), in_flight=self.in_flight, increases=self.nb_increases,
+                        decreases=self.nb_decreases, p50=percentile(latencies, 50), p95=percentile(latencies, 95),
+                        p99=percentile(latencies, 99))
+
+
+class AsyncAIMDLimiter(AIMDLimiter):
+    """
+    AIMD limiter of the asyncio client: the tasks wait for a slot on an asyncio.Condition, which binds it to the event
+    loop of its first use
+    """
+
+    def __init__(self, initial_limit: int, min_limit: int, max_limit: int, latency_tolerance: float = 2.0,
+                 backoff_ratio: float = 0.7):
+        super().__init__(initial_limit, min_limit, max_limit, latency_tolerance, backoff_ratio)
+        self.async_condition = asyncio.Condition()
+
+    async def acquire_async(self) -> float:
+        """ Wait, without blocking the event loop, until a slot is available under the current limit
+        :return: the acquisition time, to be given back to release_async()
+        """
+        async with self.async_condition:
+            await self.async_condition.wait_for(lambda: self.in_flight < int(self.limit))
+            with self.condition:
+                self.in_flight += 1
+        return time.perf_counter()
+
+    async def release_async(self, start: float, status_code: int = None, overloaded: bool = False):
+        """ Free the slot taken at [start], adapt the limit from the call outcome and wake up the tasks it lets through
+        :param start: value returned by acquire_async()
+        :param status_code: HTTP status of the response, None if the call failed
+        :param overloaded: True if the call failed on a timeout / connection error
+        :return:
+        """
+        self.release(start, status_code, overloaded)
+        async with self.async_condition:
+            self.async_condition.notify(max(int(self.limit) - self.in_flight, 0))
+
+
+limiter: AIMDLimiter = None
+limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """ Return the limiter shared by all Shanoir calls, built on first use from [APIContext], None if disabled
+    :return: AIMDLimiter
+    """
+    global limiter
+    if not APIContext.adaptive_concurrency:
+        return None
+    if limiter is None:
+        with limiter_lock:
+            if limiter is None:
+                initial_limit = ExecutionContext.max_thread + 1 if ExecutionContext.max_thread else \
+                    APIContext.min_concurrency
+                limiter = AIMDLimiter(initial_limit, APIContext.min_concurrency, APIContext.max_concurrency)
+    return limiter
+
+
+def get_limiter_stats() -> dict:
+    """ Get the current concurrency limit and latency percentiles, an empty dict if the limiter is not used
+    :return: dict
+    """
+    return limiter.get_stats() if limiter is not None else {}
+
+
+def log_limiter_stats(current_limiter: AIMDLimiter = None, client: str = "Shanoir"):
+    """ Log the current concurrency limit and latency percentiles
+    :param current_limiter: the limiter shared by the threads by default
+    :param client: name of the limited client, for the log
+    :return:
+    """
+    stats = current_limiter.get_stats() if current_limiter is not None else get_limiter_stats()
+    if not stats or stats['p50'] is None:
+        return
+    logger.info(client + " concurrency limit %s (%s increases, %s decreases), latency p50 %.3f s, p95 %.3f s, "
+                "p99 %.3f s" % (stats['limit'], stats['increases'], stats['decreases'], stats['p50'], stats['p95'],
+                                stats['p99']))
@@ -0,0 +1,256 @@
+import asyncio
+import random
+import threading
+import time
+
+from requests.exceptions import RequestException, Timeout, ConnectionError
+
+from py_noir_code.src.API.api_context import APIContext
+from py_noir_code.src.utils.log_utils import get_logger
+
+"""
+Define the retry policy (exponential backoff with jitter) and the per-host circuit breaker of Shanoir calls
+"""
+
+logger = get_logger()
+
+# HTTP methods that can be replayed without side effects
+IDEMPOTENT_METHODS = ('get', 'put', 'delete', 'head', 'options')
+# HTTP statuses worth a retry
+RETRYABLE_STATUSES = (429, 502, 503, 504)
+# Never wait more than this between two attempts, whatever the backoff or the Retry-After header
+MAX_BACKOFF = 60
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitOpenError(RequestException):
+    """
+    Raised without calling the server when its circuit breaker is open
+    """
+
+
+class CircuitBreaker(object):
+    """
+    Per-host circuit breaker: opens after [failure_threshold] consecutive failures, rejects calls for [reset_timeout]
+    seconds, then lets a single probe call through (half-open) which closes or re-opens it.
+    """
+
+    def __init__(self, host: str, failure_threshold: int, reset_timeout: float):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.nb_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.lock = threading.Lock()
+        self.transitions = {OPEN: 0, HALF_OPEN: 0, CLOSED: 0}
+        self.nb_rejected = 0
+
+    def before_call(self):
+        """ Raise CircuitOpenError if the call must not reach the host
+        :return:
+        """
+        with self.lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.set_state(HALF_OPEN)
+            if self.state == OPEN or (self.state == HALF_OPEN and self.probe_in_flight):
+                self.nb_rejected += 1
+                raise CircuitOpenError("Circuit breaker open for %s, retry in %.0f s" % (
+                    self.host, self.get_remaining_open_time()))
+            if self.state == HALF_OPEN:
+                self.probe_in_flight = True
+
+    def record_success(self):
+        with self.lock:
+            self.nb_failures = 0
+            self.probe_in_flight = False
+            if self.state != CLOSED:
+                self.set_state(CLOSED)
+
+    def record_failure(self):
+        with self.lock:
+            self.nb_failures += 1
+            self.probe_in_flight = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.nb_failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self.set_state(OPEN)
+
+    def cancel_call(self):
+        """ Forget a call that failed for a reason unrelated to the host health
+        :return:
+        """
+        with self.lock:
+            self.probe_in_flight = False
+
+    def get_remaining_open_time(self) -> float:
+        return max(self.reset_timeout - (time.monotonic() - self.opened_at), 0) if self.state == OPEN else 0
+
+    def set_state(self, state: str):
+        """ Change the breaker state, must be called while holding [lock]
+        :param state:
+        :return:
+        """
+        log = logger.warning if state == OPEN else logger.info
+        log("Circuit breaker for %s: %s -> %s" % (self.host, self.state, state))
+        self.state = state
+        self.transitions[state] += 1
+
+
+breakers = {}
+breakers_lock = threading.Lock()
+retry_stats = dict(retries=0, gave_up=0)
+retry_stats_lock = threading.Lock()
+
+
+def get_circuit_breaker(host: str) -> CircuitBreaker:
+    """ Return the circuit breaker of [host], built on first use from [APIContext]
+    :param host:
+    :return:
+    """
+    breaker = breakers.get(host)
+    if breaker is None:
+        with breakers_lock:
+            breaker = breakers.setdefault(host, CircuitBreaker(host, APIContext.breaker_failure_threshold,
+                                                               APIContext.breaker_reset_timeout))
+    return breaker
+
+
+def is_retryable(method: str, idempotent: bool = None) -> bool:
+    """ A call is retried if it is idempotent: explicitly, or by its HTTP [method]
+    :param method:
+    :param idempotent: overrides the method based decision (e.g. True for a POST search)
+    :return:
+    """
+    return idempotent if idempotent is not None else method.lower() in IDEMPOTENT_METHODS
+
+
+def get_backoff(attempt: int, response=None) -> float:
+    """ Get the wait before retry [attempt] (starting at 0): the Retry-After header if any,
+    otherwise an exponential backoff with full jitter
+    :param attempt:
+    :param response:
+    :return:
+    """
+    if response is not None and response.headers is not None:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is not None and str(retry_after).isdigit():
+            return min(float(retry_after), MAX_BACKOFF)
+    return random.uniform(0, min(APIContext.retry_backoff * (2 ** attempt), MAX_BACKOFF))
+
+
+def call_with_retry(method: str, call, idempotent: bool = None):
+    """ Execute [call] (returning a response) through the host circuit breaker, retrying retryable failures
+    of idempotent requests
+    :param method: HTTP method of the call
+    :param call: function executing the request
+    :param idempotent:
+    :return: the response
+    """
+    breaker = get_circuit_breaker(APIContext.domain)
+    max_attempts = APIContext.max_retries + 1 if is_retryable(method, idempotent) else 1
+
+    for attempt in range(max_attempts):
+        breaker.before_call()
+        try:
+            response = call()
+        except (Timeout, ConnectionError) as e:
+            breaker.record_failure()
+            if attempt + 1 >= max_attempts:
+                count_retry('gave_up')
+                raise
+            backoff = get_backoff(attempt)
+            logger.warning("%s call failed (%s), retry %s/%s in %.1f s" % (method.upper(), e, attempt + 1,
+                                                                             max_attempts - 1, backoff))
+        except Exception:
+            breaker.cancel_call()
+            raise
+        else:
+            if response is None or response.status_code not in RETRYABLE_STATUSES:
+                breaker.record_success()
+                return response
+            breaker.record_failure()
+            if attempt + 1 >= max_attempts:
+                count_retry('gave_up')
+                return response
+            backoff = get_backoff(attempt, response)
+            logger.warning("%s %s returned %s, retry %s/%s in %.1f s" % (method.upper(), response.url,
+                                                                           response.status_code, attempt + 1,
+                                                                           max_attempts - 1, backoff))
+        count_retry('retries')
+        time.sleep(backoff)
+
+
+async def call_with_retry_async(method: str, call, idempotent: bool = None, transient_errors=(Timeout, ConnectionError)):
+    """ Asyncio counterpart of [call_with_retry]: await [call]() (returning a response) through the host circuit
+    breaker, retrying retryable failures of idempotent requests. A discarded response is released.
+    :param method: HTTP method of the call
+    :param call: function returning the request coroutine
+    :param idempotent:
+    :param transient_errors: exceptions of the HTTP client meaning a timeout or a connection error
+    :return: the response
+    """
+    breaker = get_circuit_breaker(APIContext.domain)
+    max_attempts = APIContext.max_retries + 1 if is_retryable(method, idempotent) else 1
+
+    for attempt in range(max_attempts):
+        breaker.before_call()
+        try:
+            response = await call()
+        except transient_errors as e:
+            breaker.record_failure()
+            if attempt + 1 >= max_attempts:
+                count_retry('gave_up')
+                raise
+            backoff = get_backoff(attempt)
+            logger.warning("%s call failed (%s), retry %s/%s in %.1f s" % (method.upper(), e or type(e).__name__,
+                                                                             attempt + 1, max_attempts - 1, backoff))
+        except BaseException:
+            breaker.cancel_call()
+            raise
+        else:
+            if response is None or response.status_code not in RETRYABLE_STATUSES:
+                breaker.record_success()
+                return response
+            breaker.record_failure()
+            if attempt + 1 >= max_attempts:
+                count_retry('gave_up')
+                return response
+            backoff = get_backoff(attempt, response)
+            logger.warning("%s %s returned %s, retry %s/%s in %.1f s" % (method.upper(), response.url,
+                                                                           response.status_code, attempt + 1,
+                                                                           max_attempts - 1, backoff))
+            response.release()
+        count_retry('retries')
+        await asyncio.sleep(backoff)
+
+
+def count_retry(outcome: str):
+    with retry_stats_lock:
+        retry_stats[outcome] += 1
+
+
+def get_retry_stats() -> dict:
+    """ Get the retry counters and the circuit breaker state changes per host
+    :return: dict
+    """
+    with retry_stats_lock:
+        stats = dict(retry_stats)
+    stats['breakers'] = {host: dict(state=breaker.state, rejected=breaker.nb_rejected, **breaker.transitions)
+                         for host, breaker in list(breakers.items())}
+    return stats
+
+
+def log_retry_stats():
+    """ Log the retry counters and the circuit breaker state changes
+    :return:
+    """
+    stats = get_retry_stats()
+    logger.info("Shanoir calls: %s retries, %s given up" % (stats['retries'], stats['gave_up']))
+    for host, breaker_stats in stats['breakers'].items():
+        if breaker_stats[OPEN]:
+            logger.info("Circuit breaker for %s opened %s times, %s calls rejected" % (
+                host, breaker_stats[OPEN], breaker_stats['rejected']))
@@ -0,0 +1,39 @@
+import json
+
+from py_noir_code.src.utils.custom_config_parser import CustomConfigParser
+
+# Time to live (in seconds) of cached responses, per cached endpoint
+DEFAULT_TTLS = {
+    "dataset": 86400,
+    "examination": 86400,
+    # dataset processings change while the pipelines run
+    "dataset_processing": 0,
+    "dicom_metadata": 604800,
+    "subject": 86400
+}
+
+
+class CacheContext(object):
+    """
+    Configuration class for the Shanoir response cache
+    """
+    enabled: bool = True
+    max_entries: int = 10000
+    disk_cache: bool = False
+    max_disk_entries: int = 200000
+    ttls: dict = dict(DEFAULT_TTLS)
+
+    @classmethod
+    def init(cls, config: CustomConfigParser):
+        cls.enabled = ("True" == config.get('Cache context', 'enabled', fallback="True"))
+        cls.max_entries = int(config.get('Cache context', 'max_entries', fallback="10000"))
+        cls.disk_cache = ("True" == config.get('Cache context', 'disk_cache', fallback="False"))
+        cls.max_disk_entries = int(config.get('Cache context', 'max_disk_entries', fallback="200000"))
+        cls.ttls = dict(DEFAULT_TTLS, **json.loads(config.get('Cache context', 'ttls', fallback="{}")))
+
+    def __init__(self, config: CustomConfigParser):
+        self.enabled = ("True" == config.get('Cache context', 'enabled', fallback="True"))
+        self.max_entries = int(config.get('Cache context', 'max_entries', fallback="10000"))
+        self.disk_cache = ("True" == config.get('Cache context', 'disk_cache', fallback="False"))
+        self.max_disk_entries = int(config.get('Cache context', 'max_disk_entries', fallback="200000"))
+        self.ttls = dict(DEFAULT_TTLS, **json.loads(config.get('Cache context', 'ttls', fallback="{}")))
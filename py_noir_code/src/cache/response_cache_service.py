@@ -0,0 +1,220 @@
+import atexit
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from py_noir_code.src.API.api_context import APIContext
+from py_noir_code.src.cache.cache_context import CacheContext
+from py_noir_code.src.utils.file_utils import create_file_path
+from py_noir_code.src.utils.log_utils import get_logger
+
+"""
+Define a read-through cache (in-memory LRU + optional SQLite tier) for immutable Shanoir entities
+"""
+
+logger = get_logger()
+
+
+class MemoryCache(object):
+    """
+    Size-bounded LRU cache of serialized responses with per-entry expiry
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, expires_at: float):
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class DiskCache(object):
+    """
+    Size-bounded SQLite cache of serialized responses, shared across runs
+    """
+
+    def __init__(self, db_path: str, max_entries: int):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS response_cache (key TEXT PRIMARY KEY, value TEXT, "
+                                "expires_at REAL, last_access REAL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS response_cache_last_access "
+                                "ON response_cache (last_access)")
+        self.connection.commit()
+        self.nb_writes = 0
+
+    def get(self, key: str):
+        with self.lock:
+            row = self.connection.execute("SELECT value, expires_at FROM response_cache WHERE key = ?",
+                                          (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at < time.time():
+                self.connection.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self.connection.commit()
+                return None
+            self.connection.execute("UPDATE response_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.connection.commit()
+            return value
+
+    def set(self, key: str, value: str, expires_at: float):
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?)",
+                                    (key, value, expires_at, time.time()))
+            self.nb_writes += 1
+            # Evict by batch, checking the size on every write would cost a full count each time
+            if self.nb_writes % 100 == 0:
+                self.evict()
+            self.connection.commit()
+
+    def evict(self):
+        """ Remove expired entries, then the least recently used ones above [max_entries]
+        """
+        self.connection.execute("DELETE FROM response_cache WHERE expires_at < ?", (time.time(),))
+        overflow = self.connection.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            self.connection.execute("DELETE FROM response_cache WHERE key IN (SELECT key FROM response_cache "
+                                    "ORDER BY last_access LIMIT ?)", (overflow,))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+memory_cache: MemoryCache = None
+disk_cache: DiskCache = None
+cache_init_lock = threading.Lock()
+stats_lock = threading.Lock()
+cache_stats = {}
+
+
+def get_caches():
+    """ Build (once) the cache tiers from [CacheContext]
+    :return: (MemoryCache, DiskCache or None)
+    """
+    global memory_cache, disk_cache
+    if memory_cache is None:
+        with cache_init_lock:
+            if memory_cache is None:
+                if CacheContext.disk_cache:
+                    disk_cache = DiskCache(get_disk_cache_path(), CacheContext.max_disk_entries)
+                memory_cache = MemoryCache(CacheContext.max_entries)
+    return memory_cache, disk_cache
+
+
+def get_disk_cache_path() -> str:
+    """ Get the SQLite cache file path, one file per Shanoir instance
+    :return:
+    """
+    cache_path = os.path.dirname(os.path.abspath(__file__)) + "/../../resources/cache/"
+    create_file_path(cache_path)
+    return cache_path + str(APIContext.domain).replace(':', '_') + ".sqlite"
+
+
+def count(endpoint: str, outcome: str):
+    with stats_lock:
+        endpoint_stats = cache_stats.setdefault(endpoint, dict(memory_hits=0, disk_hits=0, misses=0))
+        endpoint_stats[outcome] += 1
+
+
+def cached_response(endpoint: str):
+    """ Decorator caching the JSON result of a Shanoir getter, keyed by [endpoint], instance and call arguments.
+    The entry lives [CacheContext.ttls][endpoint] seconds, a ttl of 0 disables the cache for this endpoint.
+    :param endpoint: name of the cached endpoint
+    :return:
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            ttl = CacheContext.ttls.get(endpoint, 0)
+            if not CacheContext.enabled or ttl <= 0:
+                return function(*args, **kwargs)
+
+            key = "%s|%s|%s|%s" % (APIContext.domain, endpoint, ",".join(str(arg) for arg in args),
+                                   json.dumps(kwargs, sort_keys=True, default=str))
+            memory, disk = get_caches()
+
+            value = memory.get(key)
+            if value is not None:
+                count(endpoint, 'memory_hits')
+                return json.loads(value)
+
+            if disk is not None:
+                value = disk.get(key)
+                if value is not None:
+                    count(endpoint, 'disk_hits')
+                    memory.set(key, value, time.time() + ttl)
+                    return json.loads(value)
+
+            count(endpoint, 'misses')
+            result = function(*args, **kwargs)
+            value = json.dumps(result)
+            expires_at = time.time() + ttl
+            memory.set(key, value, expires_at)
+            if disk is not None:
+                disk.set(key, value, expires_at)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def clear_response_cache():
+    """ Empty the in-memory tier (the disk tier is kept)
+    :return:
+    """
+    if memory_cache is not None:
+        memory_cache.clear()
+
+
+def get_cache_stats() -> dict:
+    """ Get hits / misses counters and hit ratio per cached endpoint
+    :return: dict
+    """
+    with stats_lock:
+        stats = {endpoint: dict(counters) for endpoint, counters in cache_stats.items()}
+    for counters in stats.values():
+        lookups = counters['memory_hits'] + counters['disk_hits'] + counters['misses']
+        counters['hit_ratio'] = (counters['memory_hits'] + counters['disk_hits']) / lookups if lookups else 0
+    return stats
+
+
+def log_cache_stats():
+    """ Log the response cache counters, if it has been used
+    :return:
+    """
+    for endpoint, counters in get_cache_stats().items():
+        logger.info("Response cache %s: %s memory hits, %s disk hits, %s misses (hit ratio %.2f)" % (
+            endpoint, counters['memory_hits'], counters['disk_hits'], counters['misses'], counters['hit_ratio']))
+
+
+atexit.register(log_cache_stats)
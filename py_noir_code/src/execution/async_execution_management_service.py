@@ -0,0 +1,186 @@
+import asyncio
+import time
+
+from py_noir_code.src.API.api_context import APIContext
+from py_noir_code.src.API.async_api_service import set_max_concurrency, close_async_session, get_async_limiter
+from py_noir_code.src.API.concurrency_limiter import log_limiter_stats
+from py_noir_code.src.API.retry_policy import CircuitOpenError, get_circuit_breaker
+from py_noir_code.src.execution.async_execution_service import create_execution, get_execution_status, \
+    get_execution_monitoring, find_monitoring_identifier
+from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.execution.execution_duration_model import get_poll_delay, record_execution_duration
+from py_noir_code.src.execution.execution_failure_service import PERMANENT, is_active_status, is_succeeded_status, \
+    classify_status, classify_creation_failure
+from py_noir_code.src.execution.execution_management_service import get_running_items, get_running_execution, \
+    get_execution_queue, claim_items, get_idle_delay, manage_execution_creation, manage_execution_success, \
+    manage_execution_failure, get_error_messages, get_created_execution_id, get_status_message
+from py_noir_code.src.execution.execution_monitoring_service import STATUS_LOG_PERIOD, MAX_MONITORING_LOOKUPS
+from py_noir_code.src.execution.execution_rate_limiter import get_submission_bucket
+from py_noir_code.src.execution.maintenance_window_service import wait_for_submissions_async, wait_for_polling_async
+from py_noir_code.src.utils.log_utils import get_logger
+
+"""
+Define the asyncio execution engine: the create -> monitor -> success / failure steps of every item run as tasks
+of a single event loop, sharing a few connections
+"""
+
+logger = get_logger()
+
+
+async def monitor_execution(item: dict, execution_id, monitoring_id: str, created_at: float) -> str:
+    """ Poll the status of [monitoring_id] until it is not initializing or running anymore, on the schedule of its
+    pipeline model
+    :param item:
+    :param execution_id:
+    :param monitoring_id: looked up before the first poll if None
+    :param created_at: creation timestamp of the execution
+    :return: the final status
+    """
+    nb_polls = 0
+    nb_errors = 0
+    while True:
+        await asyncio.sleep(get_poll_delay(item.get("pipelineIdentifier"), time.time() - created_at))
+        await wait_for_polling_async()
+        try:
+            if monitoring_id is None:
+                monitoring_id = (await get_execution_monitoring(execution_id))['identifier']
+            status = await get_execution_status(monitoring_id)
+        except CircuitOpenError as e:
+            # Shanoir is unreachable (e.g. reboot window), keep waiting without calling it
+            logger.debug("Status of execution %s not available: %s" % (execution_id, e))
+            await asyncio.sleep(get_circuit_breaker(APIContext.domain).get_remaining_open_time())
+            continue
+        except Exception as e:
+            # tolerate a few consecutive failed polls, the execution is running on VIP
+            nb_errors += 1
+            if nb_errors > (APIContext.max_retries if monitoring_id is not None else MAX_MONITORING_LOOKUPS):
+                raise
+            logger.debug("Status of execution %s not available: %s" % (execution_id, e))
+            continue
+
+        nb_errors = 0
+        nb_polls += 1
+        if not is_active_status(status):
+            return status
+        if nb_polls % STATUS_LOG_PERIOD == 0:
+            logger.info("Status for execution " + str(execution_id) + " is " + status)
+
+
+async def run_blocking(function, *args):
+    """ Run [function] on the default executor, so that the state store, journal and history file writes do not
+    block the event loop
+    :param function:
+    :param args:
+    :return: the result of [function]
+    """
+    return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+
+async def manage_async_execution():
+    """ Create and monitor the pending items executions on the running event loop
+    :return:
+    """
+    set_max_concurrency(APIContext.max_concurrency)
+    creation_slots = asyncio.Semaphore(ExecutionContext.max_thread)
+    running_slots = asyncio.Semaphore(ExecutionContext.max_running_executions) \
+        if ExecutionContext.max_running_executions > 0 else None
+    submission_bucket = get_submission_bucket()
+    tasks = set()
+    logger.info("Starting new executions...")
+
+    async def creation_task(item: dict):
+        execution = None
+        try:
+            try:
+                await wait_for_submissions_async()  # The window may have started while waiting for a slot
+                await submission_bucket.acquire_async()  # Pacing of the creations
+                execution = await create_execution(item)
+                if execution.get('id') is None:
+                    raise ValueError("No execution created for item " + str(item["identifier"]))
+                # From here the execution runs on VIP: it is monitored, even if its monitoring is not found yet
+                monitoring_id = await find_monitoring_identifier(execution["id"])
+            finally:
+                creation_slots.release()
+            await run_blocking(manage_execution_creation, item, execution["id"], monitoring_id)
+            logger.info("Execution " + str(execution['id']) + ", " + str(monitoring_id) + " is created.")
+        except Exception as e:
+            logger.debug("Exception for item " + str(item["identifier"]))
+            await run_blocking(manage_execution_failure, item, *get_error_messages(execution, e),
+                               classify_creation_failure(e, execution), get_created_execution_id(execution))
+            return
+        await monitoring_task(item, get_running_execution(item))
+
+    async def monitoring_task(item: dict, running_execution: dict):
+        execution_id = running_execution["execution_id"]
+        created_at = running_execution.get("created_at") or time.time()
+        try:
+            status = await monitor_execution(item, execution_id, running_execution["monitoring_id"], created_at)
+        except Exception as e:
+            logger.debug("Exception for execution " + str(execution_id))
+            # the execution may still be running on VIP, creating it again could run it twice
+            await run_blocking(manage_execution_failure, item, str(e) + "\n", "", PERMANENT, execution_id)
+            return
+        if not is_succeeded_status(status):
+            logger.debug("Failure for execution " + str(execution_id))
+            await run_blocking(manage_execution_failure, item, get_status_message(execution_id, status), "",
+                               classify_status(status), execution_id, status)
+        else:
+            logger.debug("Success for execution " + str(execution_id))
+            await run_blocking(record_execution_duration, item.get("pipelineIdentifier"), time.time() - created_at)
+            await run_blocking(manage_execution_success, item, execution_id)
+
+    async def run_execution(item: dict, running_execution: dict):
+        try:
+            if running_execution is None:
+                await creation_task(item)
+            else:
+                # created before the script interruption, only its monitoring is resumed
+                logger.info("Resuming monitoring of execution " + str(running_execution["execution_id"]))
+                await monitoring_task(item, running_execution)
+        except Exception:
+            # nothing awaits the task, its failure would only be reported at the garbage collection
+            logger.exception("Processing of item %s failed" % item["identifier"])
+        finally:
+            if running_slots is not None:
+                running_slots.release()
+
+    def start_task(item: dict, running_execution: dict = None):
+        task = asyncio.create_task(run_execution(item, running_execution))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    try:
+        for item, running_execution in get_running_items():
+            if running_slots is not None:
+                await running_slots.acquire()
+            start_task(item, running_execution)
+
+        queue = get_execution_queue()
+        next_claim = 0.0
+        while True:
+            item = queue.pop()
+            if item is not None:
+                await wait_for_submissions_async()
+                await creation_slots.acquire()
+                if running_slots is not None:
+                    await running_slots.acquire()
+                start_task(item)
+                continue
+            if next_claim is not None and time.monotonic() >= next_claim:
+                claimed_running_items, claim_delay = await run_blocking(claim_items, queue)
+                for claimed_item, running_execution in claimed_running_items:
+                    if running_slots is not None:
+                        await running_slots.acquire()
+                    start_task(claimed_item, running_execution)
+                if claim_delay == 0:
+                    continue
+                next_claim = None if claim_delay is None else time.monotonic() + claim_delay
+            idle_delay = get_idle_delay(queue, next_claim)
+            if idle_delay is None:
+                break
+            await asyncio.sleep(idle_delay)
+
+        await asyncio.gather(*tasks)
+    finally:
+        log_limiter_stats(get_async_limiter(), "Shanoir asyncio")
+        await close_async_session()
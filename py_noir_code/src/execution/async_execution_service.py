@@ -0,0 +1,52 @@
+import json
+
+from py_noir_code.src.API.async_api_service import post, get
+from py_noir_code.src.utils.log_utils import get_logger
+
+"""
+Define asyncio counterparts of the Shanoir datasets MS execution API calls
+"""
+
+logger = get_logger()
+
+
+async def create_execution(execution: dict):
+    path = "/datasets/vip/execution/"
+    response = await post(path, {}, data=json.dumps(execution), raise_for_status=False)
+    content = response.json()
+    if response.status_code >= 400 and isinstance(content, dict):
+        # the HTTP status tells whether another attempt is worth it
+        content.setdefault("code", response.status_code)
+    return content
+
+
+async def get_execution_status(execution_monitoring_id: str):
+    """ Get execution status from [execution_monitoring_id]
+    :param execution_monitoring_id:
+    :return: json
+    """
+    path = "/datasets/vip/execution/" + str(execution_monitoring_id) + '/status'
+    response = await get(path)
+    return response.text
+
+
+async def get_execution_monitoring(execution_id: str) -> list:
+    """ Get ExecutionMonitoring relative to an execution [execution_id]
+    :param execution_id:
+    :return: json
+    """
+    path = '/datasets/execution-monitoring/' + str(execution_id)
+    response = await get(path)
+    return response.json()
+
+
+async def find_monitoring_identifier(execution_id: str):
+    """ Get the VIP workflow identifier of the just created execution [execution_id]
+    :param execution_id:
+    :return: the identifier, None if the lookup failed: the execution runs on VIP, its monitoring looks it up again
+    """
+    try:
+        return (await get_execution_monitoring(execution_id))['identifier']
+    except Exception as e:
+        logger.warning("Monitoring of execution %s not found yet: %s" % (execution_id, e))
+        return None
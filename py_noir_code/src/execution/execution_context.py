@@ -10,15 +10,92 @@ class ExecutionContext(object):
     max_thread: int = None
     server_reboot_beginning_hour: int = None
     server_reboot_ending_hour: int = None
+    maintenance_windows: str = None
+    maintenance_drain_lead: float = 0
+    poll_interval: float = 5
+    adaptive_polling: bool = True
+    max_poll_interval: float = 300
+    max_running_executions: int = 0
+    engine: str = "thread"
+    submit_rate: float = 1
+    submit_burst: int = 1
+    state_store: str = "journal"
+    scheduling_policy: str = "lpt"
+    claim_size: int = 10
+    lease_duration: float = 300
+    max_attempts: int = 3
+    retry_delay: float = 60
+    skip_succeeded: bool = True
+    working_file_compression: str = "none"
+    stream_buffer_size: int = 100
+    hook_threads: int = 2
 
     @classmethod
     def init(cls, config: CustomConfigParser):
         cls.max_thread = int(config.get('Execution context', 'max_thread'))
-        cls.server_reboot_beginning_hour = int(config.get('Execution context', 'server_reboot_beginning_hour'))
-        cls.server_reboot_ending_hour = int(config.get('Execution context', 'server_reboot_ending_hour'))
+        # former reboot hours option names, still read when the current ones are not set
+        cls.server_reboot_beginning_hour = int(config.get('Execution context', 'server_reboot_beginning_hour',
+                                                          fallback=config.get('Execution context',
+                                                                              'server_reboot_hour_beginning',
+                                                                              fallback="-1")))
+        cls.server_reboot_ending_hour = int(config.get('Execution context', 'server_reboot_ending_hour',
+                                                       fallback=config.get('Execution context',
+                                                                           'server_reboot_hour_ending',
+                                                                           fallback="-1")))
+        cls.maintenance_windows = config.get('Execution context', 'maintenance_windows', fallback=None)
+        cls.maintenance_drain_lead = float(config.get('Execution context', 'maintenance_drain_lead', fallback="0"))
+        cls.poll_interval = float(config.get('Execution context', 'poll_interval', fallback="5"))
+        cls.adaptive_polling = ("True" == config.get('Execution context', 'adaptive_polling', fallback="True"))
+        cls.max_poll_interval = float(config.get('Execution context', 'max_poll_interval', fallback="300"))
+        cls.max_running_executions = int(config.get('Execution context', 'max_running_executions', fallback="0"))
+        cls.engine = config.get('Execution context', 'engine', fallback="thread")
+        # former pacing option, seconds between two execution creations
+        submission_interval = float(config.get('Execution context', 'submission_interval', fallback="1"))
+        cls.submit_rate = float(config.get('Execution context', 'submit_rate',
+                                           fallback=str(1 / submission_interval if submission_interval > 0 else 0)))
+        cls.submit_burst = int(config.get('Execution context', 'submit_burst', fallback="1"))
+        cls.state_store = config.get('Execution context', 'state_store', fallback="journal")
+        cls.scheduling_policy = config.get('Execution context', 'scheduling_policy', fallback="lpt")
+        cls.claim_size = int(config.get('Execution context', 'claim_size', fallback="10"))
+        cls.lease_duration = float(config.get('Execution context', 'lease_duration', fallback="300"))
+        cls.max_attempts = int(config.get('Execution context', 'max_attempts', fallback="3"))
+        cls.retry_delay = float(config.get('Execution context', 'retry_delay', fallback="60"))
+        cls.skip_succeeded = ("True" == config.get('Execution context', 'skip_succeeded', fallback="True"))
+        cls.working_file_compression = config.get('Execution context', 'working_file_compression', fallback="none")
+        cls.stream_buffer_size = int(config.get('Execution context', 'stream_buffer_size', fallback="100"))
+        cls.hook_threads = int(config.get('Execution context', 'hook_threads', fallback="2"))
 
     def __init__(self, config: CustomConfigParser):
         self.max_thread = int(config.get('Execution context', 'max_thread'))
-        self.server_reboot_beginning_hour = int(config.get('Execution context', 'server_reboot_beginning_hour'))
-        self.server_reboot_ending_hour = int(config.get('Execution context', 'server_reboot_ending_hour'))
+        # former reboot hours option names, still read when the current ones are not set
+        self.server_reboot_beginning_hour = int(config.get('Execution context', 'server_reboot_beginning_hour',
+                                                           fallback=config.get('Execution context',
+                                                                               'server_reboot_hour_beginning',
+                                                                               fallback="-1")))
+        self.server_reboot_ending_hour = int(config.get('Execution context', 'server_reboot_ending_hour',
+                                                        fallback=config.get('Execution context',
+                                                                            'server_reboot_hour_ending',
+                                                                            fallback="-1")))
+        self.maintenance_windows = config.get('Execution context', 'maintenance_windows', fallback=None)
+        self.maintenance_drain_lead = float(config.get('Execution context', 'maintenance_drain_lead', fallback="0"))
+        self.poll_interval = float(config.get('Execution context', 'poll_interval', fallback="5"))
+        self.adaptive_polling = ("True" == config.get('Execution context', 'adaptive_polling', fallback="True"))
+        self.max_poll_interval = float(config.get('Execution context', 'max_poll_interval', fallback="300"))
+        self.max_running_executions = int(config.get('Execution context', 'max_running_executions', fallback="0"))
+        self.engine = config.get('Execution context', 'engine', fallback="thread")
+        # former pacing option, seconds between two execution creations
+        submission_interval = float(config.get('Execution context', 'submission_interval', fallback="1"))
+        self.submit_rate = float(config.get('Execution context', 'submit_rate',
+                                           fallback=str(1 / submission_interval if submission_interval > 0 else 0)))
+        self.submit_burst = int(config.get('Execution context', 'submit_burst', fallback="1"))
+        self.state_store = config.get('Execution context', 'state_store', fallback="journal")
+        self.scheduling_policy = config.get('Execution context', 'scheduling_policy', fallback="lpt")
+        self.claim_size = int(config.get('Execution context', 'claim_size', fallback="10"))
+        self.lease_duration = float(config.get('Execution context', 'lease_duration', fallback="300"))
+        self.max_attempts = int(config.get('Execution context', 'max_attempts', fallback="3"))
+        self.retry_delay = float(config.get('Execution context', 'retry_delay', fallback="60"))
+        self.skip_succeeded = ("True" == config.get('Execution context', 'skip_succeeded', fallback="True"))
+        self.working_file_compression = config.get('Execution context', 'working_file_compression', fallback="none")
+        self.stream_buffer_size = int(config.get('Execution context', 'stream_buffer_size', fallback="100"))
+        self.hook_threads = int(config.get('Execution context', 'hook_threads', fallback="2"))
 
@@ -0,0 +1,169 @@
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+
+from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.utils.file_utils import create_file_path
+from py_noir_code.src.utils.log_utils import get_logger
+
+"""
+Define the per-pipeline execution duration model learned from past runs, and the status polling schedule derived from it
+"""
+
+logger = get_logger()
+
+# Number of durations needed before trusting the model of a pipeline
+MIN_SAMPLES = 3
+# Outside of the expected end window, wait this fraction of the elapsed time before the next poll
+BACKOFF_RATIO = 0.25
+# The expected end window is the mean duration +/- this many standard deviations
+WINDOW_DEVIATIONS = 2
+# Minimum half-width of the window, as a fraction of the mean duration
+MIN_WINDOW_RATIO = 0.1
+# Inside the window, wait this fraction of the duration standard deviation between two polls
+WINDOW_POLL_RATIO = 0.05
+# Minimum delay between two writes of the history file
+SAVE_PERIOD = 30
+
+durations = None
+durations_lock = threading.Lock()
+last_save = 0.0
+
+
+class DurationStats(object):
+    """
+    Running mean and variance (Welford) of the durations of one pipeline
+    """
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, duration: float):
+        self.count += 1
+        delta = duration - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (duration - self.mean)
+
+    def get_deviation(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def to_dict(self) -> dict:
+        return dict(count=self.count, mean=self.mean, m2=self.m2)
+
+
+def get_history_file_name() -> str:
+    history_path = os.path.dirname(os.path.abspath(__file__)) + "/../../resources/execution_history/"
+    create_file_path(history_path)
+    return history_path + "pipeline_durations.json"
+
+
+def get_durations() -> dict:
+    """ Load (once) the durations history
+    :return: dict pipelineIdentifier -> DurationStats
+    """
+    global durations
+    if durations is None:
+        with durations_lock:
+            if durations is None:
+                history = {}
+                history_file_name = get_history_file_name()
+                if os.path.exists(history_file_name):
+                    try:
+                        with open(history_file_name, "r") as history_file:
+                            history = json.load(history_file)
+                    except ValueError:
+                        logger.warning("Ignoring corrupted execution durations history " + history_file_name)
+                durations = {pipeline: DurationStats(**stats) for pipeline, stats in history.items()}
+    return durations
+
+
+def save_duration_history():
+    """ Write the durations history, atomically
+    :return:
+    """
+    global last_save
+    pipeline_durations = get_durations()
+    with durations_lock:
+        history = {pipeline: stats.to_dict() for pipeline, stats in pipeline_durations.items()}
+        last_save = time.monotonic()
+    history_file_name = get_history_file_name()
+    # a temporary file of its own, several processes may save the history at once
+    fd, tmp_file_name = tempfile.mkstemp(dir=os.path.dirname(history_file_name), prefix="pipeline_durations.",
+                                         suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as history_file:
+            json.dump(history, history_file, indent=4)
+        os.replace(tmp_file_name, history_file_name)
+    except BaseException:
+        os.remove(tmp_file_name)
+        raise
+
+
+def record_execution_duration(pipeline: str, duration: float):
+    """ Add the [duration] of a succeeded execution of [pipeline] to the history
+    :param pipeline: pipelineIdentifier of the execution
+    :param duration: seconds between the creation and the detected end of the execution
+    :return:
+    """
+    if not pipeline:
+        return
+    pipeline_durations = get_durations()
+    with durations_lock:
+        pipeline_durations.setdefault(pipeline, DurationStats()).add(duration)
+        save_needed = time.monotonic() - last_save > SAVE_PERIOD
+    if save_needed:
+        save_duration_history()
+
+
+def get_expected_duration(pipeline: str):
+    """ Get the mean duration of [pipeline] executions
+    :param pipeline:
+    :return: seconds, None if the pipeline history is too short
+    """
+    stats = get_durations().get(pipeline)
+    return stats.mean if stats is not None and stats.count >= MIN_SAMPLES else None
+
+
+def get_expected_end_window(pipeline: str):
+    """ Get the interval of elapsed times in which an execution of [pipeline] is expected to end
+    :param pipeline:
+    :return: (start, end, half width) in seconds, None if the pipeline history is too short
+    """
+    stats = get_durations().get(pipeline)
+    if stats is None or stats.count < MIN_SAMPLES:
+        return None
+    half_width = max(WINDOW_DEVIATIONS * stats.get_deviation(), MIN_WINDOW_RATIO * stats.mean)
+    return max(stats.mean - half_width, 0), stats.mean + half_width, half_width
+
+
+def get_poll_delay(pipeline: str, elapsed: float) -> float:
+    """ Get the delay before the next status poll of an execution of [pipeline] running for [elapsed] seconds:
+    a small fraction of the duration deviation inside the expected end window, otherwise a fraction of the elapsed
+    time, never overshooting the window start. Delays are bounded by [ExecutionContext.poll_interval] and
+    [ExecutionContext.max_poll_interval]. Without history for [pipeline], the delay is [ExecutionContext.poll_interval].
+    :param pipeline:
+    :param elapsed:
+    :return: seconds
+    """
+    poll_interval = ExecutionContext.poll_interval
+    if not ExecutionContext.adaptive_polling:
+        return poll_interval
+
+    window = get_expected_end_window(pipeline)
+    if window is None:
+        # nothing tells when the execution ends, backing off could detect its end minutes late
+        return poll_interval
+    backoff = min(max(elapsed * BACKOFF_RATIO, poll_interval), ExecutionContext.max_poll_interval)
+    start, end, half_width = window
+    if elapsed < start:
+        return max(min(backoff, start - elapsed), poll_interval)
+    if elapsed <= end:
+        return min(max(half_width / WINDOW_DEVIATIONS * WINDOW_POLL_RATIO, poll_interval),
+                   ExecutionContext.max_poll_interval)
+    # overdue: back off relatively to the time spent after the window
+    return min(max((elapsed - end) * BACKOFF_RATIO, poll_interval), ExecutionContext.max_poll_interval)
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import random
+
+from requests.exceptions import RequestException, HTTPError
+
+from py_noir_code.src.execution.execution_context import ExecutionContext
+
+"""
+Define the classification of the execution failures: transient ones (worth another attempt) or permanent ones,
+from the HTTP status, the exception type or the VIP status
+"""
+
+TRANSIENT = "transient"
+PERMANENT = "permanent"
+
+# HTTP statuses of a creation worth another attempt
+TRANSIENT_HTTP_STATUSES = (408, 425, 429, 500, 502, 503, 504)
+
+# VIP (Carmin) execution statuses
+ACTIVE_STATUSES = ("Initializing", "Ready", "Running")
+SUCCEEDED_STATUSES = ("Finished",)
+# VIP failures not due to the execution inputs; any other status (ExecutionFailed, Killed...) is permanent
+TRANSIENT_STATUSES = ("InitializationFailed", "Unknown")
+
+# Never wait more than this before another attempt
+MAX_RETRY_DELAY = 3600
+
+
+def get_vip_status(status: str) -> str:
+    """ Get the VIP status from the status endpoint answer, a JSON string (e.g. '"Running"')
+    :param status:
+    :return:
+    """
+    return (status or "").strip().strip('"')
+
+
+def is_active_status(status: str) -> bool:
+    return get_vip_status(status) in ACTIVE_STATUSES
+
+
+def is_succeeded_status(status: str) -> bool:
+    return get_vip_status(status) in SUCCEEDED_STATUSES
+
+
+def classify_status(status: str) -> str:
+    """ Classify the failed VIP execution status [status]
+    :param status:
+    :return: TRANSIENT or PERMANENT
+    """
+    return TRANSIENT if get_vip_status(status) in TRANSIENT_STATUSES else PERMANENT
+
+
+def classify_http_status(status_code: int) -> str:
+    return TRANSIENT if status_code in TRANSIENT_HTTP_STATUSES else PERMANENT
+
+
+def classify_exception(exception: Exception) -> str:
+    """ Classify a failure from the [exception] raised by a Shanoir call
+    :param exception:
+    :return: TRANSIENT or PERMANENT
+    """
+    if isinstance(exception, HTTPError):
+        response = exception.response
+        return classify_http_status(response.status_code) if response is not None else TRANSIENT
+    if isinstance(exception, (RequestException, asyncio.TimeoutError, ConnectionError, TimeoutError)):
+        # timeouts, connection errors, open circuit breaker, truncated bodies...
+        return TRANSIENT
+    if isinstance(exception, json.JSONDecodeError):
+        # an error page instead of a JSON body, usually from a gateway in front of a rebooting Shanoir
+        return TRANSIENT
+    if type(exception).__module__.startswith("aiohttp"):
+        return TRANSIENT
+    return PERMANENT
+
+
+def classify_creation_failure(exception: Exception, response) -> str:
+    """ Classify a failed execution creation from the error [response] of Shanoir, if any, otherwise from [exception]
+    :param exception:
+    :param response: JSON answer of the creation request
+    :return: TRANSIENT or PERMANENT
+    """
+    if isinstance(response, dict) and response.get("id") is not None:
+        # the execution exists on VIP, another attempt would run it twice
+        return PERMANENT
+    if isinstance(response, dict) and str(response.get("code", "")).isdigit():
+        return classify_http_status(int(response["code"]))
+    return classify_exception(exception)
+
+
+def get_retry_delay(attempts: int) -> float:
+    """ Get the wait before attempt [attempts] + 1 of an item: an exponential backoff from
+    [ExecutionContext.retry_delay], with jitter so that items failed together are not retried together
+    :param attempts: number of failed attempts
+    :return: seconds
+    """
+    delay = min(ExecutionContext.retry_delay * (2 ** max(attempts - 1, 0)), MAX_RETRY_DELAY)
+    return random.uniform(delay / 2, delay)
@@ -0,0 +1,92 @@
+import threading
+from concurrent.futures.thread import ThreadPoolExecutor
+
+from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.utils.log_utils import get_logger
+
+"""
+Define the completion hooks: callbacks run as soon as an item succeeds or fails, in their own pool of threads, so that
+the post-processing of the ended executions overlaps with the executions still running
+"""
+
+logger = get_logger()
+
+
+class CompletionHooks(object):
+    """
+    Runs [on_success](item, execution_id) and [on_failure](item, error) on at most [nb_workers] threads. An exception
+    raised by a callback is logged, it does not change the item status.
+    """
+
+    def __init__(self, on_success=None, on_failure=None, nb_workers: int = 1):
+        self.on_success = on_success
+        self.on_failure = on_failure
+        self.lock = threading.Lock()
+        self.nb_submitted = 0
+        self.nb_failed = 0
+        self.executor = ThreadPoolExecutor(max_workers=max(nb_workers, 1), thread_name_prefix="completion-hook")
+
+    def succeeded(self, item: dict, execution_id):
+        if self.on_success is not None:
+            self.submit(self.on_success, item, execution_id)
+
+    def failed(self, item: dict, error: str):
+        if self.on_failure is not None:
+            self.submit(self.on_failure, item, error)
+
+    def submit(self, callback, item: dict, argument):
+        with self.lock:
+            self.nb_submitted += 1
+        self.executor.submit(self.run, callback, item, argument)
+
+    def run(self, callback, item: dict, argument):
+        try:
+            callback(item, argument)
+        except Exception:
+            with self.lock:
+                self.nb_failed += 1
+            logger.exception("Completion hook %s of item %s failed" % (getattr(callback, "__name__", callback),
+                                                                       item["identifier"]))
+
+    def close(self):
+        """ Wait for the callbacks still queued or running
+        :return:
+        """
+        self.executor.shutdown(wait=True)
+        if self.nb_submitted:
+            logger.info("Completion hooks: %s run, %s failed" % (self.nb_submitted, self.nb_failed))
+
+
+completion_hooks: CompletionHooks = None
+
+
+def start_completion_hooks(on_success=None, on_failure=None):
+    """ Run [on_success] and [on_failure] on [ExecutionContext.hook_threads] threads until [close_completion_hooks]
+    :param on_success: function(item, execution_id)
+    :param on_failure: function(item, error)
+    :return:
+    """
+    global completion_hooks
+    if on_success is None and on_failure is None:
+        completion_hooks = None
+        return
+    completion_hooks = CompletionHooks(on_success, on_failure, ExecutionContext.hook_threads)
+
+
+def run_success_hook(item: dict, execution_id):
+    if completion_hooks is not None:
+        completion_hooks.succeeded(item, execution_id)
+
+
+def run_failure_hook(item: dict, error: str):
+    if completion_hooks is not None:
+        completion_hooks.failed(item, error)
+
+
+def close_completion_hooks():
+    global completion_hooks
+    if completion_hooks is not None:
+        if completion_hooks.nb_submitted:
+            logger.info("Waiting for the completion hooks still running...")
+        completion_hooks.close()
+        completion_hooks = None
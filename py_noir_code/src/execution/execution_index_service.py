@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from py_noir_code.src.API.api_context import APIContext
+from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.execution.execution_scheduling_service import DURATION_HINT
+from py_noir_code.src.utils.file_utils import create_file_path
+from py_noir_code.src.utils.log_utils import get_logger
+
+"""
+Define the index of the succeeded executions kept across runs: the hash of every canonical execution payload mapped
+to the execution which processed it, so that an identical execution is not submitted to VIP twice
+"""
+
+logger = get_logger()
+
+# Item fields which do not change what is executed
+VOLATILE_FIELDS = ("name", "refreshToken", "client", "identifier", "attempts", DURATION_HINT)
+# Seconds to wait for an index locked by another process
+BUSY_TIMEOUT = 60
+# Hashes looked up per query
+LOOKUP_BATCH_SIZE = 500
+
+
+class ExecutionIndex(object):
+    """
+    SQLite index payload hash -> succeeded execution, shared by the runs and processes using the same Shanoir instance
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False, timeout=BUSY_TIMEOUT)
+        # rollback journal, the resources directory may be shared by several hosts
+        self.connection.execute("PRAGMA journal_mode=DELETE")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS executions (payload_hash TEXT PRIMARY KEY, "
+                                "execution_id TEXT NOT NULL, pipeline TEXT, succeeded_at REAL)")
+        self.connection.commit()
+
+    def get_execution_ids(self, payload_hashes: list) -> dict:
+        """ Get the succeeded executions of [payload_hashes]
+        :param payload_hashes:
+        :return: dict payload hash -> execution id, for the known hashes only
+        """
+        execution_ids = {}
+        with self.lock:
+            for start in range(0, len(payload_hashes), LOOKUP_BATCH_SIZE):
+                batch = payload_hashes[start:start + LOOKUP_BATCH_SIZE]
+                execution_ids.update((payload_hash, json.loads(execution_id)) for payload_hash, execution_id in
+                                     self.connection.execute(
+                                         "SELECT payload_hash, execution_id FROM executions WHERE payload_hash IN (%s)"
+                                         % ",".join("?" * len(batch)), batch))
+        return execution_ids
+
+    def record(self, payload_hash: str, execution_id, pipeline: str):
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO executions VALUES (?, ?, ?, ?)",
+                                    (payload_hash, json.dumps(execution_id), pipeline, time.time()))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+execution_index: ExecutionIndex = None
+execution_index_lock = threading.Lock()
+
+
+def get_execution_index():
+    """ Open (once) the index of the current Shanoir instance
+    :return: ExecutionIndex, None if [ExecutionContext.skip_succeeded] is disabled
+    """
+    global execution_index
+    if not ExecutionContext.skip_succeeded:
+        return None
+    if execution_index is None:
+        with execution_index_lock:
+            if execution_index is None:
+                execution_index = ExecutionIndex(get_execution_index_path())
+    return execution_index
+
+
+def get_execution_index_path() -> str:
+    """ Get the index file path, one file per Shanoir instance as execution ids are only meaningful there
+    :return:
+    """
+    index_path = os.path.dirname(os.path.abspath(__file__)) + "/../../resources/execution_history/"
+    create_file_path(index_path)
+    return index_path + str(APIContext.domain).replace(':', '_') + "_executions.sqlite"
+
+
+def close_execution_index():
+    global execution_index
+    with execution_index_lock:
+        if execution_index is not None:
+            execution_index.close()
+            execution_index = None
+
+
+def get_canonical_payload(item: dict) -> str:
+    """ Serialize what [item] executes: its volatile fields removed, keys, dataset parameters and dataset ids sorted
+    :param item:
+    :return:
+    """
+    payload = {key: value for key, value in item.items() if key not in VOLATILE_FIELDS}
+    if isinstance(payload.get("datasetParameters"), list):
+        dataset_parameters = [dict(parameter, datasetIds=sorted(parameter.get("datasetIds", []), key=str))
+                              for parameter in payload["datasetParameters"]]
+        payload["datasetParameters"] = sorted(dataset_parameters, key=lambda parameter: json.dumps(parameter,
+                                                                                                    sort_keys=True))
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"))
+
+
+def get_payload_hash(item: dict) -> str:
+    return hashlib.sha256(get_canonical_payload(item).encode("utf-8")).hexdigest()
+
+
+def skip_succeeded_items(items: list, seen_hashes: set = None, log: bool = True) -> tuple:
+    """ Remove from [items] those already processed by a succeeded execution, in a former run, and the duplicates
+    :param items:
+    :param seen_hashes: payload hashes of the items already kept, updated, to remove the duplicates of items
+    streamed by several calls
+    :param log: False not to log the number of removed items
+    :return: (items to process, ids of the succeeded executions of the removed items)
+    """
+    index = get_execution_index()
+    if index is None:
+        return items, []
+
+    payload_hashes = [get_payload_hash(item) for item in items]
+    succeeded_execution_ids = index.get_execution_ids(list(set(payload_hashes)))
+    items_to_process = []
+    linked_execution_ids = []
+    seen_hashes = set() if seen_hashes is None else seen_hashes
+    for item, payload_hash in zip(items, payload_hashes):
+        if payload_hash in succeeded_execution_ids:
+            linked_execution_ids.append(succeeded_execution_ids[payload_hash])
+        elif payload_hash not in seen_hashes:
+            seen_hashes.add(payload_hash)
+            items_to_process.append(item)
+
+    if log:
+        log_skipped_items(len(linked_execution_ids), len(items) - len(items_to_process) - len(linked_execution_ids))
+    return items_to_process, linked_execution_ids
+
+
+def log_skipped_items(nb_succeeded: int, nb_duplicates: int):
+    if nb_succeeded:
+        logger.info("%s items skipped, already processed by a succeeded execution of a former run" % nb_succeeded)
+    if nb_duplicates:
+        logger.info("%s duplicated items skipped" % nb_duplicates)
+
+
+def record_succeeded_execution(item: dict, execution_id):
+    """ Index the succeeded execution [execution_id] of [item]
+    :param item:
+    :param execution_id:
+    :return:
+    """
+    index = get_execution_index()
+    if index is None:
+        return
+    try:
+        index.record(get_payload_hash(item), execution_id, item.get("pipelineIdentifier"))
+    except sqlite3.Error as e:
+        # the execution succeeded anyway, it would only be submitted again by a later run
+        logger.warning("Execution %s not indexed: %s" % (execution_id, e))
@@ -1,10 +1,11 @@
-import json
 import shutil
 import string
 import sys
-import re
 
+from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.execution.execution_index_service import skip_succeeded_items, log_skipped_items
 from py_noir_code.src.execution.execution_management_service import start_executions
+from py_noir_code.src.execution.working_file_service import write_working_file, update_working_file_token
 from py_noir_code.src.utils.log_utils import get_logger
 from py_noir_code.src.API.api_context import APIContext
 from py_noir_code.src.API.api_service import reset_token
@@ -13,40 +14,85 @@ logger = get_logger()
 sys.path.append("../../")
 json_content: list[dict] = []
 
-def init_executions(json_file_name: str, content_to_process: list[dict]=None):
+def init_executions(json_file_name: str, content_to_process: list[dict]=None, engine: str = None, on_success=None,
+                    on_failure=None):
+    """ Process the executions [content_to_process], except those already succeeded in a former run
+    :param json_file_name: working file
+    :param content_to_process: executions sent to Shanoir, a list or an iterator (e.g. a generator) whose items are
+    submitted as soon as they are produced
+    :param engine:
+    :param on_success: function(item, execution_id) called as soon as an item succeeds, see start_executions
+    :param on_failure: function(item, error) called as soon as an item fails for good
+    :return: ids of the succeeded executions, the former ones included
+    """
+    if content_to_process is not None and not isinstance(content_to_process, list):
+        return stream_executions(json_file_name, content_to_process, engine, on_success, on_failure)
     if len(content_to_process) == 0 :
         logger.info("There is nothing to process. Please verify the data transmitted to the init_executions() method.")
         sys.exit(1)
+    content_to_process, succeeded_executions = skip_succeeded_items(content_to_process)
+    if len(content_to_process) == 0:
+        logger.info("All the executions already succeeded, nothing is submitted.")
+        return succeeded_executions
     create_json_file(json_file_name, content_to_process)
-    return start_executions(json_file_name)
+    return succeeded_executions + start_executions(json_file_name, engine=engine, on_success=on_success,
+                                                   on_failure=on_failure)
 
-def resume_executions(json_file_path: str, json_save_path: str, json_file_name: str):
+def stream_executions(json_file_name: str, content_to_process, engine: str = None, on_success=None, on_failure=None):
+    """ Process the executions produced by the iterator [content_to_process] while it produces them, except those
+    already succeeded in a former run
+    :param json_file_name: working file
+    :param content_to_process: iterator of executions sent to Shanoir
+    :param engine:
+    :param on_success:
+    :param on_failure:
+    :return: ids of the succeeded executions, the former ones included
+    """
+    succeeded_executions = []
+    nb_duplicates = 0
+    nb_generated_items = 0
+    seen_hashes = set()
+
+    def identify_items():
+        nonlocal nb_duplicates, nb_generated_items
+        for item in content_to_process:
+            items_to_process, linked_executions = skip_succeeded_items([item], seen_hashes, log=False)
+            succeeded_executions.extend(linked_executions)
+            nb_duplicates += 1 - len(items_to_process) - len(linked_executions)
+            for item_to_process in items_to_process:
+                nb_generated_items += 1
+                item_to_process['identifier'] = nb_generated_items
+                yield item_to_process
+
+    write_working_file(json_file_name, [dict(nb_processed_items=0, processed_item_ids=[], generation_complete=False)])
+    logger.info("Items streamed, at most %s items being queued ahead of their submission" %
+                ExecutionContext.stream_buffer_size)
+    executed = start_executions(json_file_name, engine=engine, items_to_stream=identify_items(), on_success=on_success,
+                                on_failure=on_failure)
+    log_skipped_items(len(succeeded_executions), nb_duplicates)
+    if nb_generated_items == 0 and not succeeded_executions:
+        logger.info("There is nothing to process. Please verify the data transmitted to the init_executions() method.")
+    return succeeded_executions + executed
+
+def resume_executions(json_file_path: str, json_save_path: str, json_file_name: str, engine: str = None,
+                      on_success=None, on_failure=None):
     shutil.copy(json_save_path + json_file_name, json_file_path + json_file_name)
     update_token(json_file_path + json_file_name)
-    return start_executions(json_file_path + json_file_name, True)
+    return start_executions(json_file_path + json_file_name, True, engine, on_success=on_success,
+                            on_failure=on_failure)
 
 def create_json_file(json_file_name: string, content_to_process: list[dict]):
     for index, item in enumerate(content_to_process, start=1):
         item['identifier'] = index
     content_to_process.insert(0, dict(nb_processed_items=0, processed_item_ids=[]))
-
-    exams_to_exec = open(json_file_name, "w")
-    exams_to_exec.write(json.dumps(content_to_process))
-    exams_to_exec.close()
+    write_working_file(json_file_name, content_to_process)
 
 def update_token(json_file_path):
     reset_token()
 
     try:
-        with open(json_file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-            updated_content = re.sub(r'("refreshToken"\s*:\s*")(.+?)(")',
-                                     r'\1' + str(APIContext.refresh_token) + r'\3',
-                                     content)
-
-            with open(json_file_path, 'w', encoding='utf-8') as file:
-                file.write(updated_content)
+        update_working_file_token(json_file_path, str(APIContext.refresh_token))
         logger.info("Token updated")
     except Exception as e:
-        logger.error("Error updating refreshToken:\n" + e)
+        logger.error("Error updating refreshToken:\n" + str(e))
         sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,234 @@
+import json
+import os
+import shutil
+
+from py_noir_code.src.execution.working_file_service import read_working_file, write_working_file
+from py_noir_code.src.utils.log_utils import get_logger
+
+"""
+Define methods for the execution journal: an append-only JSONL log of the items state transitions, periodically
+compacted into the save file snapshot
+"""
+
+logger = get_logger()
+
+# Number of journal entries after which the journal is compacted into a new snapshot
+COMPACTION_PERIOD = 1000
+
+CREATED = "created"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+# transient failure, the item is queued again
+RETRIED = "retried"
+# item produced while the batch runs (streamed generation)
+ADDED = "added"
+# end of the streamed generation, no item is added afterwards
+GENERATED = "generated"
+
+
+class ExecutionJournal(object):
+    """
+    Append-only journal file of execution events, one JSON object per line. Not thread-safe, callers serialize
+    the calls.
+    """
+
+    def __init__(self, journal_file_name: str):
+        self.journal_file_name = journal_file_name
+        self.journal_file = open(journal_file_name, "a")
+        self.nb_entries = 0
+
+    def append(self, event: str, identifier, **fields):
+        """ Append the [event] of item [identifier]
+        :param event: CREATED, SUCCEEDED, FAILED, RETRIED, ADDED or GENERATED
+        :param identifier:
+        :param fields: event data (execution id, monitoring id...)
+        :return:
+        """
+        self.journal_file.write(json.dumps(dict(event=event, identifier=identifier, **fields)) + "\n")
+        self.journal_file.flush()
+        self.nb_entries += 1
+
+    def needs_compaction(self) -> bool:
+        return self.nb_entries >= COMPACTION_PERIOD
+
+    def truncate(self):
+        """ Empty the journal, once its entries are part of a snapshot
+        :return:
+        """
+        self.journal_file.truncate(0)
+        self.journal_file.seek(0)
+        self.journal_file.flush()
+        self.nb_entries = 0
+
+    def close(self):
+        self.journal_file.close()
+
+
+class JournalStateStore(object):
+    """
+    Execution state kept in the save file snapshot plus the journal of the changes since the snapshot.
+    Not thread-safe, callers serialize the calls.
+    """
+
+    def __init__(self, working_file_name: str, save_file_name: str):
+        self.working_file_name = working_file_name
+        self.save_file_name = save_file_name
+        self.journal: ExecutionJournal = None
+        self.get_snapshot = None
+
+    def load(self, resume: bool) -> list:
+        """ Get the up to date state: the working file content, plus the journal changes when resuming
+        :param resume:
+        :return: header then pending items
+        """
+        items = read_snapshot(self.working_file_name)
+        return replay_journal(items, get_journal_file_name(self.save_file_name)) if resume else items
+
+    def open(self, get_snapshot):
+        """ Start journaling, [get_snapshot]() returning the current header then pending items on compaction
+        :param get_snapshot:
+        :return:
+        """
+        self.get_snapshot = get_snapshot
+        self.journal = ExecutionJournal(get_journal_file_name(self.save_file_name))
+        self.compact()
+
+    def claim(self) -> tuple:
+        """ Only the shared store hands out items during the run
+        :return: (items, running executions, delay before the next claim)
+        """
+        return [], {}, None
+
+    def record_creation(self, item: dict, execution_id, monitoring_id: str, created_at: float):
+        self.append(CREATED, item, execution_id=execution_id, monitoring_id=monitoring_id, created_at=created_at)
+
+    def record_end(self, item: dict, event: str, error: str = None):
+        self.append(event, item)
+
+    def record_retry(self, item: dict, error: str = None):
+        self.append(RETRIED, item, attempts=item.get("attempts", 0))
+
+    def add_items(self, items: list) -> list:
+        """ Journal the streamed [items]
+        :param items:
+        :return: the items to process by this process, all of them
+        """
+        for item in items:
+            # not compacted here, the items are part of the snapshot only once returned
+            self.journal.append(ADDED, item["identifier"], item=item)
+        return items
+
+    def record_generation_end(self, complete: bool):
+        """ Journal the end of the streamed generation, if all the items were produced
+        :param complete: False if the generation failed
+        :return:
+        """
+        if complete:
+            self.journal.append(GENERATED, None)
+
+    def is_generation_complete(self) -> bool:
+        """ Only this process streams items in the batch, an interrupted generation is not completed by another one
+        :return:
+        """
+        return False
+
+    def append(self, event: str, item: dict, **fields):
+        self.journal.append(event, item["identifier"], **fields)
+        if self.journal.needs_compaction():
+            self.compact()
+
+    def compact(self):
+        """ Write the current state as the save file snapshot (copied to the working file), then empty the journal
+        :return:
+        """
+        write_snapshot(self.save_file_name, self.get_snapshot())
+        shutil.copy(self.save_file_name, self.working_file_name)
+        self.journal.truncate()
+
+    def close(self):
+        """ Remove the journal, working and save files once all the items are processed
+        :return:
+        """
+        self.journal.close()
+        os.remove(self.journal.journal_file_name)
+        os.remove(self.working_file_name)
+        os.remove(self.save_file_name)
+
+
+def get_journal_file_name(save_file_name: str) -> str:
+    return save_file_name + ".journal"
+
+
+def read_journal(journal_file_name: str) -> list:
+    """ Read the events of [journal_file_name], ignoring a last line truncated by a crash
+    :param journal_file_name:
+    :return: list of events
+    """
+    events = []
+    if not os.path.exists(journal_file_name):
+        return events
+    with open(journal_file_name, "r") as journal_file:
+        for line in journal_file:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                logger.warning("Ignoring a corrupted line of " + journal_file_name)
+    return events
+
+
+def replay_journal(items: list, journal_file_name: str) -> list:
+    """ Apply the events of [journal_file_name] to the snapshot [items] (header first, then pending items).
+    Replaying an event already part of the snapshot has no effect.
+    :param items:
+    :param journal_file_name:
+    :return: the up to date items
+    """
+    header = items[0]
+    pending_items = {str(item["identifier"]): item for item in items[1:]}
+    running_executions = dict(header.get("running_executions", {}))
+    nb_processed_items = int(header["nb_processed_items"])
+    processed_item_ids = list(header["processed_item_ids"])
+    generation_complete = header.get("generation_complete", True)
+    processed_identifiers = {str(identifier) for identifier in processed_item_ids}
+
+    for event in read_journal(journal_file_name):
+        identifier = str(event["identifier"])
+        if event["event"] == GENERATED:
+            generation_complete = True
+            continue
+        if event["event"] == ADDED:
+            if identifier not in processed_identifiers:
+                pending_items.setdefault(identifier, event["item"])
+            continue
+        if identifier not in pending_items:
+            continue
+        if event["event"] == CREATED:
+            running_executions[identifier] = dict(execution_id=event["execution_id"],
+                                                  monitoring_id=event["monitoring_id"],
+                                                  created_at=event.get("created_at"))
+        elif event["event"] == RETRIED:
+            running_executions.pop(identifier, None)
+            pending_items[identifier]["attempts"] = event["attempts"]
+        else:
+            del pending_items[identifier]
+            running_executions.pop(identifier, None)
+            nb_processed_items += 1
+            processed_item_ids.append(event["identifier"])
+            processed_identifiers.add(identifier)
+
+    header = dict(nb_processed_items=nb_processed_items, processed_item_ids=processed_item_ids,
+                  running_executions=running_executions, generation_complete=generation_complete)
+    return [header] + list(pending_items.values())
+
+
+def read_snapshot(file_name: str) -> list:
+    return read_working_file(file_name)
+
+
+def write_snapshot(file_name: str, items: list):
+    """ Atomically replace [file_name] by [items], in the compact working file format
+    :param file_name:
+    :param items:
+    :return:
+    """
+    write_working_file(file_name, items)
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import shutil
 import sys
@@ -5,12 +6,30 @@ import json
 import threading
 import time
 
+from datetime import datetime
 from concurrent.futures.thread import ThreadPoolExecutor
 from pathlib import Path
 
+from py_noir_code.src.API.api_context import APIContext
+from py_noir_code.src.API.api_session import log_pool_stats
+from py_noir_code.src.API.concurrency_limiter import log_limiter_stats
+from py_noir_code.src.API.retry_policy import log_retry_stats
 from py_noir_code.src.execution.execution_context import ExecutionContext
-from py_noir_code.src.execution.execution_service import create_execution, get_execution_status, \
-    get_execution_monitoring
+from py_noir_code.src.execution.execution_duration_model import record_execution_duration, save_duration_history
+from py_noir_code.src.execution.execution_failure_service import PERMANENT, TRANSIENT, is_succeeded_status, \
+    classify_status, classify_creation_failure, get_retry_delay, get_vip_status
+from py_noir_code.src.execution.execution_hook_service import start_completion_hooks, close_completion_hooks, \
+    run_success_hook, run_failure_hook
+from py_noir_code.src.execution.execution_index_service import record_succeeded_execution, close_execution_index
+from py_noir_code.src.execution.execution_journal_service import JournalStateStore, SUCCEEDED, FAILED
+from py_noir_code.src.execution.execution_state_store import SQLiteStateStore, SharedSQLiteStateStore
+from py_noir_code.src.execution.execution_monitoring_service import ExecutionPoller
+from py_noir_code.src.execution.maintenance_window_service import wait_for_submissions, get_maintenance_windows
+from py_noir_code.src.execution.execution_rate_limiter import get_submission_bucket, reset_submission_bucket, \
+    log_submission_stats
+from py_noir_code.src.execution.execution_scheduling_service import ExecutionQueue, POLICIES, log_simulated_makespans
+from py_noir_code.src.security.authentication_service import log_token_stats
+from py_noir_code.src.execution.execution_service import create_execution, find_monitoring_identifier
 from py_noir_code.src.utils.file_utils import get_project_name, create_file_path, find_project_root
 from py_noir_code.src.utils.log_utils import get_logger
 
@@ -20,113 +39,251 @@ sys.path.append('../shanoir_object/dataset')
 logger = get_logger()
 
 total_items_to_process = None
-items = []
+# identifier -> item still to process, in processing order
+pending_items = {}
 nb_processed_items = 0
 processed_item_ids = []
 executions = []
+# executions created by this process
+nb_created_executions = 0
 saveFile = ""
-
-def check_pause_schedule(pause_message_event):
-    current_hour = time.localtime(time.time()).tm_hour
-    while ExecutionContext.server_reboot_beginning_hour <= current_hour < ExecutionContext.server_reboot_ending_hour:
-        if not pause_message_event.is_set():
-            logger.info("Current time is between %s and  %s. Pausing..." % (
-                ExecutionContext.server_reboot_beginning_hour, ExecutionContext.server_reboot_ending_hour))
-            pause_message_event.set()
-        time.sleep(60)
-    if pause_message_event.is_set():
-        pause_message_event.clear()
-
-
-def manage_threading_execution(working_file):
-    global items
+# identifier -> dict(execution_id, monitoring_id) of the created executions not ended yet
+running_executions = {}
+state_store = None
+# items to submit, retried items included
+execution_queue: ExecutionQueue = None
+# iterator of the items streamed while the batch runs, if any
+item_source = None
+# False while items may still be added to the batch (streamed generation)
+generation_complete = True
+# True while this process streams items
+generating = False
+# Guards the state changes and their persistence
+state_lock = threading.RLock()
+
+ENGINES = ("thread", "asyncio")
+STATE_STORES = {"journal": JournalStateStore, "sqlite": SQLiteStateStore, "shared": SharedSQLiteStateStore}
+
+# Seconds between two checks for retried items to submit, while executions are running
+QUEUE_CHECK_DELAY = 1
+
+def get_error_messages(execution, exception: Exception = None) -> tuple:
+    """ Get the message and details of a failed execution creation [execution] response
+    :param execution:
+    :param exception: raised by the creation, describes the failure when the response has no message
+    :return: (message, details)
+    """
+    if not isinstance(execution, dict):
+        execution = {}
+    message = execution["message"] if "message" in execution.keys() else str(exception or "")
+    return (message + "\n" if message else "",
+            execution["details"] + "\n" if "details" in execution.keys() else "")
+
+
+def get_created_execution_id(execution):
+    """ Get the id of the execution created by a failed creation, if any (e.g. its monitoring lookup failed)
+    :param execution: creation response
+    :return:
+    """
+    return execution.get("id") if isinstance(execution, dict) else None
+
+
+def manage_threading_execution():
     global nb_processed_items
     global processed_item_ids
     global executions
 
     monitoring_lock = threading.Lock()
-    file_lock = threading.Lock()
-    pause_message_event = threading.Event()
+    # Bounds the number of executions running on VIP at the same time, if configured
+    running_slots = threading.BoundedSemaphore(ExecutionContext.max_running_executions) \
+        if ExecutionContext.max_running_executions > 0 else None
     logger.info("Starting new executions...")
 
-    def thread_execution(item: dict):
-        global nb_processed_items, processed_item_ids
-        check_pause_schedule(pause_message_event)
+    def release_running_slot():
+        if running_slots is not None:
+            running_slots.release()
 
+    def on_execution_finished(entry: dict, status: str):
+        release_running_slot()
+        if not is_succeeded_status(status):
+            logger.debug("Failure for execution " + str(entry["execution_id"]))
+            with monitoring_lock:
+                manage_execution_failure(entry["item"], get_status_message(entry["execution_id"], status), "",
+                                         classify_status(status), entry["execution_id"], status)
+            return
+        record_execution_duration(entry["item"].get("pipelineIdentifier"), time.time() - entry["created_at"])
+        with monitoring_lock:
+            logger.debug("Success for execution " + str(entry["execution_id"]))
+            manage_execution_success(entry["item"], entry["execution_id"])
+
+    def on_execution_error(entry: dict, exception: Exception):
+        release_running_slot()
+        logger.debug("Exception for execution " + str(entry["execution_id"]))
+        with monitoring_lock:
+            # the execution may still be running on VIP, creating it again could run it twice
+            manage_execution_failure(entry["item"], str(exception) + "\n", "", PERMANENT, entry["execution_id"])
+
+    poller = ExecutionPoller(on_execution_finished, on_execution_error, ExecutionContext.max_thread)
+    # Bounds the number of items taken from the queue and not created yet
+    creation_slots = threading.BoundedSemaphore(ExecutionContext.max_thread)
+    submission_bucket = get_submission_bucket()
+
+    def create_item_execution(item: dict):
+        if running_slots is not None:
+            running_slots.acquire()
+        wait_for_submissions()  # Nothing is created during and just before the Shanoir maintenance windows
+
+        execution = None
         try:
+            submission_bucket.acquire()  # Pacing of the creations
             execution = create_execution(item)
-            if execution['id'] is not None:
-                with file_lock:
-                    manage_working_file(working_file)
-                monitoring = get_execution_monitoring(execution["id"])
-                logger.info("Execution " + str(execution['id']) + ", " + str(monitoring['identifier']) + " is created.")
-                status = '"Running"'
-                count_down = 12
-
-                while status == '"Running"':
-                    time.sleep(5)
-
-                    for attempt in range(5):
-                        try:
-                            status = get_execution_status(monitoring['identifier'])
-                            break  # success, exit retry loop
-                        except Exception as e:
-                            logger.warning(f"Attempt {attempt + 1}/5 failed to get status: {e}")
-                            if attempt == 4:
-                                raise  # re-raise after 3 failed attempts
-                            time.sleep(1)
-
-                    count_down -= 1
-                    if count_down == 1 and status == '"Running"':
-                        logger.info("Status for execution " + str(execution["id"]) + " is " + status)
-                        count_down = 12
-
-                with monitoring_lock:
-                    logger.debug("Succes for execution" + str(execution["id"]))
-                    executions.append(execution["id"])
-                    manage_execution_success(item)
-
-        except:
-            logger.debug("Exception for execution " + str(execution["id"]))
+            if execution.get('id') is None:
+                raise ValueError("No execution created for item " + str(item["identifier"]))
+            # From here the execution runs on VIP: it is monitored, even if its monitoring is not found yet
+            monitoring_id = find_monitoring_identifier(execution["id"])
+            manage_execution_creation(item, execution["id"], monitoring_id)
+            logger.info("Execution " + str(execution['id']) + ", " + str(monitoring_id) + " is created.")
+            # The worker is released here, the poller takes over until the execution ends
+            poller.track(item, execution["id"], monitoring_id)
+        except Exception as e:
+            logger.debug("Exception for item " + str(item["identifier"]))
+            release_running_slot()
             with monitoring_lock:
-                manage_execution_failure(item, execution["message"] + "\n" if execution != None and "message" in execution.keys() else "", execution["details"] + "\n" if execution != None and "details" in execution.keys() else "")
+                manage_execution_failure(item, *get_error_messages(execution, e),
+                                         classify_creation_failure(e, execution), get_created_execution_id(execution))
 
+    def thread_execution(item: dict):
+        try:
+            create_item_execution(item)
+        finally:
+            creation_slots.release()
+
+    def resume_monitoring(item: dict, running_execution: dict):
+        # created before the script interruption (or by a stopped process), only its monitoring is resumed
+        if running_slots is not None:
+            running_slots.acquire()
+        logger.info("Resuming monitoring of execution " + str(running_execution["execution_id"]))
+        poller.track(item, running_execution["execution_id"], running_execution["monitoring_id"],
+                     running_execution.get("created_at"))
+
+    for item, running_execution in get_running_items():
+        resume_monitoring(item, running_execution)
+
+    queue = get_execution_queue()
+    next_claim = 0.0
     with ThreadPoolExecutor(max_workers=ExecutionContext.max_thread) as executor:
-        for item in items[1:]:
-            executor.submit(thread_execution, item)  # Start the thread
-            time.sleep(1)  # Wait 1 second before submitting the next one
-
-    logger.info("Executions ended.")
-
-
-def start_executions(json_file_name: str, resume: bool = False):
+        while True:
+            item = queue.pop()
+            if item is not None:
+                creation_slots.acquire()  # Take the next item only once a worker is free for it
+                executor.submit(thread_execution, item)
+                continue
+            if next_claim is not None and time.monotonic() >= next_claim:
+                claimed_running_items, claim_delay = claim_items(queue)
+                for claimed_item, running_execution in claimed_running_items:
+                    resume_monitoring(claimed_item, running_execution)
+                if claim_delay == 0:
+                    continue
+                next_claim = None if claim_delay is None else time.monotonic() + claim_delay
+            idle_delay = get_idle_delay(queue, next_claim)
+            if idle_delay is None:
+                break
+            time.sleep(idle_delay)
+
+    poller.wait_until_idle()
+    poller.stop()
+    logger.info("%s status polls" % poller.nb_polls)
+
+
+def start_executions(json_file_name: str, resume: bool = False, engine: str = None, items_to_stream=None,
+                     on_success=None, on_failure=None):
+    """ Process the items of the working file [json_file_name]
+    :param json_file_name:
+    :param resume: True if [json_file_name] is restored from a save file
+    :param engine: "thread" (worker threads and a status poller) or "asyncio" (event loop tasks),
+    [ExecutionContext.engine] by default
+    :param items_to_stream: iterator of items (identifier set) added to the batch as they are produced, while the
+    former ones are executed
+    :param on_success: function(item, execution_id) called once an item succeeds, on one of
+    [ExecutionContext.hook_threads] threads
+    :param on_failure: function(item, error) called once an item fails for good, on the same threads
+    :return: ids of the succeeded executions
+    """
     global total_items_to_process
+    global item_source
+    global generation_complete
     global nb_processed_items
     global processed_item_ids
-    global items
+    global running_executions
+    global pending_items
     global saveFile
-
+    global state_store
+
+    engine = engine or ExecutionContext.engine
+    if engine not in ENGINES:
+        raise ValueError("Unknown execution engine %s, expected one of %s" % (engine, ", ".join(ENGINES)))
+    if ExecutionContext.state_store not in STATE_STORES:
+        raise ValueError("Unknown state store %s, expected one of %s" % (ExecutionContext.state_store,
+                                                                        ", ".join(STATE_STORES)))
+    if ExecutionContext.scheduling_policy not in POLICIES:
+        raise ValueError("Unknown scheduling policy %s, expected one of %s" % (ExecutionContext.scheduling_policy,
+                                                                              ", ".join(POLICIES)))
+
+    saveFile = get_save_file_name(json_file_name)
+    state_store = STATE_STORES[ExecutionContext.state_store](json_file_name, saveFile)
+    reset_submission_bucket()
+    if get_maintenance_windows():
+        logger.info("Shanoir maintenance windows: " + ", ".join(str(window) for window in get_maintenance_windows()))
     items = read_items_from_json_file(json_file_name, resume)
     nb_processed_items = int(items[0]["nb_processed_items"])
     processed_item_ids = list(items[0]["processed_item_ids"])
-    total_items_to_process = len(processed_item_ids) + len(items) - 1
+    running_executions = dict(items[0].get("running_executions", {}))
+    pending_items = {str(item["identifier"]): item for item in items[1:]}
+    # a shared batch is larger than the items claimed by this process
+    total_items_to_process = int(items[0].get("nb_items", len(processed_item_ids) + len(pending_items)))
+    generation_complete = items[0].get("generation_complete", True)
+    item_source = items_to_stream
 
-    saveFile = str(Path(json_file_name).parent.parent) + "/save_files/" + Path(json_file_name).name
-    shutil.copy(json_file_name, saveFile)
     initialFile = str(Path(json_file_name).parent.parent) + "/save_files/initial_" + Path(json_file_name).name
     shutil.copy(json_file_name, initialFile)
 
-    with open(json_file_name, "w") as working_file:
-        manage_threading_execution(working_file)
-    os.remove(json_file_name)
-    os.remove(saveFile)
+    state_store.open(get_snapshot)
+    start_completion_hooks(on_success, on_failure)
+
+    if engine == "asyncio":
+        # imported here as it requires aiohttp
+        from py_noir_code.src.execution.async_execution_management_service import manage_async_execution
+        asyncio.run(manage_async_execution())
+    else:
+        manage_threading_execution()
+
+    logger.info("Executions ended.")
+    if item_source is None and not generation_complete:
+        # joined during the generation of another process
+        generation_complete = state_store.is_generation_complete()
+    if not generation_complete:
+        logger.warning("The generation of the items was interrupted, only the items generated before were processed. "
+                       "Run the project again to process the others, the succeeded ones being skipped.")
+    close_completion_hooks()
+    save_duration_history()
+    log_pool_stats()
+    log_token_stats()
+    log_limiter_stats()
+    log_retry_stats()
+    log_submission_stats()
+    close_execution_index()
+    state_store.close()
 
     return executions
 
 
+def get_save_file_name(json_file_name: str) -> str:
+    return str(Path(json_file_name).parent.parent) + "/save_files/" + Path(json_file_name).name
+
+
 def read_items_from_json_file(json_file_name: str, resume: bool):
     try:
-        return get_items_from_json_file(json_file_name)
+        items_to_process = state_store.load(resume)
     except:
         if resume:
             logger.info("Resume script is impossible, monitoring file is corrupted. Deleting monitoring file, please relaunch executions.")
@@ -135,12 +292,157 @@ def read_items_from_json_file(json_file_name: str, resume: bool):
             logger.error("Items to process are wrong. Please verify the json file shaping.")
         sys.exit(1)
 
-def manage_execution_success(item: dict):
+    if resume:
+        # the state store may hold items written with the previous refresh token
+        update_refresh_token(items_to_process[1:])
+    return items_to_process
+
+
+def update_refresh_token(items: list):
+    for item in items:
+        if "refreshToken" in item:
+            item["refreshToken"] = APIContext.refresh_token
+
+def get_pending_items() -> list:
+    """ Get the items still to process, without the header
+    :return:
+    """
+    return list(pending_items.values())
+
+
+def get_running_items() -> list:
+    """ Get the items whose execution is created and not ended yet
+    :return: list of (item, dict(execution_id, monitoring_id, created_at))
+    """
+    return [(item, get_running_execution(item)) for item in get_pending_items()
+            if get_running_execution(item) is not None]
+
+
+def get_execution_queue() -> ExecutionQueue:
+    """ Queue the items not submitted yet, according to [ExecutionContext.scheduling_policy], then start the
+    generation of the streamed items, if any
+    :return:
+    """
+    items_to_submit = [item for item in get_pending_items() if get_running_execution(item) is None]
+    log_simulated_makespans(items_to_submit, ExecutionContext.max_running_executions, ExecutionContext.submit_rate,
+                            ExecutionContext.submit_burst)
+    global execution_queue
+    execution_queue = ExecutionQueue(ExecutionContext.scheduling_policy)
+    execution_queue.extend(items_to_submit)
+    if item_source is not None:
+        start_generation()
+    return execution_queue
+
+
+def start_generation():
+    """ Start adding the items of [item_source] to the batch in background
+    :return:
+    """
+    global generating
+    generating = True
+    threading.Thread(target=generate_items, args=(item_source,), name="item-generation", daemon=True).start()
+
+
+def generate_items(items):
+    """ Add [items] to the batch as they are produced, waiting while [ExecutionContext.stream_buffer_size] items are
+    ready to submit
+    :param items: iterator of items
+    :return:
+    """
+    global generating
+    global generation_complete
+
+    complete = False
+    try:
+        for item in items:
+            execution_queue.wait_until_shorter(ExecutionContext.stream_buffer_size)
+            add_items([item])
+        complete = True
+    except Exception:
+        logger.exception("Generation of the items failed, only the items generated so far are processed")
+    finally:
+        with state_lock:
+            state_store.record_generation_end(complete)
+            generation_complete = complete
+            generating = False
+
+
+def add_items(items: list):
+    """ Add the streamed [items] to the batch, and to the queue of this process if it is to process them
+    :param items:
+    :return:
+    """
+    global total_items_to_process
+
+    with state_lock:
+        local_items = state_store.add_items(items)
+        for item in local_items:
+            pending_items[str(item["identifier"])] = item
+        total_items_to_process += len(items)
+    execution_queue.extend(local_items)
+
+
+def claim_items(queue: ExecutionQueue) -> tuple:
+    """ Claim more items from a shared state store, once [queue] is empty: the items to create are added to [queue]
+    :param queue:
+    :return: (claimed items whose execution is already running, as (item, running execution), delay before the next
+    claim: None if no item is left to claim)
+    """
+    with state_lock:
+        items, claimed_running_executions, claim_delay = state_store.claim()
+        # the items may have been written by another process, with its refresh token
+        update_refresh_token(items)
+        for item in items:
+            pending_items[str(item["identifier"])] = item
+        running_executions.update(claimed_running_executions)
+    queue.extend([item for item in items if get_running_execution(item) is None])
+    return [(item, get_running_execution(item)) for item in items if get_running_execution(item) is not None], \
+        claim_delay
+
+
+def get_idle_delay(queue: ExecutionQueue, next_claim):
+    """ Get the delay before looking for items to submit again, once [queue] has no item ready
+    :param queue:
+    :param next_claim: monotonic time of the next claim, None if no item is left to claim
+    :return: seconds, None if every item of this process is processed, and no item is generated anymore
+    """
+    with state_lock:
+        if next_claim is None and not pending_items and not generating:
+            return None
+    delays = [QUEUE_CHECK_DELAY, queue.get_wait_time(),
+              next_claim - time.monotonic() if next_claim is not None else None]
+    return max(min(delay for delay in delays if delay is not None), 0.0)
+
+
+def get_running_execution(item: dict):
+    """ Get the execution created for [item] and not ended yet, if any
+    :param item:
+    :return: dict(execution_id, monitoring_id) or None
+    """
+    return running_executions.get(str(item["identifier"]))
+
+
+def manage_execution_creation(item: dict, execution_id, monitoring_id: str):
+    global nb_created_executions
+
+    with state_lock:
+        nb_created_executions += 1
+        created_at = time.time()
+        running_executions[str(item["identifier"])] = dict(execution_id=execution_id, monitoring_id=monitoring_id,
+                                                           created_at=created_at)
+        state_store.record_creation(item, execution_id, monitoring_id, created_at)
+
+
+def manage_execution_success(item: dict, execution_id=None):
     global nb_processed_items
     global processed_item_ids
 
-    item_processed_increment(item)
+    if execution_id is not None:
+        executions.append(execution_id)
+        record_succeeded_execution(item, execution_id)
+    item_processed_increment(item, SUCCEEDED)
     logger.info("%s out of %s items processed." % (nb_processed_items, total_items_to_process))
+    run_success_hook(item, execution_id)
 
 
 def store_failure_data(item: dict, message: str, detail: str):
@@ -153,40 +455,94 @@ def store_failure_data(item: dict, message: str, detail: str):
     error_file.close()
 
 
-def manage_execution_failure(item: dict, message: str, detail: str):
-    global nb_processed_items
-    global processed_item_ids
-
-    item_processed_increment(item)
+def store_dead_letter(item: dict, category: str, message: str, detail: str, attempts: int, execution_id=None,
+                      status: str = None):
+    """ Append the failed [item] to the dead-letter file of the project, one JSON object per line
+    :param item:
+    :param category: TRANSIENT (attempts exhausted) or PERMANENT
+    :param message:
+    :param detail:
+    :param attempts: number of attempts made
+    :param execution_id: execution of the last attempt, if created
+    :param status: VIP status of that execution, if it ended
+    :return:
+    """
+    error_file_path = find_project_root(__file__) + "/py_noir_code/resources/errors/"
+    create_file_path(error_file_path)
+    entry = dict(identifier=item["identifier"], name=item.get("name"), category=category, message=message.strip(),
+                 details=detail.strip(), status=get_vip_status(status) if status else None, attempts=attempts, execution_id=execution_id,
+                 failed_at=datetime.now().isoformat(timespec="seconds"),
+                 item={key: value for key, value in item.items() if key != "refreshToken"})
+    with open(error_file_path + get_project_name() + "_dead_letter.jsonl", "a") as dead_letter_file:
+        dead_letter_file.write(json.dumps(entry) + "\n")
+
+
+def get_status_message(execution_id, status: str) -> str:
+    return "Execution %s ended with status %s\n" % (execution_id, get_vip_status(status))
+
+
+def manage_execution_failure(item: dict, message: str, detail: str, category: str = PERMANENT, execution_id=None,
+                             status: str = None):
+    """ Queue [item] again after a transient failure, while it has attempts left, otherwise record its failure
+    :param item:
+    :param message:
+    :param detail:
+    :param category: TRANSIENT or PERMANENT
+    :param execution_id: execution of the failed attempt, if created
+    :param status: VIP status of that execution, if it ended
+    :return:
+    """
+    attempts = int(item.get("attempts", 0)) + 1
+    if category == TRANSIENT and attempts < ExecutionContext.max_attempts:
+        return schedule_retry(item, attempts, message + detail)
+
+    item_processed_increment(item, FAILED, message + detail)
     store_failure_data(item, message, detail)
+    store_dead_letter(item, category, message, detail, attempts, execution_id, status)
     logger.error(
         "item %s raised an exception. You can see the item data in py_noir_code/resources/errors." %
         str(item["identifier"]))
-
-
-def item_processed_increment(item: dict):
-    global items
+    run_failure_hook(item, message + detail)
+
+
+def schedule_retry(item: dict, attempts: int, error: str):
+    """ Queue [item] again, after a backoff, its attempt [attempts] having failed on [error]
+    :param item:
+    :param attempts: number of failed attempts
+    :param error:
+    :return:
+    """
+    delay = get_retry_delay(attempts)
+    with state_lock:
+        item["attempts"] = attempts
+        running_executions.pop(str(item["identifier"]), None)
+        state_store.record_retry(item, error)
+    execution_queue.push(item, delay)
+    logger.warning("Item %s failed on a transient error (%s), attempt %s of %s in %.1f s" % (
+        item["identifier"], error.strip(), attempts + 1, ExecutionContext.max_attempts, delay))
+
+
+def item_processed_increment(item: dict, event: str, error: str = None):
     global nb_processed_items
     global processed_item_ids
 
-    item_id = item["identifier"]
-    items.remove(item)
-    nb_processed_items += 1
-    processed_item_ids.append(item_id)
-    items[0] = dict(nb_processed_items=nb_processed_items, processed_item_ids=processed_item_ids)
+    with state_lock:
+        item_id = item["identifier"]
+        del pending_items[str(item_id)]
+        nb_processed_items += 1
+        processed_item_ids.append(item_id)
+        running_executions.pop(str(item_id), None)
+        state_store.record_end(item, event, error)
+
+
+def get_header() -> dict:
+    return dict(nb_processed_items=nb_processed_items, processed_item_ids=processed_item_ids,
+                running_executions=running_executions, generation_complete=generation_complete)
 
-def manage_working_file(working_file):
-    global items
-    global saveFile
 
-    working_file.truncate(0)
-    working_file.seek(0)
-    working_file.write(json.dumps(items))
-    working_file.flush()
-    shutil.copy(working_file.name, saveFile)
-
-def get_items_from_json_file(json_file_name: str):
-    items_to_processed_file = open(json_file_name, "r")
-    items_to_processed = json.load(items_to_processed_file)
-    items_to_processed_file.close()
-    return items_to_processed
\ No newline at end of file
+def get_snapshot() -> list:
+    """ Get the current state in the working file format: header then pending items
+    :return:
+    """
+    with state_lock:
+        return [get_header()] + list(pending_items.values())
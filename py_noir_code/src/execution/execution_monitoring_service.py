@@ -0,0 +1,174 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures.thread import ThreadPoolExecutor
+
+from py_noir_code.src.API.retry_policy import CircuitOpenError
+from py_noir_code.src.execution.execution_duration_model import get_poll_delay
+from py_noir_code.src.execution.execution_failure_service import is_active_status
+from py_noir_code.src.execution.execution_service import get_execution_status, get_execution_monitoring
+from py_noir_code.src.execution.maintenance_window_service import get_polling_pause_end, log_pause, \
+    resume_after_maintenance
+from py_noir_code.src.utils.log_utils import get_logger
+
+"""
+Define the poller monitoring the status of all running VIP executions from a single thread
+"""
+
+logger = get_logger()
+
+# Log the status of a still running execution every this many polls
+STATUS_LOG_PERIOD = 12
+# Look up the monitoring of a created execution this many times before giving up on it
+MAX_MONITORING_LOOKUPS = 10
+
+
+class ExecutionPoller(object):
+    """
+    Tracks running executions and polls their status by batch: the status of all the executions due for a poll is
+    requested (spread on [nb_workers] threads), then [on_finished](entry, status) or [on_error](entry, exception) is
+    called for the executions that are no longer initializing or running. The next poll of each execution is scheduled
+    from its pipeline duration model.
+    An entry is a dict holding the item, the execution id and the monitoring identifier of the execution, looked up
+    before the first poll if unknown at the creation.
+    """
+
+    def __init__(self, on_finished, on_error, nb_workers: int = 1):
+        self.on_finished = on_finished
+        self.on_error = on_error
+        self.nb_polls = 0
+        self.schedule = []
+        self.sequence = itertools.count()
+        self.nb_tracked = 0
+        self.stopped = False
+        # end of the maintenance window the poller is waiting for, if any
+        self.paused_until = None
+        self.condition = threading.Condition()
+        self.executor = ThreadPoolExecutor(max_workers=max(nb_workers, 1), thread_name_prefix="execution-poll")
+        self.thread = threading.Thread(target=self.run, name="execution-poller", daemon=True)
+        self.thread.start()
+
+    def track(self, item: dict, execution_id, monitoring_id: str, created_at: float = None):
+        """ Start monitoring the execution [execution_id] of [item]
+        :param item:
+        :param execution_id:
+        :param monitoring_id: VIP workflow identifier of the execution, None if not known yet
+        :param created_at: creation timestamp of the execution, now by default
+        :return:
+        """
+        entry = dict(item=item, execution_id=execution_id, monitoring_id=monitoring_id, nb_polls=0, nb_lookups=0,
+                     created_at=created_at or time.time())
+        with self.condition:
+            self.nb_tracked += 1
+            self.schedule_poll(entry)
+            self.condition.notify_all()
+
+    def schedule_poll(self, entry: dict):
+        """ Schedule the next poll of [entry], must be called while holding [condition]
+        :param entry:
+        :return:
+        """
+        delay = get_poll_delay(entry['item'].get('pipelineIdentifier'), time.time() - entry['created_at'])
+        heapq.heappush(self.schedule, (time.monotonic() + delay, next(self.sequence), entry))
+
+    def get_due_entries(self) -> list:
+        """ Wait for executions to poll, and pop all those that are due
+        :return: list of entries, empty when the poller is stopped
+        """
+        with self.condition:
+            while not self.stopped:
+                pause_end = get_polling_pause_end()
+                if pause_end is not None:
+                    # no poll during a Shanoir maintenance window, the executions keep running on VIP
+                    log_pause("Status polls", pause_end)
+                    self.paused_until = pause_end
+                    self.condition.wait(max(pause_end - time.time(), 0))
+                    continue
+                now = time.monotonic()
+                if self.schedule and self.schedule[0][0] <= now:
+                    due_entries = []
+                    while self.schedule and self.schedule[0][0] <= now:
+                        due_entries.append(heapq.heappop(self.schedule)[2])
+                    return due_entries
+                self.condition.wait(self.schedule[0][0] - now if self.schedule else None)
+            return []
+
+    def run(self):
+        while True:
+            due_entries = self.get_due_entries()
+            if not due_entries:
+                return
+            if self.paused_until is not None:
+                resume_after_maintenance(self.paused_until)
+                self.paused_until = None
+            self.nb_polls += len(due_entries)
+            futures = [(entry, self.executor.submit(poll_status, entry)) for entry in due_entries]
+            for entry, future in futures:
+                self.handle_status(entry, future)
+
+    def handle_status(self, entry: dict, future):
+        try:
+            status = future.result()
+        except CircuitOpenError as e:
+            # Shanoir is unreachable (e.g. reboot window), keep waiting without calling it
+            logger.debug("Status of execution %s not available: %s" % (entry['execution_id'], e))
+            return self.reschedule(entry)
+        except Exception as e:
+            if entry['monitoring_id'] is None and entry['nb_lookups'] < MAX_MONITORING_LOOKUPS:
+                # the execution is created on VIP, its monitoring is looked up again at the next poll
+                entry['nb_lookups'] += 1
+                logger.warning("Monitoring of execution %s not found: %s" % (entry['execution_id'], e))
+                return self.reschedule(entry)
+            # transient failures have already been retried by the API layer
+            return self.complete(entry, self.on_error, e)
+
+        entry['nb_polls'] += 1
+        if is_active_status(status):
+            if entry['nb_polls'] % STATUS_LOG_PERIOD == 0:
+                logger.info("Status for execution " + str(entry['execution_id']) + " is " + status)
+            return self.reschedule(entry)
+        self.complete(entry, self.on_finished, status)
+
+    def reschedule(self, entry: dict):
+        with self.condition:
+            self.schedule_poll(entry)
+
+    def complete(self, entry: dict, callback, result):
+        try:
+            callback(entry, result)
+        except Exception:
+            logger.exception("Completion of execution %s failed" % entry['execution_id'])
+        finally:
+            with self.condition:
+                self.nb_tracked -= 1
+                self.condition.notify_all()
+
+    def get_nb_running(self) -> int:
+        with self.condition:
+            return self.nb_tracked
+
+    def wait_until_idle(self):
+        """ Block until every tracked execution is completed
+        :return:
+        """
+        with self.condition:
+            while self.nb_tracked > 0 and not self.stopped:
+                self.condition.wait()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.executor.shutdown(wait=True)
+
+
+def poll_status(entry: dict) -> str:
+    """ Get the status of the execution of [entry], looking up its monitoring identifier first if unknown
+    :param entry:
+    :return:
+    """
+    if entry['monitoring_id'] is None:
+        entry['monitoring_id'] = get_execution_monitoring(entry['execution_id'])['identifier']
+    return get_execution_status(entry['monitoring_id'])
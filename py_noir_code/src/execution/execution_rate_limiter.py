@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+
+from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.utils.log_utils import get_logger
+
+"""
+Define the token bucket pacing the execution creations
+"""
+
+logger = get_logger()
+
+
+class TokenBucket(object):
+    """
+    Token bucket of [rate] tokens per second holding at most [burst] tokens: up to [burst] calls go through at once,
+    then one every 1 / [rate] seconds. Tokens are reserved in call order, a caller may take a token not available yet
+    and waits until it is. A [rate] of 0 disables the pacing.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.nb_acquired = 0
+        self.nb_delayed = 0
+        self.total_wait = 0.0
+
+    def reserve(self) -> float:
+        """ Take a token
+        :return: the delay (seconds) before the token is available
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.tokens + (now - self.updated) * self.rate, float(self.burst))
+            self.updated = now
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.nb_acquired += 1
+            if delay > 0:
+                self.nb_delayed += 1
+                self.total_wait += delay
+            return delay
+
+    def acquire(self):
+        """ Block until a token is available
+        :return:
+        """
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """ Wait, without blocking the event loop, until a token is available
+        :return:
+        """
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(rate=self.rate, burst=self.burst, acquired=self.nb_acquired, delayed=self.nb_delayed,
+                        total_wait=self.total_wait)
+
+
+submission_bucket: TokenBucket = None
+submission_bucket_lock = threading.Lock()
+
+
+def get_submission_bucket() -> TokenBucket:
+    """ Return the bucket shared by all execution creations, built on first use from [ExecutionContext]
+    :return:
+    """
+    global submission_bucket
+    if submission_bucket is None:
+        with submission_bucket_lock:
+            if submission_bucket is None:
+                submission_bucket = TokenBucket(ExecutionContext.submit_rate, ExecutionContext.submit_burst)
+    return submission_bucket
+
+
+def reset_submission_bucket():
+    """ Forget the bucket, so that the next batch is paced from the current [ExecutionContext]
+    :return:
+    """
+    global submission_bucket
+    with submission_bucket_lock:
+        submission_bucket = None
+
+
+def log_submission_stats():
+    """ Log how much the execution creations were delayed by the pacing
+    :return:
+    """
+    if submission_bucket is None:
+        return
+    stats = submission_bucket.get_stats()
+    if stats['rate'] <= 0 or stats['acquired'] == 0:
+        return
+    logger.info("Execution creations paced at %s/s (burst %s): %s of %s delayed, %.1f s in total" % (
+        stats['rate'], stats['burst'], stats['delayed'], stats['acquired'], stats['total_wait']))
@@ -0,0 +1,202 @@
+import datetime
+import heapq
+import itertools
+import threading
+import time
+
+from py_noir_code.src.execution.execution_duration_model import get_expected_duration
+from py_noir_code.src.utils.log_utils import get_logger
+
+"""
+Define the order in which items are submitted (scheduling policies), and the makespan simulation of those policies
+"""
+
+logger = get_logger()
+
+# Item field giving the expected duration (seconds) of its execution, overriding the pipeline history
+DURATION_HINT = "expectedDuration"
+
+FIFO = "fifo"
+LPT = "lpt"
+SPT = "spt"
+POLICIES = (LPT, FIFO, SPT)
+
+
+def get_dataset_count(item: dict) -> int:
+    return sum(len(parameter.get("datasetIds", [])) for parameter in item.get("datasetParameters", []))
+
+
+def get_predicted_duration(item: dict):
+    """ Predict the duration of the execution of [item]: its [DURATION_HINT] field, otherwise its pipeline history
+    :param item:
+    :return: seconds, None if unknown
+    """
+    if item.get(DURATION_HINT) is not None:
+        return float(item[DURATION_HINT])
+    return get_expected_duration(item.get("pipelineIdentifier"))
+
+
+def get_predicted_durations(items: list, default_duration: float = 0.0) -> list:
+    """ Predict the duration of every item execution, the unknown ones getting the mean of the known ones
+    (or [default_duration] if none is known)
+    :param items:
+    :param default_duration:
+    :return: list of seconds, in [items] order
+    """
+    durations = [get_predicted_duration(item) for item in items]
+    known_durations = [duration for duration in durations if duration is not None]
+    if known_durations:
+        default_duration = sum(known_durations) / len(known_durations)
+    return [default_duration if duration is None else duration for duration in durations]
+
+
+class ExecutionQueue(object):
+    """
+    Priority queue of the items to submit:
+    - lpt: longest predicted duration first, so that long executions do not stretch the end of the batch
+    - spt: shortest predicted duration first
+    - fifo: items order
+    Ties are broken by the number of input datasets (the most first), then by insertion order. Items without predicted
+    duration (no hint, no pipeline history) keep their insertion order, at the mean predicted duration.
+    Items pushed with a delay (retries) are held back until their delay is over.
+    """
+
+    def __init__(self, policy: str = LPT):
+        if policy not in POLICIES:
+            raise ValueError("Unknown scheduling policy %s, expected one of %s" % (policy, ", ".join(POLICIES)))
+        self.policy = policy
+        self.heap = []
+        # (monotonic time the item is ready, sequence, item) of the items held back
+        self.delayed = []
+        # predicted duration of the items without prediction, the mean of the last predicted batch
+        self.default_duration = 0.0
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+        # notified when an item is popped
+        self.popped = threading.Condition(self.lock)
+
+    def get_priority(self, item: dict, duration) -> tuple:
+        """ Get the priority of [item] of predicted [duration]
+        :param item:
+        :param duration: seconds, None if unknown
+        :return:
+        """
+        if self.policy == FIFO:
+            return ()
+        if duration is None:
+            # the dataset count is no duration estimate, it would only shuffle the items
+            return (-self.default_duration if self.policy == LPT else self.default_duration, 0)
+        return (-duration if self.policy == LPT else duration, -get_dataset_count(item))
+
+    def extend(self, items: list):
+        predicted_durations = [get_predicted_duration(item) for item in items]
+        with self.lock:
+            if any(duration is not None for duration in predicted_durations):
+                self.default_duration = sum(get_predicted_durations(items, self.default_duration)) / len(items)
+            for item, duration in zip(items, predicted_durations):
+                heapq.heappush(self.heap, (self.get_priority(item, duration), next(self.sequence), item))
+
+    def push(self, item: dict, delay: float = 0):
+        """ Queue [item], not to be submitted before [delay] seconds
+        :param item:
+        :param delay:
+        :return:
+        """
+        if delay <= 0:
+            return self.extend([item])
+        with self.lock:
+            heapq.heappush(self.delayed, (time.monotonic() + delay, next(self.sequence), item))
+
+    def release_delayed_items(self):
+        """ Move the items whose delay is over to the queue, must be called while holding [lock]
+        :return:
+        """
+        now = time.monotonic()
+        while self.delayed and self.delayed[0][0] <= now:
+            _, sequence, item = heapq.heappop(self.delayed)
+            heapq.heappush(self.heap, (self.get_priority(item, get_predicted_duration(item)), sequence, item))
+
+    def pop(self) -> dict:
+        """ Remove and return the next item to submit
+        :return: the item, None if no item is ready
+        """
+        with self.lock:
+            self.release_delayed_items()
+            if not self.heap:
+                return None
+            self.popped.notify_all()
+            return heapq.heappop(self.heap)[2]
+
+    def wait_until_shorter(self, size: int):
+        """ Block until less than [size] items are ready to submit, the producers' backpressure
+        :param size:
+        :return:
+        """
+        with self.lock:
+            while len(self.heap) >= size:
+                self.popped.wait()
+
+    def get_wait_time(self):
+        """ Get the delay before the next held back item is ready
+        :return: seconds, None if no item is held back
+        """
+        with self.lock:
+            return max(self.delayed[0][0] - time.monotonic(), 0.0) if self.delayed else None
+
+    def __len__(self):
+        with self.lock:
+            return len(self.heap) + len(self.delayed)
+
+
+def simulate_makespan(durations: list, nb_slots: int = 0, submit_rate: float = 0.0, submit_burst: int = 1) -> float:
+    """ Simulate the batch end time when executions of [durations] are submitted in this order, paced at [submit_rate]
+    creations per second after a burst of [submit_burst], each starting on the first free slot among [nb_slots]
+    :param durations: seconds, in submission order
+    :param nb_slots: maximum number of executions running at once, 0 for no limit
+    :param submit_rate: creations per second, 0 for no pacing
+    :param submit_burst:
+    :return: makespan in seconds
+    """
+    slot_ends = [0.0] * (nb_slots if nb_slots > 0 else len(durations))
+    makespan = 0.0
+    for index, duration in enumerate(durations):
+        # earliest creation time allowed by the token bucket
+        paced_start = max(index + 1 - max(submit_burst, 1), 0) / submit_rate if submit_rate > 0 else 0.0
+        start = max(heapq.heappop(slot_ends), paced_start) if slot_ends else 0.0
+        end = start + duration
+        heapq.heappush(slot_ends, end)
+        makespan = max(makespan, end)
+    return makespan
+
+
+def simulate_policies(items: list, nb_slots: int = 0, submit_rate: float = 0.0, submit_burst: int = 1) -> dict:
+    """ Simulate the makespan of [items] under every scheduling policy, from their predicted durations
+    :param items:
+    :param nb_slots: maximum number of executions running at once, 0 for no limit
+    :param submit_rate: creations per second, 0 for no pacing
+    :param submit_burst:
+    :return: dict policy -> makespan in seconds
+    """
+    makespans = {}
+    for policy in POLICIES:
+        queue = ExecutionQueue(policy)
+        queue.extend(items)
+        ordered_items = [queue.pop() for _ in range(len(queue))]
+        makespans[policy] = simulate_makespan(get_predicted_durations(ordered_items), nb_slots, submit_rate,
+                                              submit_burst)
+    return makespans
+
+
+def log_simulated_makespans(items: list, nb_slots: int = 0, submit_rate: float = 0.0, submit_burst: int = 1):
+    """ Log the expected makespan of [items] under every scheduling policy, if some durations can be predicted
+    :param items:
+    :param nb_slots:
+    :param submit_rate:
+    :param submit_burst:
+    :return:
+    """
+    if not any(get_predicted_duration(item) is not None for item in items):
+        return
+    makespans = simulate_policies(items, nb_slots, submit_rate, submit_burst)
+    logger.info("Expected makespan per scheduling policy: " + ", ".join(
+        "%s %s" % (policy, datetime.timedelta(seconds=int(makespan))) for policy, makespan in makespans.items()))
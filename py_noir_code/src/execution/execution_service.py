@@ -1,5 +1,4 @@
 import json
-import time
 
 from py_noir_code.src.API.api_service import post, get
 from py_noir_code.src.utils.log_utils import get_logger
@@ -13,7 +12,11 @@ logger = get_logger()
 def create_execution(execution: dict):
     path = "/datasets/vip/execution/"
     response = post(path, {}, data=json.dumps(execution), raise_for_status=False)
-    return response.json()
+    content = response.json()
+    if response.status_code >= 400 and isinstance(content, dict):
+        # the HTTP status tells whether another attempt is worth it
+        content.setdefault("code", response.status_code)
+    return content
 
 def get_execution_status(execution_monitoring_id:  str):
     """ Get execution status from [execution_monitoring_id]
@@ -32,15 +35,15 @@ def get_execution_monitoring(execution_id: str) -> list:
 
     path = '/datasets/execution-monitoring/' + str(execution_id)
     response = get(path)
+    return response.json()
 
-    for attempt in range(3):
-        try:
-            response = get(path)
-            response.raise_for_status()
-            return response.json()
-        except response.RequestException as e:
-            logger.error("Attempt {attempt + 1} failed: {e}")
-            if attempt <  2:
-                time.sleep(2)
-            else:
-                raise
\ No newline at end of file
+def find_monitoring_identifier(execution_id: str):
+    """ Get the VIP workflow identifier of the just created execution [execution_id]
+    :param execution_id:
+    :return: the identifier, None if the lookup failed: the execution runs on VIP, its monitoring looks it up again
+    """
+    try:
+        return get_execution_monitoring(execution_id)['identifier']
+    except Exception as e:
+        logger.warning("Monitoring of execution %s not found yet: %s" % (execution_id, e))
+        return None
@@ -0,0 +1,469 @@
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+
+from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.execution.execution_journal_service import read_snapshot, CREATED, SUCCEEDED, FAILED
+from py_noir_code.src.execution.execution_scheduling_service import ExecutionQueue
+from py_noir_code.src.utils.log_utils import get_logger
+
+"""
+Define the SQLite execution state stores: one row per item, with its status, execution, timestamps and error.
+The shared store lets several processes, possibly on several hosts, work on the same batch by leasing its items.
+"""
+
+logger = get_logger()
+
+# Seconds to wait for a database locked by another process
+BUSY_TIMEOUT = 60
+
+# Seconds between two claims while the other processes hold all the unfinished items
+CLAIM_RETRY_DELAY = 5
+# Seconds between two claims while waiting for the items still generated by a process
+GENERATION_CLAIM_DELAY = 1
+
+PENDING = "pending"
+RUNNING = "running"
+STATUSES = {CREATED: RUNNING, SUCCEEDED: SUCCEEDED, FAILED: FAILED}
+
+# Back to pending after a transient failure, the execution of the failed attempt is forgotten
+RETRY_UPDATE = "UPDATE items SET status = ?, item = ?, execution_id = NULL, monitoring_id = NULL, started_at = NULL, " \
+               "error = ?"
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS items (identifier INTEGER PRIMARY KEY, status TEXT NOT NULL, item TEXT NOT NULL, "
+    "execution_id TEXT, monitoring_id TEXT, created_at REAL, started_at REAL, ended_at REAL, "
+    "attempts INTEGER NOT NULL DEFAULT 0, error TEXT, rank INTEGER, owner TEXT, lease_expires REAL)",
+    "CREATE INDEX IF NOT EXISTS items_status ON items (status)",
+    "CREATE TABLE IF NOT EXISTS batch (key TEXT PRIMARY KEY, value TEXT)",
+]
+
+
+class SQLiteStateStore(object):
+    """
+    Execution state kept in a SQLite database next to the save file, updated in place on every state change.
+    Not thread-safe, callers serialize the calls.
+    """
+
+    def __init__(self, working_file_name: str, save_file_name: str):
+        self.working_file_name = working_file_name
+        self.save_file_name = save_file_name
+        self.database_file_name = get_database_file_name(save_file_name)
+        self.connection: sqlite3.Connection = None
+
+    def load(self, resume: bool) -> list:
+        """ Get the state from the database when resuming, otherwise from the working file (which fills the database)
+        :param resume:
+        :return: header then pending items
+        """
+        if resume and os.path.exists(self.database_file_name):
+            self.connection = connect(self.database_file_name)
+            return self.read_state()
+
+        items = read_snapshot(self.working_file_name)
+        for file_name in (self.database_file_name, self.database_file_name + "-wal", self.database_file_name + "-shm"):
+            if os.path.exists(file_name):
+                os.remove(file_name)
+        self.connection = connect(self.database_file_name)
+        with self.connection:
+            self.insert_items(items)
+        return items
+
+    def insert_items(self, items: list):
+        """ Insert the header and the pending items of [items], ranked in submission order
+        :param items:
+        :return:
+        """
+        queue = ExecutionQueue(ExecutionContext.scheduling_policy)
+        queue.extend(items[1:])
+        ranks = {item["identifier"]: rank for rank, item in enumerate(queue.pop() for _ in range(len(queue)))}
+        self.connection.execute("INSERT INTO batch VALUES ('header', ?)", (json.dumps(items[0]),))
+        self.insert_item_rows(items[1:], ranks)
+
+    def insert_item_rows(self, items: list, ranks: dict):
+        now = time.time()
+        self.connection.executemany("INSERT INTO items (identifier, status, item, created_at, rank) "
+                                    "VALUES (?, ?, ?, ?, ?)",
+                                    ((item["identifier"], PENDING, json.dumps(item), now, ranks[item["identifier"]])
+                                     for item in items))
+
+    def update_header(self, **fields):
+        """ Update the batch header stored in the database, must be called in a transaction
+        :param fields:
+        :return:
+        """
+        header = json.loads(self.connection.execute("SELECT value FROM batch WHERE key = 'header'").fetchone()[0])
+        header.update(fields)
+        self.connection.execute("UPDATE batch SET value = ? WHERE key = 'header'", (json.dumps(header),))
+
+    def read_state(self) -> list:
+        """ Build the header and pending items from the database
+        :return: header then pending items
+        """
+        header = json.loads(self.connection.execute("SELECT value FROM batch WHERE key = 'header'").fetchone()[0])
+        ended_item_ids = [row[0] for row in self.connection.execute(
+            "SELECT identifier FROM items WHERE status IN (?, ?) ORDER BY ended_at", (SUCCEEDED, FAILED))]
+        running_executions = {str(identifier): dict(execution_id=json.loads(execution_id), monitoring_id=monitoring_id,
+                                                    created_at=started_at)
+                              for identifier, execution_id, monitoring_id, started_at in self.connection.execute(
+                                  "SELECT identifier, execution_id, monitoring_id, started_at FROM items "
+                                  "WHERE status = ?", (RUNNING,))}
+        pending_items = [json.loads(row[0]) for row in self.connection.execute(
+            "SELECT item FROM items WHERE status IN (?, ?) ORDER BY identifier", (PENDING, RUNNING))]
+        header = dict(nb_processed_items=int(header["nb_processed_items"]) + len(ended_item_ids),
+                      processed_item_ids=list(header["processed_item_ids"]) + ended_item_ids,
+                      running_executions=running_executions,
+                      generation_complete=header.get("generation_complete", True))
+        return [header] + pending_items
+
+    def open(self, get_snapshot):
+        """ Write the save file once, its presence tells the projects to resume. Every change is then written in place.
+        :param get_snapshot:
+        :return:
+        """
+        if not os.path.exists(self.save_file_name):
+            shutil.copy(self.working_file_name, self.save_file_name)
+
+    def claim(self) -> tuple:
+        """ Only the shared store hands out items during the run
+        :return: (items, running executions, delay before the next claim)
+        """
+        return [], {}, None
+
+    def record_creation(self, item: dict, execution_id, monitoring_id: str, created_at: float):
+        with self.connection:
+            self.connection.execute("UPDATE items SET status = ?, execution_id = ?, monitoring_id = ?, started_at = ?, "
+                                    "attempts = attempts + 1 WHERE identifier = ?",
+                                    (RUNNING, json.dumps(execution_id), monitoring_id, created_at,
+                                     item["identifier"]))
+
+    def record_end(self, item: dict, event: str, error: str = None):
+        with self.connection:
+            self.connection.execute("UPDATE items SET status = ?, ended_at = ?, error = ? WHERE identifier = ?",
+                                    (STATUSES[event], time.time(), error, item["identifier"]))
+
+    def record_retry(self, item: dict, error: str = None):
+        with self.connection:
+            self.connection.execute(RETRY_UPDATE + " WHERE identifier = ?",
+                                    (PENDING, json.dumps(item), error, item["identifier"]))
+
+    def add_items(self, items: list) -> list:
+        """ Insert the streamed [items], ranked in generation order
+        :param items:
+        :return: the items to process by this process, all of them
+        """
+        with self.connection:
+            self.insert_item_rows(items, {item["identifier"]: item["identifier"] for item in items})
+        return items
+
+    def record_generation_end(self, complete: bool):
+        """ Record the end of the streamed generation, if all the items were produced
+        :param complete: False if the generation failed
+        :return:
+        """
+        if complete:
+            with self.connection:
+                self.update_header(generation_complete=True)
+
+    def is_generation_complete(self) -> bool:
+        """ Tell whether all the items of the batch were generated, possibly by another process
+        :return:
+        """
+        header = self.connection.execute("SELECT value FROM batch WHERE key = 'header'").fetchone()[0]
+        return json.loads(header).get("generation_complete", True)
+
+    def close(self):
+        """ Remove the working and save files once all the items are processed, the database is kept for queries
+        :return:
+        """
+        self.connection.close()
+        os.remove(self.working_file_name)
+        os.remove(self.save_file_name)
+        logger.info("Execution states kept in " + self.database_file_name)
+
+
+class SharedSQLiteStateStore(SQLiteStateStore):
+    """
+    SQLite state store shared by the processes working on the same batch: each process claims a few items at a time
+    with a lease of [ExecutionContext.lease_duration] seconds, renewed in background while it works on them. The items
+    of a process that stopped renewing its leases (e.g. crashed) are claimed again by the others, their created
+    executions being only monitored again. Thread-safe.
+    """
+
+    def __init__(self, working_file_name: str, save_file_name: str):
+        super().__init__(working_file_name, save_file_name)
+        self.owner = "%s:%s" % (socket.gethostname(), os.getpid())
+        self.lock = threading.RLock()
+        self.stop_event = threading.Event()
+        self.renewal_thread: threading.Thread = None
+        # True while this process streams the items of the batch
+        self.generating = False
+
+    def load(self, resume: bool) -> list:
+        """ Join the batch in progress in the database, or start it from the working file, then claim a first
+        set of items
+        :param resume:
+        :return: header then claimed items
+        """
+        # rollback journal and file locks, as WAL does not work on network filesystems
+        self.connection = connect(self.database_file_name, journal_mode="DELETE")
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                if self.count_unfinished_items() > 0 or self.is_generation_ongoing():
+                    logger.info("Joining the batch in progress in " + self.database_file_name)
+                else:
+                    self.connection.execute("DELETE FROM items")
+                    self.connection.execute("DELETE FROM batch")
+                    items = read_snapshot(self.working_file_name)
+                    self.insert_items(items)
+                    if not items[0].get("generation_complete", True):
+                        # the items are streamed by this process, the others wait for them
+                        self.generating = True
+                        self.renew_generation()
+                self.connection.commit()
+            except Exception:
+                self.connection.rollback()
+                raise
+        items, running_executions, _ = self.claim()
+        header = self.read_header()
+        header["running_executions"] = running_executions
+        return [header] + items
+
+    def read_header(self) -> dict:
+        """ Build the header from the database: all the ended items of the batch and its size
+        :return:
+        """
+        header = json.loads(self.connection.execute("SELECT value FROM batch WHERE key = 'header'").fetchone()[0])
+        ended_item_ids = [row[0] for row in self.connection.execute(
+            "SELECT identifier FROM items WHERE status IN (?, ?) ORDER BY ended_at", (SUCCEEDED, FAILED))]
+        nb_items = self.connection.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        return dict(nb_processed_items=int(header["nb_processed_items"]) + len(ended_item_ids),
+                    processed_item_ids=list(header["processed_item_ids"]) + ended_item_ids,
+                    nb_items=len(header["processed_item_ids"]) + nb_items,
+                    generation_complete=header.get("generation_complete", True))
+
+    def is_generation_ongoing(self) -> bool:
+        """ Tell whether a process streams items in the batch, and still renews its generation lease
+        :return:
+        """
+        row = self.connection.execute("SELECT value FROM batch WHERE key = 'generating_until'").fetchone()
+        return row is not None and float(row[0]) > time.time()
+
+    def renew_generation(self):
+        self.connection.execute("INSERT OR REPLACE INTO batch VALUES ('generating_until', ?)",
+                                (str(time.time() + ExecutionContext.lease_duration),))
+
+    def count_unfinished_items(self, other_owners_only: bool = False) -> int:
+        query = "SELECT COUNT(*) FROM items WHERE status IN (?, ?)"
+        parameters = (PENDING, RUNNING)
+        if other_owners_only:
+            query += " AND (owner IS NULL OR owner != ?)"
+            parameters += (self.owner,)
+        return self.connection.execute(query, parameters).fetchone()[0]
+
+    def open(self, get_snapshot):
+        super().open(get_snapshot)
+        self.renewal_thread = threading.Thread(target=self.renew_leases, name="lease-renewal", daemon=True)
+        self.renewal_thread.start()
+
+    def claim(self) -> tuple:
+        """ Lease the next [ExecutionContext.claim_size] unfinished items nobody holds a valid lease on, the running
+        ones (left by a stopped process) first, then in submission order
+        :return: (items, running executions of the claimed items, delay before the next claim: 0 if items were
+        claimed, None if no item is left to claim, even later)
+        """
+        with self.lock:
+            now = time.time()
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.connection.execute(
+                    "SELECT identifier, item, execution_id, monitoring_id, started_at, owner FROM items "
+                    "WHERE status IN (?, ?) AND (owner IS NULL OR lease_expires < ?) "
+                    "ORDER BY status = ? DESC, rank LIMIT ?",
+                    (PENDING, RUNNING, now, RUNNING, ExecutionContext.claim_size)).fetchall()
+                self.connection.executemany("UPDATE items SET owner = ?, lease_expires = ? WHERE identifier = ?",
+                                            ((self.owner, now + ExecutionContext.lease_duration, row[0])
+                                             for row in rows))
+                nb_leased_by_others = self.count_unfinished_items(other_owners_only=True)
+                generation_ongoing = self.is_generation_ongoing()
+                self.connection.commit()
+            except Exception:
+                self.connection.rollback()
+                raise
+
+        items = []
+        running_executions = {}
+        for identifier, item, execution_id, monitoring_id, started_at, owner in rows:
+            items.append(json.loads(item))
+            if execution_id is not None:
+                running_executions[str(identifier)] = dict(execution_id=json.loads(execution_id),
+                                                           monitoring_id=monitoring_id, created_at=started_at)
+            if owner is not None and owner != self.owner:
+                logger.info("Item %s taken over from %s, whose lease expired" % (identifier, owner))
+        if items:
+            return items, running_executions, 0
+        if generation_ongoing:
+            return items, running_executions, GENERATION_CLAIM_DELAY
+        # wait for the items leased by the other processes, in case one of them stops
+        return items, running_executions, CLAIM_RETRY_DELAY if nb_leased_by_others else None
+
+    def renew_leases(self):
+        while not self.stop_event.wait(ExecutionContext.lease_duration / 3):
+            try:
+                with self.lock, self.connection:
+                    self.connection.execute("UPDATE items SET lease_expires = ? WHERE owner = ? AND status IN (?, ?)",
+                                            (time.time() + ExecutionContext.lease_duration, self.owner, PENDING,
+                                             RUNNING))
+                    if self.generating:
+                        self.renew_generation()
+            except sqlite3.Error as e:
+                logger.warning("Lease renewal failed: %s" % e)
+
+    def record_creation(self, item: dict, execution_id, monitoring_id: str, created_at: float):
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                "UPDATE items SET status = ?, execution_id = ?, monitoring_id = ?, started_at = ?, "
+                "attempts = attempts + 1 WHERE identifier = ? AND owner = ?",
+                (RUNNING, json.dumps(execution_id), monitoring_id, created_at, item["identifier"], self.owner))
+        if cursor.rowcount == 0:
+            logger.warning("Lease of item %s lost before its execution %s was recorded" % (item["identifier"],
+                                                                                          execution_id))
+
+    def record_end(self, item: dict, event: str, error: str = None):
+        with self.lock, self.connection:
+            self.connection.execute("UPDATE items SET status = ?, ended_at = ?, error = ?, owner = NULL, "
+                                    "lease_expires = NULL WHERE identifier = ? AND owner = ?",
+                                    (STATUSES[event], time.time(), error, item["identifier"], self.owner))
+
+    def record_retry(self, item: dict, error: str = None):
+        with self.lock, self.connection:
+            self.connection.execute(RETRY_UPDATE + " WHERE identifier = ? AND owner = ?",
+                                    (PENDING, json.dumps(item), error, item["identifier"], self.owner))
+
+    def add_items(self, items: list) -> list:
+        """ Insert the streamed [items], claimed later like the others, by any process
+        :param items:
+        :return: the items to process by this process right away, none
+        """
+        with self.lock, self.connection:
+            self.insert_item_rows(items, {item["identifier"]: item["identifier"] for item in items})
+            self.renew_generation()
+        return []
+
+    def record_generation_end(self, complete: bool):
+        """ Release the generation lease, and record the end of the generation if all the items were produced
+        :param complete: False if the generation failed
+        :return:
+        """
+        with self.lock, self.connection:
+            self.generating = False
+            self.connection.execute("DELETE FROM batch WHERE key = 'generating_until'")
+            if complete:
+                self.update_header(generation_complete=True)
+
+    def close(self):
+        """ Release the leases, and remove the working and save files if the whole batch is over
+        :return:
+        """
+        self.stop_event.set()
+        if self.renewal_thread is not None:
+            self.renewal_thread.join()
+        with self.lock:
+            with self.connection:
+                self.connection.execute("UPDATE items SET owner = NULL, lease_expires = NULL WHERE owner = ?",
+                                        (self.owner,))
+            batch_over = self.count_unfinished_items() == 0 and not self.is_generation_ongoing()
+            self.connection.close()
+        if batch_over:
+            for file_name in (self.working_file_name, self.save_file_name):
+                if os.path.exists(file_name):
+                    os.remove(file_name)
+            logger.info("Execution states kept in " + self.database_file_name)
+
+
+def get_database_file_name(save_file_name: str) -> str:
+    return os.path.splitext(save_file_name)[0] + ".sqlite"
+
+
+def connect(database_file_name: str, read_only: bool = False, journal_mode: str = "WAL") -> sqlite3.Connection:
+    """ Open the state database [database_file_name], creating its tables if needed
+    :param database_file_name:
+    :param read_only: True to query a database possibly in use by a running batch
+    :param journal_mode: WAL, or DELETE for a database shared by several hosts
+    :return:
+    """
+    if read_only:
+        return sqlite3.connect("file:" + database_file_name + "?mode=ro", uri=True, timeout=BUSY_TIMEOUT)
+    connection = sqlite3.connect(database_file_name, check_same_thread=False, timeout=BUSY_TIMEOUT)
+    connection.execute("PRAGMA journal_mode=" + journal_mode)
+    connection.execute("PRAGMA synchronous=NORMAL")
+    for statement in SCHEMA:
+        connection.execute(statement)
+    # databases created before the lease columns
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(items)")]
+    for column, column_type in (("rank", "INTEGER"), ("owner", "TEXT"), ("lease_expires", "REAL")):
+        if column not in columns:
+            connection.execute("ALTER TABLE items ADD COLUMN %s %s" % (column, column_type))
+    connection.commit()
+    return connection
+
+
+def get_status_summary(connection: sqlite3.Connection) -> dict:
+    """ Count the items per status
+    :param connection:
+    :return: dict status -> count
+    """
+    return dict(connection.execute("SELECT status, COUNT(*) FROM items GROUP BY status").fetchall())
+
+
+def get_running_executions(connection: sqlite3.Connection) -> list:
+    """ Get the running executions, the oldest first
+    :param connection:
+    :return: list of dict(identifier, execution_id, monitoring_id, attempts, duration)
+    """
+    return [dict(identifier=identifier, execution_id=json.loads(execution_id), monitoring_id=monitoring_id,
+                 attempts=attempts, duration=time.time() - started_at)
+            for identifier, execution_id, monitoring_id, attempts, started_at in connection.execute(
+                "SELECT identifier, execution_id, monitoring_id, attempts, started_at FROM items WHERE status = ? "
+                "ORDER BY started_at", (RUNNING,))]
+
+
+def get_failed_executions(connection: sqlite3.Connection) -> list:
+    """ Get the failed items, the most recent first
+    :param connection:
+    :return: list of dict(identifier, execution_id, attempts, ended_at, error)
+    """
+    return [dict(identifier=identifier, execution_id=json.loads(execution_id) if execution_id else None,
+                 attempts=attempts, ended_at=ended_at, error=error)
+            for identifier, execution_id, attempts, ended_at, error in connection.execute(
+                "SELECT identifier, execution_id, attempts, ended_at, error FROM items WHERE status = ? "
+                "ORDER BY ended_at DESC", (FAILED,))]
+
+
+def get_slowest_executions(connection: sqlite3.Connection, limit: int = 10) -> list:
+    """ Get the [limit] longest executions, ended or still running
+    :param connection:
+    :param limit:
+    :return: list of dict(identifier, execution_id, status, duration)
+    """
+    return [dict(identifier=identifier, execution_id=json.loads(execution_id), status=status, duration=duration)
+            for identifier, execution_id, status, duration in connection.execute(
+                "SELECT identifier, execution_id, status, COALESCE(ended_at, ?) - started_at AS duration FROM items "
+                "WHERE started_at IS NOT NULL ORDER BY duration DESC LIMIT ?", (time.time(), limit))]
+
+
+def get_worker_leases(connection: sqlite3.Connection) -> list:
+    """ Get the processes holding leases on unfinished items
+    :param connection:
+    :return: list of dict(owner, items, running, lease_expires)
+    """
+    return [dict(owner=owner, items=nb_items, running=nb_running, lease_expires=lease_expires)
+            for owner, nb_items, nb_running, lease_expires in connection.execute(
+                "SELECT owner, COUNT(*), SUM(status = ?), MAX(lease_expires) FROM items "
+                "WHERE owner IS NOT NULL AND status IN (?, ?) GROUP BY owner ORDER BY owner",
+                (RUNNING, PENDING, RUNNING))]
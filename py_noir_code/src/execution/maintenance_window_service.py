@@ -0,0 +1,261 @@
+import asyncio
+import datetime
+import threading
+import time
+from concurrent.futures.thread import ThreadPoolExecutor
+
+from py_noir_code.src.API.api_service import authenticated_request
+from py_noir_code.src.API.api_session import reset_session, get_pool_maxsize
+from py_noir_code.src.API.async_api_service import detach_async_session
+from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.security.authentication_service import refresh_access_token
+from py_noir_code.src.utils.log_utils import get_logger
+
+"""
+Define the Shanoir maintenance windows (e.g. the nightly server reboot), during which execution creations and status
+polls are suspended, and the reconnection once a window is over
+"""
+
+logger = get_logger()
+
+ONE_DAY = datetime.timedelta(days=1)
+# Cheap authenticated call opening the connections again after a window, whatever its status
+WARMUP_PATH = "/datasets/execution-monitoring/0"
+
+# (maintenance_windows option, reboot hours) -> parsed windows
+windows_cache = (None, [])
+pause_lock = threading.Lock()
+# activity -> end of the pause last logged
+logged_pauses = {}
+# Serializes the reconnections, time of the last one
+resume_lock = threading.Lock()
+last_resume = 0.0
+
+
+class MaintenanceWindow(object):
+    """
+    Daily time range [start, end), crossing midnight when [end] is before [start]
+    """
+
+    def __init__(self, start: datetime.time, end: datetime.time):
+        if start == end:
+            raise ValueError("Empty maintenance window %s" % start.strftime("%H:%M"))
+        self.start = start
+        self.end = end
+
+    def get_end(self, moment: datetime.datetime):
+        """ Get the end of the occurrence of the window containing [moment]
+        :param moment:
+        :return: datetime, None if [moment] is not in the window
+        """
+        for start_day in (moment.date() - ONE_DAY, moment.date()):
+            start = datetime.datetime.combine(start_day, self.start)
+            end = datetime.datetime.combine(start_day if self.end > self.start else start_day + ONE_DAY, self.end)
+            if start <= moment < end:
+                return end
+        return None
+
+    def __str__(self):
+        return "%s-%s" % (self.start.strftime("%H:%M"), self.end.strftime("%H:%M"))
+
+
+def parse_maintenance_windows(windows: str) -> list:
+    """ Parse the comma separated windows [windows], e.g. "05:00-07:00, 23:30-00:15"
+    :param windows:
+    :return: list of MaintenanceWindow
+    """
+    maintenance_windows = []
+    for window in (windows or "").split(","):
+        if not window.strip():
+            continue
+        try:
+            start, end = (datetime.datetime.strptime(bound.strip(), "%H:%M").time() for bound in window.split("-"))
+        except ValueError:
+            raise ValueError("Invalid maintenance window '%s', expected HH:MM-HH:MM" % window.strip())
+        maintenance_windows.append(MaintenanceWindow(start, end))
+    return maintenance_windows
+
+
+def get_maintenance_windows() -> list:
+    """ Get the windows of [ExecutionContext.maintenance_windows], or the reboot window
+    [ExecutionContext.server_reboot_beginning_hour, ExecutionContext.server_reboot_ending_hour) if not set
+    :return: list of MaintenanceWindow
+    """
+    global windows_cache
+    key = (ExecutionContext.maintenance_windows, ExecutionContext.server_reboot_beginning_hour,
+           ExecutionContext.server_reboot_ending_hour)
+    if windows_cache[0] != key:
+        windows = ExecutionContext.maintenance_windows
+        beginning_hour, ending_hour = key[1], key[2]
+        if not windows and is_hour_set(beginning_hour) != is_hour_set(ending_hour):
+            logger.warning("Only one of server_reboot_beginning_hour (%s) and server_reboot_ending_hour (%s) is set, "
+                           "no reboot window applies" % (beginning_hour, ending_hour))
+        if not windows and beginning_hour is not None and ending_hour is not None \
+                and 0 <= beginning_hour < 24 and 0 <= ending_hour < 24 and beginning_hour != ending_hour:
+            windows = "%02d:00-%02d:00" % (beginning_hour, ending_hour)
+        windows_cache = (key, parse_maintenance_windows(windows))
+    return windows_cache[1]
+
+
+def is_hour_set(hour: int) -> bool:
+    return hour is not None and hour >= 0
+
+
+def get_window_end(moment: float):
+    """ Get the end of the maintenance window containing [moment]
+    :param moment: timestamp
+    :return: timestamp, None if [moment] is not in a window
+    """
+    moment = datetime.datetime.fromtimestamp(moment)
+    ends = [end for end in (window.get_end(moment) for window in get_maintenance_windows()) if end is not None]
+    return max(ends).timestamp() if ends else None
+
+
+def get_submission_pause_end(now: float = None):
+    """ Get the end of the current submission pause: creations stop [ExecutionContext.maintenance_drain_lead] seconds
+    before a window, so that no creation is in flight when it starts
+    :param now: timestamp, now by default
+    :return: timestamp, None if creations are allowed
+    """
+    now = now or time.time()
+    ends = [end for end in (get_window_end(now), get_window_end(now + ExecutionContext.maintenance_drain_lead))
+            if end is not None]
+    return max(ends) if ends else None
+
+
+def get_polling_pause_end(now: float = None):
+    """ Get the end of the current status polls pause
+    :param now: timestamp, now by default
+    :return: timestamp, None if polls are allowed
+    """
+    return get_window_end(now or time.time())
+
+
+def log_pause(activity: str, pause_end: float):
+    """ Log the pause of [activity] until [pause_end], once per pause
+    :param activity:
+    :param pause_end:
+    :return:
+    """
+    with pause_lock:
+        if logged_pauses.get(activity) == pause_end:
+            return
+        logged_pauses[activity] = pause_end
+    logger.info("%s paused for the Shanoir maintenance window, until %s" % (
+        activity, datetime.datetime.fromtimestamp(pause_end).strftime("%H:%M")))
+
+
+def wait_for_submissions():
+    """ Block until execution creations are allowed, reconnecting if a window was waited for
+    :return:
+    """
+    paused_until = None
+    pause_end = get_submission_pause_end()
+    while pause_end is not None:
+        log_pause("Execution creations", pause_end)
+        paused_until = pause_end
+        time.sleep(max(pause_end - time.time(), 0))
+        pause_end = get_submission_pause_end()
+    if paused_until is not None:
+        resume_after_maintenance(paused_until)
+
+
+async def wait_for_submissions_async():
+    """ Wait, without blocking the event loop, until execution creations are allowed
+    :return:
+    """
+    await wait_for_pause_end_async(get_submission_pause_end, "Execution creations")
+
+
+async def wait_for_polling_async():
+    """ Wait, without blocking the event loop, until status polls are allowed
+    :return:
+    """
+    await wait_for_pause_end_async(get_polling_pause_end, "Status polls")
+
+
+async def wait_for_pause_end_async(get_pause_end, activity: str):
+    paused_until = None
+    pause_end = get_pause_end()
+    while pause_end is not None:
+        log_pause(activity, pause_end)
+        paused_until = pause_end
+        await asyncio.sleep(max(pause_end - time.time(), 0))
+        pause_end = get_pause_end()
+    if paused_until is not None:
+        await resume_after_maintenance_async(paused_until)
+
+
+def reconnect():
+    """ Drop the connections opened before the window, get a fresh token, then open the new connections
+    :return:
+    """
+    logger.info("Shanoir maintenance window over, reconnecting...")
+    reset_session()
+    try:
+        refresh_access_token()
+    except Exception as e:
+        # the next unauthorized call will refresh it again
+        logger.warning("Token refresh after the maintenance window failed: %s" % e)
+        return
+    warm_up_session()
+
+
+def warm_up_session():
+    """ Fill the new session pool with concurrent cheap calls, so that the resumed creations and polls do not all pay
+    a connection and TLS handshake at once
+    :return:
+    """
+    nb_connections = get_pool_maxsize() - 1  # one is kept for the authentication calls
+    with ThreadPoolExecutor(max_workers=nb_connections, thread_name_prefix="warm-up") as executor:
+        results = list(executor.map(open_connection, range(nb_connections)))
+    logger.info("%s/%s connections opened after the maintenance window" % (sum(results), nb_connections))
+
+
+def open_connection(index: int) -> bool:
+    try:
+        authenticated_request('get', WARMUP_PATH).close()
+        return True
+    except Exception as e:
+        logger.debug("Connection %s not opened: %s" % (index, e))
+        return False
+
+
+def resume_after_maintenance(pause_end: float):
+    """ Reconnect once after the maintenance window ended at [pause_end], the other callers waiting for it
+    :param pause_end:
+    :return:
+    """
+    global last_resume
+    with resume_lock:
+        if last_resume >= pause_end:
+            return
+        reconnect()
+        last_resume = time.time()
+
+
+async def resume_after_maintenance_async(pause_end: float):
+    """ Reconnect once after the maintenance window ended at [pause_end], the asyncio session included.
+    The reconnection runs on the default executor, so that the other tasks are not blocked meanwhile.
+    :param pause_end:
+    :return:
+    """
+    former_session = await asyncio.get_running_loop().run_in_executor(None, reconnect_async_session, pause_end)
+    if former_session is not None and not former_session.closed:
+        await former_session.close()
+
+
+def reconnect_async_session(pause_end: float):
+    """ Reconnect once after the maintenance window ended at [pause_end], the next asyncio requests building a new
+    session
+    :param pause_end:
+    :return: the former asyncio session, to be closed on its event loop, None if already reconnected
+    """
+    global last_resume
+    with resume_lock:
+        if last_resume >= pause_end:
+            return None
+        former_session = detach_async_session()
+        reconnect()
+        last_resume = time.time()
+        return former_session
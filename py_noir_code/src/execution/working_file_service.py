@@ -0,0 +1,174 @@
+import gzip
+import json
+import os
+import tempfile
+
+from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.utils.log_utils import get_logger
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+"""
+Define the working and save files format: the batch header, the fields shared by all the items (template) and what
+differs per item (deltas), the refresh token being stored once. The former format, a JSON list of the header then
+the items, is still read.
+"""
+
+logger = get_logger()
+
+COMPACT_FORMAT = "compact"
+FORMAT_VERSION = 1
+
+COMPRESSIONS = ("none", "gzip", "zstd")
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Item field holding the Shanoir refresh token, stored in the document rather than in the template
+TOKEN_FIELD = "refreshToken"
+
+
+def get_template(items: list) -> dict:
+    """ Get the fields having the same value in all [items], their identifier excepted
+    :param items:
+    :return:
+    """
+    if not items:
+        return {}
+    template = {key: value for key, value in items[0].items() if key != "identifier"}
+    for item in items[1:]:
+        for key in [key for key in template if key not in item or item[key] != template[key]]:
+            del template[key]
+        if not template:
+            break
+    return template
+
+
+def pack_items(items: list) -> dict:
+    """ Build the compact document of [items]
+    :param items: header then items
+    :return:
+    """
+    template = get_template(items[1:])
+    shared_fields = set(template)
+    document = dict(format=COMPACT_FORMAT, version=FORMAT_VERSION, header=items[0])
+    if TOKEN_FIELD in template:
+        document[TOKEN_FIELD] = template.pop(TOKEN_FIELD)
+    document["template"] = template
+    document["items"] = [{key: value for key, value in item.items() if key not in shared_fields}
+                         for item in items[1:]]
+    return document
+
+
+def unpack_items(document) -> list:
+    """ Rebuild the header then items of a compact [document], or return a former format list as is
+    :param document:
+    :return:
+    """
+    if isinstance(document, list):
+        return document
+    if document.get("format") != COMPACT_FORMAT or document.get("version", 0) > FORMAT_VERSION:
+        raise ValueError("Unsupported working file format %s %s" % (document.get("format"), document.get("version")))
+    template = document["template"]
+    if TOKEN_FIELD in document:
+        template = dict(template, **{TOKEN_FIELD: document[TOKEN_FIELD]})
+    return [document["header"]] + [dict(template, **delta) for delta in document["items"]]
+
+
+def compress(content: bytes, compression: str) -> bytes:
+    if compression not in COMPRESSIONS:
+        raise ValueError("Unknown working file compression %s, expected one of %s" % (compression,
+                                                                                     ", ".join(COMPRESSIONS)))
+    if compression == "gzip":
+        return gzip.compress(content, compresslevel=6)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError("The zstd compression of the working files requires zstandard, please install it "
+                              "(pip install zstandard) or set working_file_compression = gzip.")
+        return zstandard.ZstdCompressor().compress(content)
+    return content
+
+
+def decompress(content: bytes) -> bytes:
+    """ Decompress [content] according to its magic number, uncompressed content being returned as is
+    :param content:
+    :return:
+    """
+    if content.startswith(GZIP_MAGIC):
+        return gzip.decompress(content)
+    if content.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise ImportError("This working file is compressed with zstd, please install zstandard "
+                              "(pip install zstandard).")
+        return zstandard.ZstdDecompressor().decompress(content)
+    return content
+
+
+def read_document(file_name: str):
+    with open(file_name, "rb") as working_file:
+        return json.loads(decompress(working_file.read()))
+
+
+def write_document(file_name: str, document):
+    """ Atomically replace [file_name] by [document], compressed according to
+    [ExecutionContext.working_file_compression]
+    :param file_name:
+    :param document:
+    :return:
+    """
+    content = compress(json.dumps(document, separators=(",", ":")).encode("utf-8"),
+                       ExecutionContext.working_file_compression)
+    # a temporary file of its own, several processes may save the same file at once
+    fd, tmp_file_name = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_name)),
+                                         prefix=os.path.basename(file_name) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as working_file:
+            working_file.write(content)
+            working_file.flush()
+            os.fsync(working_file.fileno())
+        os.replace(tmp_file_name, file_name)
+    except BaseException:
+        os.remove(tmp_file_name)
+        raise
+
+
+def read_working_file(file_name: str) -> list:
+    """ Read the working or save file [file_name], in any format
+    :param file_name:
+    :return: header then items
+    """
+    return unpack_items(read_document(file_name))
+
+
+def write_working_file(file_name: str, items: list):
+    """ Write [items] (header then items) in the compact format
+    :param file_name:
+    :param items:
+    :return:
+    """
+    write_document(file_name, pack_items(items))
+
+
+def update_working_file_token(file_name: str, refresh_token: str):
+    """ Replace the refresh token of the items of [file_name], a single field of the compact format (a file in the
+    former format is converted)
+    :param file_name:
+    :param refresh_token:
+    :return:
+    """
+    document = read_document(file_name)
+    if isinstance(document, list):
+        for item in document[1:]:
+            if TOKEN_FIELD in item:
+                item[TOKEN_FIELD] = refresh_token
+        document = pack_items(document)
+    elif TOKEN_FIELD in document:
+        document[TOKEN_FIELD] = refresh_token
+    else:
+        # the items had different tokens, each one is in its delta
+        for delta in document["items"]:
+            if TOKEN_FIELD in delta:
+                delta[TOKEN_FIELD] = refresh_token
+    write_document(file_name, document)
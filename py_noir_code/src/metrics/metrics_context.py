@@ -0,0 +1,18 @@
+from py_noir_code.src.utils.custom_config_parser import CustomConfigParser
+
+
+class MetricsContext(object):
+    """
+    Configuration class for API calls instrumentation
+    """
+    enabled: bool = False
+    prometheus_file: str = None
+
+    @classmethod
+    def init(cls, config: CustomConfigParser):
+        cls.enabled = ("True" == config.get('Metrics context', 'enabled', fallback="False"))
+        cls.prometheus_file = config.get('Metrics context', 'prometheus_file', fallback=None)
+
+    def __init__(self, config: CustomConfigParser):
+        self.enabled = ("True" == config.get('Metrics context', 'enabled', fallback="False"))
+        self.prometheus_file = config.get('Metrics context', 'prometheus_file', fallback=None)
@@ -0,0 +1,172 @@
+import atexit
+import json
+import os
+import random
+import re
+import threading
+from collections import Counter
+
+from py_noir_code.src.metrics.metrics_context import MetricsContext
+from py_noir_code.src.utils.file_utils import get_project_name, create_file_path
+from py_noir_code.src.utils.log_utils import get_logger
+from py_noir_code.src.utils.stats_utils import percentile
+
+"""
+Define methods recording per-endpoint call count, statuses, bytes and latency of Shanoir and Orthanc calls
+"""
+
+logger = get_logger()
+
+# Latency samples kept per endpoint (reservoir sampling above this size)
+MAX_LATENCY_SAMPLES = 10000
+ID_PATTERNS = [
+    re.compile(r'^[0-9a-fA-F]{8}(-[0-9a-fA-F]{4}){3}-[0-9a-fA-F]{12}$'),  # UUID
+    re.compile(r'^[0-9a-fA-F]{8}(-[0-9a-fA-F]{8}){4}$'),  # Orthanc identifier
+    re.compile(r'^[0-9]+(\.[0-9]+)*$'),  # numeric id or DICOM UID
+    re.compile(r'^[0-9,]+$'),  # id lists
+    re.compile(r'^workflow-\w+$'),  # VIP execution identifier
+]
+
+metrics = {}
+metrics_lock = threading.Lock()
+dump_registered = False
+
+
+class EndpointMetrics(object):
+    """
+    Counters of one (service, method, normalized endpoint)
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.statuses = Counter()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.latencies = []
+
+    def add(self, status_code, bytes_out: int, bytes_in: int, latency: float):
+        self.count += 1
+        self.statuses[str(status_code)] += 1
+        self.bytes_out += bytes_out
+        self.bytes_in += bytes_in
+        if len(self.latencies) < MAX_LATENCY_SAMPLES:
+            self.latencies.append(latency)
+        else:
+            index = random.randrange(self.count)
+            if index < MAX_LATENCY_SAMPLES:
+                self.latencies[index] = latency
+
+    def to_dict(self) -> dict:
+        return dict(count=self.count, statuses=dict(self.statuses), bytes_in=self.bytes_in, bytes_out=self.bytes_out,
+                    p50=percentile(self.latencies, 50), p95=percentile(self.latencies, 95),
+                    p99=percentile(self.latencies, 99))
+
+
+def normalize_endpoint(path: str) -> str:
+    """ Strip the query string and replace identifiers of [path] by {id}
+    :param path:
+    :return:
+    """
+    segments = path.split('?')[0].split('/')
+    return '/'.join('{id}' if any(pattern.match(segment) for pattern in ID_PATTERNS) else segment
+                    for segment in segments)
+
+
+def get_body_size(body) -> int:
+    """ Size of a prepared request body, 0 if unknown (streamed body)
+    :param body:
+    :return:
+    """
+    try:
+        return len(body) if body is not None else 0
+    except TypeError:
+        return 0
+
+
+def record_call(service: str, method: str, path: str, response, latency: float, stream: bool = False):
+    """ Record a call of [service] to [path] answered by [response] (None if the call failed) in [latency] seconds.
+    Callers should only call it when [MetricsContext.enabled] is set.
+    :param service: "shanoir" or "orthanc"
+    :param method:
+    :param path:
+    :param response:
+    :param latency:
+    :param stream: True if the response body must not be read to measure it
+    :return:
+    """
+    global dump_registered
+    status_code, bytes_out, bytes_in = 'error', 0, 0
+    if response is not None:
+        status_code = response.status_code
+        bytes_out = get_body_size(response.request.body) if response.request is not None else 0
+        content_length = response.headers.get('Content-Length')
+        if content_length is not None and content_length.isdigit():
+            bytes_in = int(content_length)
+        elif not stream:
+            bytes_in = len(response.content or b'')
+
+    key = (service, method.upper(), normalize_endpoint(path))
+    with metrics_lock:
+        if not dump_registered:
+            atexit.register(dump_metrics)
+            dump_registered = True
+        endpoint_metrics = metrics.get(key)
+        if endpoint_metrics is None:
+            endpoint_metrics = metrics[key] = EndpointMetrics()
+        endpoint_metrics.add(status_code, bytes_out, bytes_in, latency)
+
+
+def get_metrics() -> list:
+    """ Get the recorded metrics, one dict per (service, method, endpoint)
+    :return: list
+    """
+    with metrics_lock:
+        return [dict(service=service, method=method, endpoint=endpoint, **endpoint_metrics.to_dict())
+                for (service, method, endpoint), endpoint_metrics in sorted(metrics.items())]
+
+
+def dump_metrics():
+    """ Write the metrics to resources/logs/<project>_metrics.json, and in Prometheus text format to
+    [MetricsContext.prometheus_file] if set
+    :return:
+    """
+    endpoints = get_metrics()
+    if not endpoints:
+        return
+    log_path = os.path.dirname(os.path.abspath(__file__)) + "/../../resources/logs/"
+    create_file_path(log_path)
+    with open(log_path + get_project_name() + "_metrics.json", "w") as metrics_file:
+        json.dump(endpoints, metrics_file, indent=4)
+    if MetricsContext.prometheus_file:
+        with open(MetricsContext.prometheus_file, "w") as prometheus_file:
+            prometheus_file.write(to_prometheus(endpoints))
+    logger.info("API metrics of %s endpoints written in %s" % (len(endpoints), os.path.normpath(log_path)))
+
+
+def to_prometheus(endpoints: list) -> str:
+    """ Format [endpoints] metrics in Prometheus text exposition format
+    :param endpoints:
+    :return:
+    """
+    families = {"py_noir_requests_total": ("counter", []),
+                "py_noir_request_bytes_in_total": ("counter", []),
+                "py_noir_request_bytes_out_total": ("counter", []),
+                "py_noir_request_latency_seconds": ("summary", [])}
+    for endpoint in endpoints:
+        labels = 'service="%s",method="%s",endpoint="%s"' % (endpoint['service'], endpoint['method'],
+                                                             endpoint['endpoint'])
+        for status, count in sorted(endpoint['statuses'].items()):
+            families["py_noir_requests_total"][1].append('{%s,status="%s"} %s' % (labels, status, count))
+        families["py_noir_request_bytes_in_total"][1].append('{%s} %s' % (labels, endpoint['bytes_in']))
+        families["py_noir_request_bytes_out_total"][1].append('{%s} %s' % (labels, endpoint['bytes_out']))
+        latency_samples = families["py_noir_request_latency_seconds"][1]
+        for quantile, key in (("0.5", 'p50'), ("0.95", 'p95'), ("0.99", 'p99')):
+            if endpoint[key] is not None:
+                latency_samples.append('{%s,quantile="%s"} %f' % (labels, quantile, endpoint[key]))
+        latency_samples.append('_count{%s} %s' % (labels, endpoint['count']))
+
+    lines = []
+    for name, (metric_type, samples) in families.items():
+        lines.append("# TYPE %s %s" % (name, metric_type))
+        lines.extend(name + sample for sample in samples)
+    return "\n".join(lines) + "\n"
@@ -1,10 +1,13 @@
 import base64
 import os.path
+import time
 import zipfile
 from typing import Dict, List, Tuple, Optional
 
 import requests
 
+from py_noir_code.src.metrics.metrics_context import MetricsContext
+from py_noir_code.src.metrics.metrics_service import record_call
 from py_noir_code.src.orthanc.orthanc_context import OrthancContext
 from py_noir_code.src.security.authentication_service import load_orthanc_password
 from py_noir_code.src.utils.log_utils import get_logger
@@ -44,16 +47,21 @@ def orthanc_request(method: str, path: str, raise_for_status: bool = True, **kwa
     url = OrthancContext.scheme + "://" + OrthancContext.domain + ":" + OrthancContext.rest_api_port + "/" + path
 
     response = None
-    if method == 'get':
-        response = requests.get(url, headers=headers, **kwargs)
-    elif method == 'post':
-        response = requests.post(url, headers=headers, **kwargs)
-    elif method == 'put':
-        response = requests.put(url, headers=headers, **kwargs)
-    elif method == 'delete':
-        response = requests.delete(url, headers=headers, **kwargs)
-    else:
-        logger.error('Error: unimplemented request type')
+    start = time.perf_counter()
+    try:
+        if method == 'get':
+            response = requests.get(url, headers=headers, **kwargs)
+        elif method == 'post':
+            response = requests.post(url, headers=headers, **kwargs)
+        elif method == 'put':
+            response = requests.put(url, headers=headers, **kwargs)
+        elif method == 'delete':
+            response = requests.delete(url, headers=headers, **kwargs)
+        else:
+            logger.error('Error: unimplemented request type')
+    finally:
+        if MetricsContext.enabled:
+            record_call('orthanc', method, path, response, time.perf_counter() - start, kwargs.get('stream'))
 
     if raise_for_status:
         response.raise_for_status()
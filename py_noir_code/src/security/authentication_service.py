@@ -1,12 +1,16 @@
+import base64
 import os
+import time
 
-import requests
 import json
 import getpass
 import sys
+import threading
 
 from py_noir_code.src.API.api_context import APIContext
+from py_noir_code.src.API.api_session import get_session
 from py_noir_code.src.orthanc.orthanc_context import OrthancContext
+from py_noir_code.src.security.token_cache_service import save_cached_tokens, clear_cached_tokens
 from py_noir_code.src.utils.log_utils import get_logger
 
 """
@@ -16,6 +20,155 @@ Define methods for Shanoir authentication and Orthanc password
 logger = get_logger()
 ENDPOINT = '/auth/realms/shanoir-ng/protocol/openid-connect/token'
 
+# Serializes every token acquisition so that only one Keycloak round trip is in flight at a time
+token_lock = threading.RLock()
+token_stats = dict(unauthorized=0, refreshes=0, renewals=0)
+# Renew the access token this many seconds before its expiry (at most a fifth of its lifetime)
+TOKEN_RENEWAL_MARGIN = 60
+token_renewal_thread: threading.Thread = None
+token_renewal_stop_event = threading.Event()
+
+
+class TokenRefreshError(Exception):
+    """
+    Raised by a non-interactive refresh when Keycloak rejects the refresh token, a new authentication being required
+    """
+
+
+def ensure_access_token():
+    """ Ask for an access token if none is set yet, only once whatever the number of calling threads,
+    and make sure it is renewed in background before its expiry
+    :return:
+    """
+    if APIContext.access_token is None:
+        with token_lock:
+            if APIContext.access_token is None:
+                ask_access_token()
+    start_token_renewal()
+
+
+def refresh_expired_access_token(expired_access_token: str):
+    """ Single-flight refresh after a 401 obtained with [expired_access_token].
+    Callers arriving while a refresh is in flight wait for it, then reuse its result instead of refreshing again.
+    :param expired_access_token: the token that was rejected
+    :return:
+    """
+    with token_lock:
+        token_stats['unauthorized'] += 1
+        if APIContext.access_token != expired_access_token:
+            return
+        refresh_access_token()
+
+
+def get_token_expiry(token: str):
+    """ Decode (without verifying it) the JWT [token] and return its expiry and issue timestamps
+    :param token:
+    :return: (exp, iat) tuple, (None, None) if the token cannot be decoded
+    """
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return float(claims['exp']), float(claims.get('iat', 0)) or None
+    except Exception:
+        return None, None
+
+
+def get_renewal_delay(token: str):
+    """ Get the number of seconds to wait before renewing [token], None if its expiry is unknown
+    :param token:
+    :return:
+    """
+    expiry, issued_at = get_token_expiry(token)
+    if expiry is None:
+        return None
+    margin = TOKEN_RENEWAL_MARGIN
+    if issued_at is not None and expiry > issued_at:
+        margin = min(margin, (expiry - issued_at) / 5)
+    return expiry - margin - time.time()
+
+
+def start_token_renewal():
+    """ Start (once) the background thread renewing [APIContext.access_token] shortly before it expires
+    :return:
+    """
+    global token_renewal_thread
+    if token_renewal_thread is not None and token_renewal_thread.is_alive():
+        return
+    with token_lock:
+        if token_renewal_thread is not None and token_renewal_thread.is_alive():
+            return
+        token_renewal_stop_event.clear()
+        token_renewal_thread = threading.Thread(target=renew_token_before_expiry, name="token-renewal", daemon=True)
+        token_renewal_thread.start()
+
+
+def stop_token_renewal():
+    """ Stop the background token renewal thread
+    :return:
+    """
+    token_renewal_stop_event.set()
+
+
+def renew_token_before_expiry():
+    """ Background loop refreshing the access token before its "exp" claim, so that requests never get a 401
+    :return:
+    """
+    while not token_renewal_stop_event.is_set():
+        access_token = APIContext.access_token
+        delay = get_renewal_delay(access_token) if access_token else None
+        if delay is None:
+            # Unknown expiry (no token yet or opaque token), the 401 fallback of api_service.request applies
+            token_renewal_stop_event.wait(TOKEN_RENEWAL_MARGIN)
+            continue
+        if delay > 0:
+            # Wake up regularly in case the token has been replaced in the meantime
+            token_renewal_stop_event.wait(min(delay, TOKEN_RENEWAL_MARGIN))
+            continue
+
+        renewal_failed = False
+        with token_lock:
+            if APIContext.access_token != access_token:
+                continue
+            try:
+                token_stats['renewals'] += 1
+                # never prompt from this thread, the password is asked by the requests getting a 401
+                refresh_access_token(interactive=False)
+            except Exception as e:
+                logger.warning("Proactive token renewal failed, renewal stopped until the token is replaced: %s" % e)
+                renewal_failed = True
+        if renewal_failed:
+            # outside of token_lock, which the foreground refresh needs to replace the token
+            wait_for_token_change(access_token)
+        elif APIContext.access_token == access_token:
+            token_renewal_stop_event.wait(TOKEN_RENEWAL_MARGIN / 6)
+
+
+def wait_for_token_change(access_token: str):
+    """ Wait until [APIContext.access_token] is not [access_token] anymore (e.g. refreshed after a 401), or the
+    renewal is stopped
+    :param access_token:
+    :return:
+    """
+    while APIContext.access_token == access_token and not token_renewal_stop_event.is_set():
+        token_renewal_stop_event.wait(TOKEN_RENEWAL_MARGIN)
+
+
+def get_token_stats() -> dict:
+    """ Get the number of 401 responses seen and of token refreshes actually performed
+    :return: dict
+    """
+    with token_lock:
+        return dict(token_stats)
+
+
+def log_token_stats():
+    """ Log the token refresh counters
+    """
+    stats = get_token_stats()
+    logger.info("Keycloak token: %s refreshes (%s proactive) for %s unauthorized responses" % (
+        stats['refreshes'], stats['renewals'], stats['unauthorized']))
+
 
 def ask_access_token():
     """ Prompt user [APIContext.username] for password
@@ -41,8 +194,8 @@ def ask_access_token():
 
     headers = {'content-type': 'application/x-www-form-urlencoded'}
     logger.info('get keycloak token...')
-    response = requests.post(url, data=payload, headers=headers, proxies=APIContext.proxies, verify=APIContext.verify,
-                             timeout=APIContext.timeout)
+    response = get_session().post(url, data=payload, headers=headers, proxies=APIContext.proxies,
+                                  verify=APIContext.verify, timeout=APIContext.timeout)
 
     response_json = json.loads(response.text)
     if not hasattr(response, 'status_code') or response.status_code != 200:
@@ -52,32 +205,54 @@ def ask_access_token():
             logger.error('Failed to connect, make sure you have a certified IP or are connected on a valid VPN.')
         sys.exit(1)
 
-    APIContext.refresh_token = response_json['refresh_token']
-    APIContext.access_token = response_json['access_token']
+    store_tokens(response_json['access_token'], response_json['refresh_token'])
 
 
 # get a new access token using the refresh token
-def refresh_access_token():
+def refresh_access_token(interactive: bool = True):
     """ Set [APIContext.access_token] from Shanoir auth API using [APIContext.refresh_token]
+    :param interactive: False to raise TokenRefreshError instead of asking for the password (or exiting) when the
+    refresh token is rejected
+    :return:
     """
-    url = APIContext.scheme + '://' + APIContext.domain + ENDPOINT
-    payload = {
-        'grant_type': 'refresh_token',
-        'refresh_token': APIContext.refresh_token,
-        'client_id': APIContext.clientId
-    }
-    headers = {'content-type': 'application/x-www-form-urlencoded'}
-    logger.info('Refreshing keycloak token...')
-    response = requests.post(url, data=payload, headers=headers, proxies=APIContext.proxies, verify=APIContext.verify,
-                             timeout=APIContext.timeout)
-    if response.text.find("No refresh token") != -1 :
-        ask_access_token()
-    else :
-        APIContext.access_token = response.json()['access_token']
-        APIContext.refresh_token = response.json()['refresh_token']
-    if response.status_code != 200 and APIContext.access_token == "":
-        logger.error('Response status :' + str(response.status_code) + "," + response.text)
-        exit(1)
+    with token_lock:
+        token_stats['refreshes'] += 1
+        url = APIContext.scheme + '://' + APIContext.domain + ENDPOINT
+        payload = {
+            'grant_type': 'refresh_token',
+            'refresh_token': APIContext.refresh_token,
+            'client_id': APIContext.clientId
+        }
+        headers = {'content-type': 'application/x-www-form-urlencoded'}
+        logger.info('Refreshing keycloak token...')
+        response = get_session().post(url, data=payload, headers=headers, proxies=APIContext.proxies,
+                                      verify=APIContext.verify, timeout=APIContext.timeout)
+        if not interactive and (response.status_code != 200 or response.text.find("No refresh token") != -1):
+            raise TokenRefreshError('Token refresh failed with status %s: %s' % (response.status_code, response.text))
+        if response.text.find("No refresh token") != -1 :
+            ask_access_token()
+        elif response.status_code in (400, 401) and APIContext.token_cache:
+            # The refresh token may come from the token cache and have been revoked or expired since
+            logger.warning('Refresh token rejected, a new authentication is required.')
+            clear_cached_tokens(APIContext.domain, APIContext.username)
+            ask_access_token()
+        else :
+            store_tokens(response.json()['access_token'], response.json()['refresh_token'])
+        if response.status_code != 200 and APIContext.access_token == "":
+            logger.error('Response status :' + str(response.status_code) + "," + response.text)
+            exit(1)
+
+
+def store_tokens(access_token: str, refresh_token: str):
+    """ Set [APIContext.access_token] & [APIContext.refresh_token] and persist them in the token cache if enabled
+    :param access_token:
+    :param refresh_token:
+    :return:
+    """
+    APIContext.access_token = access_token
+    APIContext.refresh_token = refresh_token
+    if APIContext.token_cache:
+        save_cached_tokens(APIContext.domain, APIContext.username, access_token, refresh_token)
 
 
 def load_orthanc_password():
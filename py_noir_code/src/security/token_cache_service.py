@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from py_noir_code.src.utils.log_utils import get_logger
+
+"""
+Define methods for the on-disk Keycloak token cache, allowing resumed executions to skip the password prompt
+"""
+
+logger = get_logger()
+
+TOKEN_CACHE_PATH = os.path.join(str(Path.home()), '.py_noir', 'token_cache.json')
+
+cache_lock = threading.Lock()
+
+
+def get_cache_key(domain: str, username: str) -> str:
+    """ Build the cache entry key for user [username] on Shanoir instance [domain]
+    :param domain:
+    :param username:
+    :return:
+    """
+    return str(username) + '@' + str(domain)
+
+
+def read_token_cache() -> dict:
+    """ Read the whole token cache, an empty dict if it does not exist or is unreadable
+    :return: dict
+    """
+    if not os.path.exists(TOKEN_CACHE_PATH):
+        return {}
+    try:
+        with open(TOKEN_CACHE_PATH, 'r') as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError) as e:
+        logger.warning("Token cache %s is unreadable and will be ignored: %s" % (TOKEN_CACHE_PATH, e))
+        return {}
+
+
+def write_token_cache(cache: dict):
+    """ Atomically write [cache], readable by the current user only
+    :param cache:
+    :return:
+    """
+    cache_dir = os.path.dirname(TOKEN_CACHE_PATH)
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    # a temporary file of its own (created 0600), several processes may refresh their tokens at once
+    file_descriptor, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix='token_cache.', suffix='.tmp')
+    try:
+        with os.fdopen(file_descriptor, 'w') as cache_file:
+            json.dump(cache, cache_file)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, TOKEN_CACHE_PATH)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def load_cached_tokens(domain: str, username: str):
+    """ Get the cached (access_token, refresh_token) of user [username] on [domain]
+    :param domain:
+    :param username:
+    :return: tuple, (None, None) if nothing is cached
+    """
+    with cache_lock:
+        entry = read_token_cache().get(get_cache_key(domain, username))
+    if not entry or not entry.get('refresh_token'):
+        return None, None
+    logger.info("Keycloak tokens loaded from cache for user %s" % username)
+    return entry.get('access_token'), entry.get('refresh_token')
+
+
+def save_cached_tokens(domain: str, username: str, access_token: str, refresh_token: str):
+    """ Store the tokens of user [username] on [domain]
+    :param domain:
+    :param username:
+    :param access_token:
+    :param refresh_token:
+    :return:
+    """
+    try:
+        with cache_lock:
+            cache = read_token_cache()
+            cache[get_cache_key(domain, username)] = dict(access_token=access_token, refresh_token=refresh_token,
+                                                          saved_at=time.time())
+            write_token_cache(cache)
+    except OSError as e:
+        logger.warning("Could not write token cache %s: %s" % (TOKEN_CACHE_PATH, e))
+
+
+def clear_cached_tokens(domain: str, username: str):
+    """ Remove the cached tokens of user [username] on [domain] (e.g. when they have been revoked)
+    :param domain:
+    :param username:
+    :return:
+    """
+    try:
+        with cache_lock:
+            cache = read_token_cache()
+            if cache.pop(get_cache_key(domain, username), None) is not None:
+                write_token_cache(cache)
+    except OSError as e:
+        logger.warning("Could not write token cache %s: %s" % (TOKEN_CACHE_PATH, e))
@@ -3,7 +3,9 @@ import uuid
 import requests
 
 from py_noir_code.src.API.api_service import get, download_file, post
+from py_noir_code.src.cache.response_cache_service import cached_response
 from py_noir_code.src.utils.log_utils import get_logger
+from py_noir_code.src.utils.polling_utils import wait_until, ReadinessTimeoutError
 
 """
 Define methods for Shanoir datasets MS datasets API call
@@ -17,6 +19,7 @@ ENDPOINT_DICOM_STORE = '/datasets/dicomweb'
 logger = get_logger()
 
 
+@cached_response("dataset")
 def get_dataset(dataset_id: str):
     """ Get dataset [dataset_id]
     :param dataset_id:
@@ -63,7 +66,7 @@ def download_datasets(dataset_ids, file_format, output_folder, unzip=False):
     dataset_ids = ','.join([str(dataset_id) for dataset_id in dataset_ids])
     path = ENDPOINT_DATASET + '/massiveDownload'
     params = dict(datasetIds=dataset_ids, format=file_format)
-    response = post(path, params=params, files=params, stream=True)
+    response = post(path, params=params, files=params, stream=True, idempotent=True)
     download_file(output_folder, response, unzip=unzip)
     return
 
@@ -122,6 +125,7 @@ def find_dataset_ids_by_subject_id_study_id(subject_id, study_id):
     return response.json()
 
 
+@cached_response("dicom_metadata")
 def get_dataset_dicom_metadata(dataset_id):
     """ Get all dicom metadata from specific dataset [dataset_id]
     :param dataset_id:
@@ -132,6 +136,7 @@ def get_dataset_dicom_metadata(dataset_id):
     return response.json()
 
 
+@cached_response("dicom_metadata")
 def get_dicom_metadata_by_dataset_id(dataset_id):
     """ Get all dicom metadata from dataset [dataset_id]
     :param dataset_id:
@@ -168,6 +173,7 @@ def download_dataset_by_subject_id_study_id(subject_id, study_id, file_format, o
     return
 
 
+@cached_response("examination")
 def get_examination(examination_id: str):
     """ Get examination [examination_id]
     :param examination_id:
@@ -178,6 +184,7 @@ def get_examination(examination_id: str):
     return response.json()
 
 
+@cached_response("dataset_processing")
 def get_dataset_processing(dataset_processing_id: str):
     """ Get dataset processing [dataset_processing_id]
     :param dataset_processing_id:
@@ -204,7 +211,7 @@ def download_dataset_processing(dataset_processing_ids, output_folder, result_on
     logger.info(f'Downloading dataset {len(dataset_processing_ids)} processing: {dataset_processing_ids}')
     path = ENDPOINT_DATASET_PROCESSING + '/massiveDownloadByProcessingIds'
     params = dict(resultOnly=str(result_only).lower())
-    response = post(path, params=params, json=dataset_processing_ids, stream=True)
+    response = post(path, params=params, json=dataset_processing_ids, stream=True, idempotent=True)
     download_file(output_folder, response, unzip=unzip)
     return
 
@@ -236,3 +243,31 @@ def find_processed_dataset_ids_by_input_dataset_id(dataset_id):
     path = ENDPOINT_DATASET_PROCESSING + '/inputDataset/' + dataset_id
     response = get(path)
     return response.json()
+
+
+def wait_for_processed_datasets(dataset_ids: list, execution_ids: list, timeout: float = 600):
+    """ Wait until the processed datasets of every execution [execution_ids] of the input datasets [dataset_ids] are
+    imported in Shanoir, polling with a backoff
+    :param dataset_ids: input datasets
+    :param execution_ids:
+    :param timeout: seconds
+    :return: the dataset processings of [execution_ids]
+    :raise ReadinessTimeoutError: listing the executions without processed datasets, its last_value holding the dataset
+    processings found
+    """
+    execution_ids = set(str(execution_id) for execution_id in execution_ids)
+
+    def find_processings():
+        return [processing for dataset_id in dataset_ids
+                for processing in find_processed_dataset_ids_by_input_dataset_id(str(dataset_id))
+                if str(processing["parentId"]) in execution_ids]
+
+    def get_missing_execution_ids(processings):
+        return execution_ids - set(str(processing["parentId"]) for processing in processings)
+
+    try:
+        return wait_until(find_processings, timeout, "Processed datasets of %s executions" % len(execution_ids),
+                          is_ready=lambda processings: not get_missing_execution_ids(processings))
+    except ReadinessTimeoutError as e:
+        raise ReadinessTimeoutError("%s, missing for executions %s" % (
+            e, ", ".join(sorted(get_missing_execution_ids(e.last_value)))), e.last_value) from None
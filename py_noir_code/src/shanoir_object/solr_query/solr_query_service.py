@@ -56,6 +56,6 @@ def solr_search(query: SolrQuery):
     }
 
     params = dict(page=query.page, size=query.size, sort=query.sort)
-    response = post(path, params=params, data=json.dumps(data))
+    response = post(path, params=params, data=json.dumps(data), idempotent=True)
 
     return response
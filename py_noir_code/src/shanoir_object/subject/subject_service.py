@@ -1,4 +1,5 @@
 from py_noir_code.src.API.api_service import get
+from py_noir_code.src.cache.response_cache_service import cached_response
 
 """
 Define methods for Shanoir studies MS subject API call
@@ -7,6 +8,7 @@ Define methods for Shanoir studies MS subject API call
 ENDPOINT = '/studies/subjects'
 
 
+@cached_response("subject")
 def get_subject_by_id(subject_id):
     """ Get a subject from its id [subject_id]
     :param subject_id:
@@ -0,0 +1,281 @@
+import argparse
+import base64
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+
+"""
+Define a local stand-in of the Shanoir / VIP endpoints used by py_noir, for offline load testing
+"""
+
+TOKEN_PATH = '/auth/realms/shanoir-ng/protocol/openid-connect/token'
+
+
+class StubConfig(object):
+    """
+    Behaviour of the stub server
+    """
+
+    def __init__(self, latency: float = 0.0, latency_jitter: float = 0.0, failure_rate: float = 0.0,
+                 execution_duration: tuple = (5.0, 5.0), execution_failure_rate: float = 0.0,
+                 token_lifetime: float = 300.0):
+        """
+        :param latency: mean delay (seconds) before answering any request
+        :param latency_jitter: uniform +/- variation of the delay (seconds)
+        :param failure_rate: probability of answering any API request with a 503
+        :param execution_duration: (min, max) duration (seconds) of a VIP execution
+        :param execution_failure_rate: probability of a VIP execution ending with the "ExecutionFailed" status
+        :param token_lifetime: lifetime (seconds) of the delivered access tokens
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.failure_rate = failure_rate
+        self.execution_duration = execution_duration
+        self.execution_failure_rate = execution_failure_rate
+        self.token_lifetime = token_lifetime
+
+
+class StubState(object):
+    """
+    Executions created on the stub and request counters
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.executions = {}
+        self.requests = {}
+
+    def count(self, endpoint: str):
+        with self.lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+
+def make_token(lifetime: float) -> str:
+    """ Build an unsigned JWT-like token carrying exp / iat claims
+    :param lifetime:
+    :return:
+    """
+    now = time.time()
+    claims = json.dumps({"exp": int(now + lifetime), "iat": int(now), "jti": str(random.random())}).encode('utf-8')
+    return 'stub.' + base64.urlsafe_b64encode(claims).decode('utf-8').rstrip('=') + '.stub'
+
+
+def is_token_valid(authorization: str) -> bool:
+    if not authorization or not authorization.startswith('Bearer stub.'):
+        return False
+    try:
+        payload = authorization[len('Bearer '):].split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        return claims['exp'] > time.time()
+    except (ValueError, KeyError, IndexError):
+        return False
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Answers the Shanoir endpoints used by py_noir from the server [StubConfig] and [StubState]
+    """
+    protocol_version = 'HTTP/1.1'
+
+    routes = [
+        ('POST', re.compile(r'^/shanoir-ng/datasets/vip/execution/?$'), 'create_execution'),
+        ('GET', re.compile(r'^/shanoir-ng/datasets/vip/execution/(?P<id>[^/]+)/status$'), 'execution_status'),
+        ('GET', re.compile(r'^/shanoir-ng/datasets/execution-monitoring/(?P<id>[^/]+)$'), 'execution_monitoring'),
+        ('GET', re.compile(r'^/shanoir-ng/datasets/datasets/examination/(?P<id>[^/]+)$'), 'examination_datasets'),
+        ('GET', re.compile(r'^/shanoir-ng/datasets/datasets/dicom-metadata/(?P<id>[^/]+)$'), 'dicom_metadata'),
+        ('GET', re.compile(r'^/shanoir-ng/datasets/datasets/(?P<id>[0-9]+)$'), 'dataset'),
+        ('GET', re.compile(r'^/shanoir-ng/datasets/examinations/(?P<id>[^/]+)$'), 'examination'),
+        ('GET', re.compile(r'^/shanoir-ng/datasets/datasetProcessing/inputDataset/(?P<id>[^/]+)$'), 'processings'),
+        ('GET', re.compile(r'^/shanoir-ng/datasets/datasetProcessing/(?P<id>[0-9]+)$'), 'processing'),
+        ('POST', re.compile(r'^/shanoir-ng/datasets/solr$'), 'solr'),
+        ('POST', re.compile(r'^/shanoir-ng/datasets/dicomweb/studies$'), 'dicomweb'),
+        ('GET', re.compile(r'^/shanoir-ng/studies/subjects/(?P<id>[^/]+)$'), 'subject'),
+    ]
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_PUT(self):
+        self.handle_request('PUT')
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle_request(self, method: str):
+        config: StubConfig = self.server.config
+        state: StubState = self.server.state
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0) or 0))
+        url = urlparse(self.path)
+
+        delay = config.latency + random.uniform(-config.latency_jitter, config.latency_jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if url.path == TOKEN_PATH:
+            state.count('token')
+            return self.send_json(200, {"access_token": make_token(config.token_lifetime),
+                                        "refresh_token": make_token(30 * 86400),
+                                        "expires_in": int(config.token_lifetime)})
+
+        for route_method, pattern, name in self.routes:
+            match = pattern.match(url.path)
+            if route_method == method and match:
+                state.count(name)
+                if not is_token_valid(self.headers.get('Authorization')):
+                    return self.send_json(401, {"error": "invalid_token"})
+                if random.random() < config.failure_rate:
+                    return self.send_json(503, {"message": "Service Unavailable"})
+                return getattr(self, name)(match.group('id') if 'id' in pattern.groupindex else None,
+                                           body, parse_qs(url.query))
+
+        state.count('unknown')
+        self.send_json(404, {"message": "No stub for %s %s" % (method, url.path)})
+
+    def send_json(self, status: int, content, raw: bool = False):
+        payload = (content if raw else json.dumps(content)).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def create_execution(self, _, body: bytes, query: dict):
+        config: StubConfig = self.server.config
+        state: StubState = self.server.state
+        try:
+            execution = json.loads(body or b'{}')
+        except ValueError:
+            return self.send_json(400, {"message": "Bad request", "details": "Execution is not valid JSON"})
+        execution_id = next(state.ids)
+        with state.lock:
+            state.executions[str(execution_id)] = dict(
+                name=execution.get('name'), pipeline=execution.get('pipelineIdentifier'), created_at=time.time(),
+                duration=random.uniform(*config.execution_duration),
+                failed=random.random() < config.execution_failure_rate)
+        self.send_json(200, {"id": execution_id, "name": execution.get('name'), "status": "Running"})
+
+    def execution_monitoring(self, execution_id: str, body: bytes, query: dict):
+        if str(execution_id) not in self.server.state.executions:
+            return self.send_json(404, {"message": "Unknown execution %s" % execution_id})
+        self.send_json(200, {"id": int(execution_id), "identifier": "workflow-%s" % execution_id,
+                             "name": self.server.state.executions[str(execution_id)]['name']})
+
+    def execution_status(self, monitoring_id: str, body: bytes, query: dict):
+        execution = self.server.state.executions.get(monitoring_id.replace('workflow-', ''))
+        if execution is None:
+            return self.send_json(404, {"message": "Unknown execution %s" % monitoring_id})
+        if time.time() - execution['created_at'] < execution['duration']:
+            status = "Running"
+        else:
+            status = "ExecutionFailed" if execution['failed'] else "Finished"
+        self.send_json(200, '"%s"' % status, raw=True)
+
+    def dataset(self, dataset_id: str, body: bytes, query: dict):
+        self.send_json(200, {"id": int(dataset_id), "studyId": 1, "updatedMetadata": {"name": "T3DFLAIR"},
+                             "datasetAcquisition": {"examination": {"id": 1, "subject": {"name": "stub"}}}})
+
+    def examination_datasets(self, examination_id: str, body: bytes, query: dict):
+        base = int(examination_id) * 10 if examination_id.isdigit() else 0
+        self.send_json(200, [{"id": base + index, "studyId": 1, "updatedMetadata": {"name": "T3DFLAIR"}}
+                             for index in range(3)])
+
+    def examination(self, examination_id: str, body: bytes, query: dict):
+        self.send_json(200, {"id": examination_id, "examinationDate": "2020-01-01T00:00:00Z"})
+
+    def dicom_metadata(self, dataset_id: str, body: bytes, query: dict):
+        self.send_json(200, [{"00080060": {"vr": "CS", "Value": ["MR"]}}])
+
+    def processing(self, processing_id: str, body: bytes, query: dict):
+        self.send_json(200, {"id": int(processing_id), "inputDatasets": [1], "parentId": 1})
+
+    def processings(self, dataset_id: str, body: bytes, query: dict):
+        self.send_json(200, [{"id": 1, "parentId": 1}])
+
+    def solr(self, _, body: bytes, query: dict):
+        self.send_json(200, {"content": [], "totalElements": 0})
+
+    def dicomweb(self, _, body: bytes, query: dict):
+        self.send_json(200, {})
+
+    def subject(self, subject_id: str, body: bytes, query: dict):
+        self.send_json(200, {"id": subject_id, "name": "stub"})
+
+
+def start_stub_server(config: StubConfig = None, port: int = 0) -> ThreadingHTTPServer:
+    """ Start the stub server in a daemon thread, on [port] (0 for any free port)
+    :param config:
+    :param port:
+    :return: the server, its port being server.server_port
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    server.config = config or StubConfig()
+    server.state = StubState()
+    threading.Thread(target=server.serve_forever, name="shanoir-stub", daemon=True).start()
+    return server
+
+
+def use_stub_server(server: ThreadingHTTPServer):
+    """ Point [APIContext] to the stub [server]
+    :param server:
+    :return:
+    """
+    use_stub_port(server.server_port, server.config.token_lifetime)
+
+
+def use_stub_port(port: int, token_lifetime: float = 300.0):
+    """ Point [APIContext] to the stub server listening on [port], e.g. started by another process
+    :param port:
+    :param token_lifetime: lifetime (seconds) of the initial access token
+    :return:
+    """
+    from py_noir_code.src.API.api_context import APIContext
+    from py_noir_code.src.API.api_session import reset_session
+
+    APIContext.scheme = 'http'
+    APIContext.domain = '127.0.0.1:' + str(port)
+    APIContext.verify = False
+    APIContext.proxies = {}
+    APIContext.username = 'stub'
+    APIContext.clientId = 'stub'
+    APIContext.token_cache = False
+    APIContext.access_token = make_token(token_lifetime)
+    APIContext.refresh_token = make_token(30 * 86400)
+    reset_session()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local Shanoir / VIP stand-in server")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--latency-jitter', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--execution-duration', type=float, nargs=2, default=[5.0, 5.0], metavar=('MIN', 'MAX'))
+    parser.add_argument('--execution-failure-rate', type=float, default=0.0)
+    parser.add_argument('--token-lifetime', type=float, default=300.0)
+    args = parser.parse_args()
+
+    stub = start_stub_server(StubConfig(args.latency, args.latency_jitter, args.failure_rate,
+                                        tuple(args.execution_duration), args.execution_failure_rate,
+                                        args.token_lifetime), args.port)
+    print("Shanoir stub listening on http://127.0.0.1:%s (use scheme = http, domain = 127.0.0.1:%s)" % (
+        stub.server_port, stub.server_port))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.shutdown()
@@ -1,5 +1,7 @@
 from py_noir_code.src.API.api_context import APIContext
+from py_noir_code.src.cache.cache_context import CacheContext
 from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.metrics.metrics_context import MetricsContext
 from py_noir_code.src.orthanc.orthanc_context import OrthancContext
 from py_noir_code.src.utils.custom_config_parser import CustomConfigParser
 from py_noir_code.src.utils.file_utils import get_project_path
@@ -9,6 +11,8 @@ def load_context(config_file_name: str, with_exec: bool = True, with_orthanc: bo
     config = CustomConfigParser()
     config.read(get_project_path() + "/" + config_file_name)
     APIContext.init(config)
+    CacheContext.init(config)
+    MetricsContext.init(config)
     if with_exec:
         ExecutionContext.init(config)
     if with_orthanc:
@@ -0,0 +1,52 @@
+import random
+import time
+
+from py_noir_code.src.utils.log_utils import get_logger
+
+"""
+Define the readiness polling: wait for a remote state (e.g. datasets imported in Shanoir) with a backoff, instead of
+a fixed sleep
+"""
+
+logger = get_logger()
+
+
+class ReadinessTimeoutError(TimeoutError):
+    """
+    Raised when the polled state is still not ready at the timeout, [last_value] holding the last polled value
+    """
+
+    def __init__(self, message: str, last_value=None):
+        super().__init__(message)
+        self.last_value = last_value
+
+
+def wait_until(check, timeout: float, description: str, is_ready=bool, initial_delay: float = 1,
+               max_delay: float = 30):
+    """ Call [check]() until [is_ready] of its value, the delay between two calls doubling from [initial_delay] up to
+    [max_delay] seconds (with jitter)
+    :param check: function returning the polled value
+    :param timeout: seconds
+    :param description: what is waited for, for the logs and the timeout report
+    :param is_ready: function of the polled value, True once ready
+    :param initial_delay:
+    :param max_delay:
+    :return: the ready value
+    :raise ReadinessTimeoutError: if still not ready after [timeout] seconds
+    """
+    start = time.monotonic()
+    delay = initial_delay
+    nb_checks = 0
+    while True:
+        value = check()
+        nb_checks += 1
+        elapsed = time.monotonic() - start
+        if is_ready(value):
+            if nb_checks > 1:
+                logger.info("%s ready after %.1f s (%s checks)" % (description, elapsed, nb_checks))
+            return value
+        if elapsed >= timeout:
+            raise ReadinessTimeoutError("%s not ready after %.1f s (%s checks)" % (description, elapsed, nb_checks),
+                                        value)
+        time.sleep(min(random.uniform(delay / 2, delay), timeout - elapsed))
+        delay = min(delay * 2, max_delay)
@@ -0,0 +1,15 @@
+import math
+from typing import List
+
+
+def percentile(values: List[float], rank: float):
+    """ Get the [rank] percentile (0-100) of [values] with the nearest-rank method
+    :param values:
+    :param rank:
+    :return: the percentile, None if [values] is empty
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(int(math.ceil(rank / 100 * len(ordered))) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
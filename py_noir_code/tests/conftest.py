@@ -0,0 +1,31 @@
+import sys
+import os
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+
+class FakeClock(object):
+    """
+    Monotonic clock advanced by hand or by the sleeps, which return at once
+    """
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, delay: float):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+@pytest.fixture
+def fake_clock() -> FakeClock:
+    """ Clock to patch in place of time.monotonic and time.sleep in the module under test
+    :return:
+    """
+    return FakeClock()
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+import py_noir_code.src.API.retry_policy as retry_policy
+import py_noir_code.src.execution.async_execution_management_service as async_execution_management_service
+from py_noir_code.src.API.api_context import APIContext
+from py_noir_code.src.API.retry_policy import OPEN, get_circuit_breaker
+from py_noir_code.src.execution.async_execution_management_service import monitor_execution
+
+
+@pytest.fixture(autouse=True)
+def engine(monkeypatch):
+    async def no_pause():
+        pass
+
+    monkeypatch.setattr(APIContext, "domain", "shanoir.test")
+    monkeypatch.setattr(APIContext, "breaker_failure_threshold", 1)
+    monkeypatch.setattr(APIContext, "breaker_reset_timeout", 0.05)
+    monkeypatch.setattr(retry_policy, "breakers", {})
+    monkeypatch.setattr(async_execution_management_service, "get_poll_delay", lambda pipeline, elapsed: 0)
+    monkeypatch.setattr(async_execution_management_service, "wait_for_polling_async", no_pause)
+
+
+def test_open_breaker_does_not_fail_a_running_execution(monkeypatch):
+    # a single failed poll is tolerated: the breaker rejections must not count as failed polls
+    monkeypatch.setattr(APIContext, "max_retries", 0)
+    breaker = get_circuit_breaker("shanoir.test")
+    statuses = ['"Running"', '"Running"', '"Finished"']
+    polled_statuses = []
+
+    async def get_execution_status(monitoring_id: str) -> str:
+        breaker.before_call()
+        status = statuses[len(polled_statuses)]
+        polled_statuses.append(status)
+        if len(polled_statuses) == 1:
+            # Shanoir goes down after the first poll
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return status
+
+    monkeypatch.setattr(async_execution_management_service, "get_execution_status", get_execution_status)
+
+    status = asyncio.run(monitor_execution({}, 10, "workflow-10", 0))
+    assert status == '"Finished"'
+    assert breaker.transitions[OPEN] == 1
+    assert breaker.nb_rejected >= 1
+    assert len(polled_statuses) == 3
+
+
+def test_failed_polls_end_the_monitoring(monkeypatch):
+    monkeypatch.setattr(APIContext, "max_retries", 2)
+    nb_polls = []
+
+    async def get_execution_status(monitoring_id: str) -> str:
+        nb_polls.append(monitoring_id)
+        raise ValueError("unexpected answer")
+
+    monkeypatch.setattr(async_execution_management_service, "get_execution_status", get_execution_status)
+
+    with pytest.raises(ValueError):
+        asyncio.run(monitor_execution({}, 10, "workflow-10", 0))
+    assert len(nb_polls) == 3
@@ -0,0 +1,94 @@
+import base64
+import json
+import threading
+import time
+
+import pytest
+
+import py_noir_code.src.security.authentication_service as authentication_service
+from py_noir_code.src.API.api_context import APIContext
+from py_noir_code.src.security.authentication_service import TokenRefreshError, refresh_access_token, \
+    renew_token_before_expiry
+
+
+class FakeResponse(object):
+
+    def __init__(self, status_code: int, content: dict):
+        self.status_code = status_code
+        self.text = json.dumps(content)
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class FakeSession(object):
+
+    def __init__(self, response: FakeResponse):
+        self.response = response
+        self.nb_posts = 0
+        self.posted = threading.Event()
+
+    def post(self, url, **kwargs):
+        self.nb_posts += 1
+        self.posted.set()
+        return self.response
+
+
+def make_token(expiry: float) -> str:
+    claims = base64.urlsafe_b64encode(json.dumps(dict(exp=expiry, iat=expiry - 300)).encode()).decode().rstrip("=")
+    return "header." + claims + ".signature"
+
+
+@pytest.fixture(autouse=True)
+def api_context(monkeypatch):
+    monkeypatch.setattr(APIContext, "scheme", "http")
+    monkeypatch.setattr(APIContext, "domain", "shanoir.test")
+    monkeypatch.setattr(APIContext, "clientId", "shanoir-uploader")
+    monkeypatch.setattr(APIContext, "refresh_token", "revoked")
+    monkeypatch.setattr(APIContext, "token_cache", False)
+
+    def ask_access_token():
+        pytest.fail("The password must not be asked")
+
+    monkeypatch.setattr(authentication_service, "ask_access_token", ask_access_token)
+
+
+def use_session(monkeypatch, response: FakeResponse) -> FakeSession:
+    session = FakeSession(response)
+    monkeypatch.setattr(authentication_service, "get_session", lambda: session)
+    return session
+
+
+def test_non_interactive_refresh_raises_on_a_rejected_token(monkeypatch):
+    use_session(monkeypatch, FakeResponse(400, dict(error="invalid_grant")))
+    monkeypatch.setattr(APIContext, "access_token", "expired")
+    with pytest.raises(TokenRefreshError):
+        refresh_access_token(interactive=False)
+    assert APIContext.access_token == "expired"
+
+
+def test_non_interactive_refresh_stores_the_new_tokens(monkeypatch):
+    use_session(monkeypatch, FakeResponse(200, dict(access_token="access", refresh_token="refresh")))
+    refresh_access_token(interactive=False)
+    assert (APIContext.access_token, APIContext.refresh_token) == ("access", "refresh")
+
+
+def test_failed_renewal_stops_without_prompting(monkeypatch):
+    session = use_session(monkeypatch, FakeResponse(400, dict(error="invalid_grant")))
+    monkeypatch.setattr(APIContext, "access_token", make_token(time.time() + 1))
+    monkeypatch.setattr(authentication_service, "token_renewal_stop_event", threading.Event())
+    thread = threading.Thread(target=renew_token_before_expiry, daemon=True)
+    thread.start()
+    try:
+        assert session.posted.wait(5)
+        time.sleep(0.2)
+        # not renewed again until the token is replaced, by the 401 handling of the requests
+        assert session.nb_posts == 1
+        assert thread.is_alive()
+        # the foreground 401 handling is not blocked by the waiting renewal thread
+        assert authentication_service.token_lock.acquire(timeout=1)
+        authentication_service.token_lock.release()
+    finally:
+        authentication_service.token_renewal_stop_event.set()
+        thread.join(5)
+    assert not thread.is_alive()
@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+
+from py_noir_code.src.API.api_context import APIContext
+from py_noir_code.src.API.api_session import get_pool_maxsize
+from py_noir_code.src.API.concurrency_limiter import AIMDLimiter, AsyncAIMDLimiter
+from py_noir_code.src.execution.execution_context import ExecutionContext
+
+
+def test_limit_bounded_by_min_and_max():
+    limiter = AIMDLimiter(initial_limit=100, min_limit=0, max_limit=8)
+    assert limiter.min_limit == 1
+    assert limiter.limit == 8.0
+
+    limiter = AIMDLimiter(initial_limit=0, min_limit=2, max_limit=8)
+    assert limiter.limit == 2.0
+
+
+def test_try_acquire_respects_limit():
+    limiter = AIMDLimiter(initial_limit=2, min_limit=1, max_limit=2)
+    first = limiter.try_acquire()
+    second = limiter.try_acquire()
+    assert first is not None and second is not None
+    assert limiter.try_acquire() is None
+    assert limiter.in_flight == 2
+
+    limiter.release(first, 200)
+    assert limiter.try_acquire() is not None
+
+
+def test_additive_increase_on_success():
+    limiter = AIMDLimiter(initial_limit=4, min_limit=1, max_limit=10)
+    for _ in range(4):
+        limiter.release(limiter.acquire(), 200)
+    # +1 / limit per success: about one slot per [limit] successes
+    assert 4.9 < limiter.limit < 5.0
+    assert limiter.nb_increases == 4
+
+
+def test_multiplicative_decrease_on_overload():
+    limiter = AIMDLimiter(initial_limit=10, min_limit=2, max_limit=10, backoff_ratio=0.5)
+    limiter.release(limiter.acquire(), 503)
+    assert limiter.limit == 5.0
+    assert limiter.nb_decreases == 1
+
+    # a burst of errors cuts the limit once
+    limiter.release(limiter.acquire(), None, overloaded=True)
+    assert limiter.limit == 5.0
+
+
+def test_decrease_stops_at_min_limit():
+    limiter = AIMDLimiter(initial_limit=3, min_limit=2, max_limit=10, backoff_ratio=0.1)
+    limiter.release(limiter.acquire(), 429)
+    assert limiter.limit == 2.0
+
+
+def test_overloaded_calls_do_not_feed_latencies():
+    limiter = AIMDLimiter(initial_limit=4, min_limit=1, max_limit=10)
+    limiter.release(limiter.acquire(), 502)
+    assert len(limiter.latencies) == 0
+    limiter.release(limiter.acquire(), 200)
+    assert len(limiter.latencies) == 1
+
+
+def test_latency_rise_detection():
+    limiter = AIMDLimiter(initial_limit=4, min_limit=1, max_limit=10, latency_tolerance=2.0)
+    limiter.latencies.extend([0.01] * 10)
+    limiter.baseline_latency = 0.01
+    limiter.smoothed_latency = 0.015
+    assert not limiter.is_latency_rising()
+    limiter.smoothed_latency = 0.05
+    assert limiter.is_latency_rising()
+
+
+def test_acquire_blocks_until_release():
+    limiter = AIMDLimiter(initial_limit=1, min_limit=1, max_limit=1)
+    start = limiter.acquire()
+    acquired = threading.Event()
+
+    def acquire():
+        limiter.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=acquire)
+    thread.start()
+    assert not acquired.wait(0.1)
+    limiter.release(start, 200)
+    assert acquired.wait(1)
+    thread.join()
+
+
+def test_stats():
+    limiter = AIMDLimiter(initial_limit=4, min_limit=1, max_limit=10)
+    start = time.perf_counter()
+    limiter.acquire()
+    limiter.release(start, 200)
+    stats = limiter.get_stats()
+    assert stats['in_flight'] == 0
+    assert stats['increases'] == 1
+    assert stats['p50'] is not None
+
+
+def test_async_limiter_lets_through_up_to_its_limit():
+    limiter = AsyncAIMDLimiter(initial_limit=200, min_limit=1, max_limit=200)
+    max_in_flight = []
+
+    async def call():
+        start = await limiter.acquire_async()
+        max_in_flight.append(limiter.in_flight)
+        await asyncio.sleep(0.01)
+        await limiter.release_async(start, 200)
+
+    async def run_calls():
+        await asyncio.gather(*[call() for _ in range(300)])
+
+    asyncio.run(run_calls())
+    assert max(max_in_flight) == 200
+    assert limiter.in_flight == 0
+
+
+def test_async_limiter_waits_for_a_release():
+    limiter = AsyncAIMDLimiter(initial_limit=1, min_limit=1, max_limit=1)
+
+    async def run_calls():
+        start = await limiter.acquire_async()
+        waiter = asyncio.ensure_future(limiter.acquire_async())
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        await limiter.release_async(start, 200)
+        await asyncio.wait_for(waiter, 1)
+
+    asyncio.run(run_calls())
+    assert limiter.in_flight == 1
+
+
+def test_pool_holds_every_call_let_through(monkeypatch):
+    monkeypatch.setattr(ExecutionContext, "max_thread", 3)
+    monkeypatch.setattr(APIContext, "max_concurrency", 32)
+    monkeypatch.setattr(APIContext, "adaptive_concurrency", True)
+    assert get_pool_maxsize() == 33
+    monkeypatch.setattr(APIContext, "adaptive_concurrency", False)
+    assert get_pool_maxsize() == 4
@@ -0,0 +1,112 @@
+import json
+import statistics
+
+import pytest
+
+import py_noir_code.src.execution.execution_duration_model as execution_duration_model
+from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.execution.execution_duration_model import DurationStats, get_durations, get_poll_delay, \
+    record_execution_duration, save_duration_history, get_expected_duration, get_expected_end_window
+
+
+@pytest.fixture(autouse=True)
+def history_file(monkeypatch, tmp_path) -> str:
+    history_file_name = str(tmp_path / "pipeline_durations.json")
+    monkeypatch.setattr(execution_duration_model, "get_history_file_name", lambda: history_file_name)
+    monkeypatch.setattr(execution_duration_model, "durations", None)
+    monkeypatch.setattr(execution_duration_model, "last_save", 0.0)
+    monkeypatch.setattr(ExecutionContext, "poll_interval", 5)
+    monkeypatch.setattr(ExecutionContext, "max_poll_interval", 300)
+    monkeypatch.setattr(ExecutionContext, "adaptive_polling", True)
+    return history_file_name
+
+
+def set_history(pipeline: str, samples: list):
+    stats = DurationStats()
+    for sample in samples:
+        stats.add(sample)
+    get_durations()[pipeline] = stats
+
+
+def test_welford_matches_the_sample_statistics():
+    samples = [600, 660, 540, 720, 480, 615.5]
+    stats = DurationStats()
+    for sample in samples:
+        stats.add(sample)
+    assert stats.count == len(samples)
+    assert stats.mean == pytest.approx(statistics.mean(samples))
+    assert stats.get_deviation() == pytest.approx(statistics.stdev(samples))
+
+
+def test_single_sample_has_no_deviation():
+    stats = DurationStats()
+    assert stats.get_deviation() == 0.0
+    stats.add(600)
+    assert (stats.mean, stats.get_deviation()) == (600, 0.0)
+
+
+def test_history_saved_and_loaded(monkeypatch, history_file):
+    for duration in (100, 200, 300):
+        record_execution_duration("pipeline/1", duration)
+    # no pipeline, nothing to learn
+    record_execution_duration(None, 50)
+    save_duration_history()
+    with open(history_file) as saved_file:
+        assert json.load(saved_file) == {"pipeline/1": dict(count=3, mean=200.0, m2=20000.0)}
+
+    # next run
+    monkeypatch.setattr(execution_duration_model, "durations", None)
+    loaded = get_durations()["pipeline/1"]
+    assert (loaded.count, loaded.mean, loaded.get_deviation()) == (3, 200.0, 100.0)
+    record_execution_duration("pipeline/1", 200)
+    assert get_durations()["pipeline/1"].count == 4
+
+
+def test_history_saved_at_most_once_per_period(monkeypatch, history_file):
+    record_execution_duration("pipeline/1", 100)
+    with open(history_file) as saved_file:
+        assert json.load(saved_file)["pipeline/1"]["count"] == 1
+    record_execution_duration("pipeline/1", 200)
+    with open(history_file) as saved_file:
+        assert json.load(saved_file)["pipeline/1"]["count"] == 1
+
+
+def test_corrupted_history_is_ignored(history_file):
+    with open(history_file, "w") as saved_file:
+        saved_file.write("{not json")
+    assert get_durations() == {}
+
+
+def test_expected_duration_needs_enough_samples():
+    set_history("pipeline/1", [100, 200])
+    assert get_expected_duration("pipeline/1") is None
+    assert get_expected_end_window("pipeline/1") is None
+    get_durations()["pipeline/1"].add(300)
+    assert get_expected_duration("pipeline/1") == 200
+    # mean +/- 2 deviations
+    assert get_expected_end_window("pipeline/1") == (0, 400, 200)
+
+
+def test_poll_interval_without_history():
+    assert get_poll_delay("unknown", 3600) == 5
+
+
+def test_poll_interval_when_adaptive_polling_is_disabled(monkeypatch):
+    set_history("pipeline/1", [1000, 1000, 1000])
+    monkeypatch.setattr(ExecutionContext, "adaptive_polling", False)
+    assert get_poll_delay("pipeline/1", 100) == 5
+
+
+def test_poll_schedule_around_the_expected_end():
+    set_history("pipeline/1", [900, 1000, 1100])
+    start, end, half_width = get_expected_end_window("pipeline/1")
+    assert (start, end, half_width) == (800, 1200, 200)
+    # back off before the window, never past its start
+    assert get_poll_delay("pipeline/1", 10) == 5
+    assert get_poll_delay("pipeline/1", 400) == 100
+    assert get_poll_delay("pipeline/1", 780) == 20
+    # densely inside the window
+    assert get_poll_delay("pipeline/1", 1000) == 5
+    # back off again once overdue, bounded by max_poll_interval
+    assert get_poll_delay("pipeline/1", 1600) == 100
+    assert get_poll_delay("pipeline/1", 100000) == 300
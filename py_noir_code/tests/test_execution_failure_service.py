@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+import pytest
+from requests import Response
+from requests.exceptions import ConnectionError, HTTPError, Timeout
+
+from py_noir_code.src.API.retry_policy import CircuitOpenError
+from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.execution.execution_failure_service import TRANSIENT, PERMANENT, MAX_RETRY_DELAY, \
+    classify_creation_failure, classify_exception, classify_status, get_retry_delay, get_vip_status, \
+    is_active_status, is_succeeded_status
+
+
+def make_http_error(status_code: int) -> HTTPError:
+    response = Response()
+    response.status_code = status_code
+    return HTTPError("HTTP %s" % status_code, response=response)
+
+
+def test_vip_status_parsing():
+    assert get_vip_status('"Running"\n') == "Running"
+    assert get_vip_status(None) == ""
+    assert is_active_status('"Initializing"')
+    assert not is_active_status('"Finished"')
+    assert is_succeeded_status('"Finished"')
+
+
+@pytest.mark.parametrize("status, classification", [
+    ('"InitializationFailed"', TRANSIENT),
+    ('"Unknown"', TRANSIENT),
+    ('"ExecutionFailed"', PERMANENT),
+    ('"Killed"', PERMANENT),
+])
+def test_classify_status(status, classification):
+    assert classify_status(status) == classification
+
+
+@pytest.mark.parametrize("exception, classification", [
+    (make_http_error(503), TRANSIENT),
+    (make_http_error(429), TRANSIENT),
+    (make_http_error(400), PERMANENT),
+    (make_http_error(404), PERMANENT),
+    (HTTPError("no response"), TRANSIENT),
+    (Timeout(), TRANSIENT),
+    (ConnectionError(), TRANSIENT),
+    (CircuitOpenError(), TRANSIENT),
+    (asyncio.TimeoutError(), TRANSIENT),
+    (json.JSONDecodeError("Expecting value", "<html>", 0), TRANSIENT),
+    (ValueError("No execution created"), PERMANENT),
+    (KeyError("identifier"), PERMANENT),
+])
+def test_classify_exception(exception, classification):
+    assert classify_exception(exception) == classification
+
+
+def test_created_execution_is_never_retried():
+    # the execution exists on VIP even if a later step failed
+    assert classify_creation_failure(Timeout(), {"id": 12}) == PERMANENT
+
+
+def test_creation_failure_classified_from_the_response_code():
+    assert classify_creation_failure(ValueError(), {"code": 503, "message": "Unavailable"}) == TRANSIENT
+    assert classify_creation_failure(ValueError(), {"code": "400", "message": "Bad request"}) == PERMANENT
+
+
+def test_creation_failure_classified_from_the_exception():
+    assert classify_creation_failure(Timeout(), None) == TRANSIENT
+    assert classify_creation_failure(ValueError(), {"message": "no code"}) == PERMANENT
+
+
+def test_retry_delay_backoff(monkeypatch):
+    monkeypatch.setattr(ExecutionContext, "retry_delay", 10)
+    for attempts, delay in ((1, 10), (2, 20), (3, 40)):
+        for _ in range(20):
+            assert delay / 2 <= get_retry_delay(attempts) <= delay
+    assert get_retry_delay(100) <= MAX_RETRY_DELAY
@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+
+import py_noir_code.src.execution.execution_hook_service as execution_hook_service
+from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.execution.execution_hook_service import CompletionHooks, start_completion_hooks, \
+    run_success_hook, run_failure_hook, close_completion_hooks
+
+
+@pytest.fixture(autouse=True)
+def no_hooks(monkeypatch):
+    monkeypatch.setattr(execution_hook_service, "completion_hooks", None)
+    monkeypatch.setattr(ExecutionContext, "hook_threads", 2)
+
+
+def test_hooks_run_without_blocking_the_caller():
+    release = threading.Event()
+    calls = []
+
+    def on_success(item: dict, execution_id):
+        release.wait(5)
+        calls.append((item["identifier"], execution_id))
+
+    hooks = CompletionHooks(on_success, nb_workers=1)
+    hooks.succeeded(dict(identifier=0), 10)
+    hooks.succeeded(dict(identifier=1), 11)
+    # both queued while the first one is still running
+    assert calls == []
+    release.set()
+    hooks.close()
+    assert calls == [(0, 10), (1, 11)]
+    assert (hooks.nb_submitted, hooks.nb_failed) == (2, 0)
+
+
+def test_failing_hook_is_counted():
+    def on_failure(item: dict, error: str):
+        raise ValueError(error)
+
+    hooks = CompletionHooks(on_failure=on_failure)
+    hooks.failed(dict(identifier=0), "Killed")
+    hooks.succeeded(dict(identifier=1), 11)
+    hooks.close()
+    assert (hooks.nb_submitted, hooks.nb_failed) == (1, 1)
+
+
+def test_close_waits_for_the_queued_hooks():
+    ended = []
+    start_completion_hooks(on_success=lambda item, execution_id: ended.append(item["identifier"]),
+                           on_failure=lambda item, error: ended.append(error))
+    for identifier in range(20):
+        run_success_hook(dict(identifier=identifier), identifier)
+    run_failure_hook(dict(identifier=20), "Killed")
+    close_completion_hooks()
+    assert sorted(ended, key=str) == sorted(list(range(20)) + ["Killed"], key=str)
+    assert execution_hook_service.completion_hooks is None
+
+
+def test_no_hooks():
+    start_completion_hooks()
+    assert execution_hook_service.completion_hooks is None
+    run_success_hook(dict(identifier=0), 10)
+    close_completion_hooks()
@@ -0,0 +1,81 @@
+import pytest
+
+import py_noir_code.src.execution.execution_index_service as execution_index_service
+from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.execution.execution_index_service import ExecutionIndex, get_payload_hash, \
+    record_succeeded_execution, skip_succeeded_items
+
+
+def make_item(**fields) -> dict:
+    item = {
+        "identifier": 0,
+        "name": "FLAIR_1_exam_12_2026-10-17_101010123",
+        "pipelineIdentifier": "comete_brain_flair/1.3",
+        "inputParameters": {},
+        "datasetParameters": [
+            {"name": "t2_archive", "groupBy": "EXAMINATION", "datasetIds": [3, 1, 2]},
+            {"name": "pmap_archive", "groupBy": "EXAMINATION", "datasetIds": [7]},
+        ],
+        "studyIdentifier": 5,
+        "refreshToken": "token",
+        "client": "shanoir-uploader",
+    }
+    item.update(fields)
+    return item
+
+
+@pytest.fixture
+def execution_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(ExecutionContext, "skip_succeeded", True)
+    index = ExecutionIndex(str(tmp_path / "executions.sqlite"))
+    monkeypatch.setattr(execution_index_service, "execution_index", index)
+    yield index
+    index.close()
+
+
+def test_volatile_fields_do_not_change_the_hash():
+    assert get_payload_hash(make_item()) == get_payload_hash(
+        make_item(identifier=8, name="FLAIR_1_exam_12_2026-10-18_090000000", refreshToken="other", attempts=2,
+                  expectedDuration=600))
+
+
+def test_dataset_order_does_not_change_the_hash():
+    item = make_item()
+    reordered_item = make_item(datasetParameters=[
+        {"name": "pmap_archive", "groupBy": "EXAMINATION", "datasetIds": [7]},
+        {"groupBy": "EXAMINATION", "datasetIds": [2, 3, 1], "name": "t2_archive"},
+    ])
+    assert get_payload_hash(item) == get_payload_hash(reordered_item)
+
+
+@pytest.mark.parametrize("fields", [
+    dict(pipelineIdentifier="comete_brain_flair/1.4"),
+    dict(studyIdentifier=6),
+    dict(inputParameters={"threshold": 1}),
+    dict(datasetParameters=[{"name": "t2_archive", "groupBy": "EXAMINATION", "datasetIds": [1, 2]}]),
+])
+def test_executed_fields_change_the_hash(fields):
+    assert get_payload_hash(make_item()) != get_payload_hash(make_item(**fields))
+
+
+def test_skip_succeeded_and_duplicated_items(execution_index):
+    succeeded_item = make_item(studyIdentifier=1)
+    record_succeeded_execution(succeeded_item, 42)
+
+    items = [make_item(identifier=0, studyIdentifier=1), make_item(identifier=1, studyIdentifier=2),
+             make_item(identifier=2, studyIdentifier=2)]
+    items_to_process, linked_execution_ids = skip_succeeded_items(items)
+    assert [item["identifier"] for item in items_to_process] == [1]
+    assert linked_execution_ids == [42]
+
+
+def test_duplicates_across_streamed_calls(execution_index):
+    seen_hashes = set()
+    assert len(skip_succeeded_items([make_item(identifier=0)], seen_hashes)[0]) == 1
+    assert skip_succeeded_items([make_item(identifier=1)], seen_hashes)[0] == []
+
+
+def test_disabled_index_keeps_every_item(monkeypatch):
+    monkeypatch.setattr(ExecutionContext, "skip_succeeded", False)
+    items = [make_item(), make_item()]
+    assert skip_succeeded_items(items) == (items, [])
@@ -0,0 +1,117 @@
+import json
+
+import py_noir_code.src.execution.execution_journal_service as execution_journal_service
+from py_noir_code.src.execution.execution_journal_service import JournalStateStore, ExecutionJournal, CREATED, \
+    SUCCEEDED, FAILED, RETRIED, get_journal_file_name, read_journal, replay_journal, read_snapshot, write_snapshot
+
+
+def make_items(nb_items: int) -> list:
+    header = dict(nb_processed_items=0, processed_item_ids=[], running_executions={})
+    return [header] + [dict(identifier=identifier, name="item %s" % identifier) for identifier in range(nb_items)]
+
+
+def write_journal(journal_file_name: str, events: list):
+    journal = ExecutionJournal(journal_file_name)
+    for event in events:
+        journal.append(**event)
+    journal.close()
+
+
+def test_replay_applies_transitions(tmp_path):
+    journal_file_name = str(tmp_path / "save.json.journal")
+    write_journal(journal_file_name, [
+        dict(event=CREATED, identifier=0, execution_id=10, monitoring_id="workflow-10", created_at=1.0),
+        dict(event=CREATED, identifier=1, execution_id=11, monitoring_id="workflow-11", created_at=2.0),
+        dict(event=SUCCEEDED, identifier=0),
+        dict(event=RETRIED, identifier=1, attempts=1),
+        dict(event=FAILED, identifier=2),
+    ])
+
+    items = replay_journal(make_items(4), journal_file_name)
+
+    header = items[0]
+    assert header["nb_processed_items"] == 2
+    assert header["processed_item_ids"] == [0, 2]
+    assert header["running_executions"] == {}
+    assert [item["identifier"] for item in items[1:]] == [1, 3]
+    assert items[1]["attempts"] == 1
+
+
+def test_replay_keeps_running_executions(tmp_path):
+    journal_file_name = str(tmp_path / "save.json.journal")
+    write_journal(journal_file_name, [
+        dict(event=CREATED, identifier=1, execution_id=11, monitoring_id=None, created_at=2.0),
+    ])
+
+    header = replay_journal(make_items(2), journal_file_name)[0]
+    assert header["running_executions"] == {"1": dict(execution_id=11, monitoring_id=None, created_at=2.0)}
+
+
+def test_replay_is_idempotent(tmp_path):
+    journal_file_name = str(tmp_path / "save.json.journal")
+    write_journal(journal_file_name, [dict(event=SUCCEEDED, identifier=0)])
+
+    items = replay_journal(make_items(2), journal_file_name)
+    # the snapshot already holds the event, e.g. after a crash between the compaction and the truncation
+    items = replay_journal(items, journal_file_name)
+    assert items[0]["nb_processed_items"] == 1
+    assert [item["identifier"] for item in items[1:]] == [1]
+
+
+def test_truncated_last_line_is_ignored(tmp_path):
+    journal_file_name = str(tmp_path / "save.json.journal")
+    write_journal(journal_file_name, [dict(event=SUCCEEDED, identifier=0)])
+    with open(journal_file_name, "a") as journal_file:
+        journal_file.write('{"event": "succeeded", "ident')
+
+    assert read_journal(journal_file_name) == [dict(event=SUCCEEDED, identifier=0)]
+    assert read_journal(str(tmp_path / "missing.journal")) == []
+
+
+def test_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(execution_journal_service, "COMPACTION_PERIOD", 3)
+    working_file_name = str(tmp_path / "working.json")
+    save_file_name = str(tmp_path / "save.json")
+    items = make_items(3)
+    write_snapshot(working_file_name, items)
+
+    store = JournalStateStore(working_file_name, save_file_name)
+    snapshots = []
+
+    def get_snapshot():
+        snapshots.append(json.loads(json.dumps(items)))
+        return items
+
+    store.open(get_snapshot)
+    journal_file_name = get_journal_file_name(save_file_name)
+    assert len(snapshots) == 1
+    assert read_snapshot(save_file_name) == items
+
+    store.record_creation(items[1], 10, "workflow-10", 1.0)
+    store.record_end(items[1], SUCCEEDED)
+    assert len(read_journal(journal_file_name)) == 2
+
+    # the state changed, the next event triggers the compaction into a new snapshot
+    items[0].update(nb_processed_items=1, processed_item_ids=[0])
+    del items[1]
+    store.record_end(items[1], FAILED)
+    assert len(snapshots) == 2
+    assert read_journal(journal_file_name) == []
+    assert read_snapshot(save_file_name) == items
+    assert read_snapshot(working_file_name) == items
+
+    store.close()
+    assert not (tmp_path / "save.json").exists()
+    assert not (tmp_path / "working.json").exists()
+    assert not (tmp_path / "save.json.journal").exists()
+
+
+def test_load_replays_only_when_resuming(tmp_path):
+    working_file_name = str(tmp_path / "working.json")
+    save_file_name = str(tmp_path / "save.json")
+    write_snapshot(working_file_name, make_items(2))
+    write_journal(get_journal_file_name(save_file_name), [dict(event=SUCCEEDED, identifier=0)])
+
+    store = JournalStateStore(working_file_name, save_file_name)
+    assert len(store.load(resume=False)) == 3
+    assert len(store.load(resume=True)) == 2
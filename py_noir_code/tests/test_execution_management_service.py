@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+import py_noir_code.src.execution.execution_management_service as execution_management_service
+from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.execution.execution_management_service import generate_items
+from py_noir_code.src.execution.execution_scheduling_service import ExecutionQueue, FIFO
+
+
+class FakeStateStore(object):
+
+    def __init__(self):
+        self.items = []
+        self.generation_ends = []
+
+    def add_items(self, items: list) -> list:
+        self.items.extend(items)
+        return items
+
+    def record_generation_end(self, complete: bool):
+        self.generation_ends.append(complete)
+
+
+@pytest.fixture
+def state_store(monkeypatch) -> FakeStateStore:
+    store = FakeStateStore()
+    monkeypatch.setattr(ExecutionContext, "stream_buffer_size", 3)
+    monkeypatch.setattr(execution_management_service, "state_store", store)
+    monkeypatch.setattr(execution_management_service, "execution_queue", ExecutionQueue(FIFO))
+    monkeypatch.setattr(execution_management_service, "pending_items", {})
+    monkeypatch.setattr(execution_management_service, "total_items_to_process", 0)
+    monkeypatch.setattr(execution_management_service, "generating", True)
+    monkeypatch.setattr(execution_management_service, "generation_complete", False)
+    return store
+
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def start_generation(items) -> threading.Thread:
+    thread = threading.Thread(target=generate_items, args=(items,), daemon=True)
+    thread.start()
+    return thread
+
+
+def test_generation_paused_while_the_buffer_is_full(state_store):
+    generated = []
+
+    def generate():
+        for identifier in range(10):
+            generated.append(identifier)
+            yield dict(identifier=identifier)
+
+    thread = start_generation(generate())
+    queue = execution_management_service.execution_queue
+    wait_for(lambda: len(generated) == 4)
+    time.sleep(0.1)
+    # 3 items waiting for their submission, the 4th one is held by the generation
+    assert len(generated) == 4
+    assert len(queue) == 3
+
+    assert queue.pop()["identifier"] == 0
+    wait_for(lambda: len(generated) == 5)
+    assert len(queue) == 3
+
+    submitted = []
+    while thread.is_alive() or len(queue):
+        item = queue.pop()
+        if item is not None:
+            submitted.append(item["identifier"])
+    assert submitted == list(range(1, 10))
+    assert execution_management_service.total_items_to_process == 10
+    assert state_store.generation_ends == [True]
+    assert execution_management_service.generation_complete
+    assert not execution_management_service.generating
+
+
+def test_failed_generation_keeps_the_items_generated(state_store):
+    def generate():
+        yield dict(identifier=0)
+        yield dict(identifier=1)
+        raise ConnectionError("Shanoir unreachable")
+
+    start_generation(generate()).join(5)
+    assert [item["identifier"] for item in state_store.items] == [0, 1]
+    assert sorted(execution_management_service.pending_items) == ["0", "1"]
+    assert state_store.generation_ends == [False]
+    assert not execution_management_service.generation_complete
+    assert not execution_management_service.generating
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+import py_noir_code.src.execution.execution_rate_limiter as execution_rate_limiter
+from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.execution.execution_rate_limiter import TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch, fake_clock):
+    monkeypatch.setattr(execution_rate_limiter.time, "monotonic", fake_clock.monotonic)
+    monkeypatch.setattr(execution_rate_limiter.time, "sleep", fake_clock.sleep)
+    return fake_clock
+
+
+def test_burst_goes_through_at_once(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() == 0.5
+
+
+def test_reservations_are_queued(clock):
+    bucket = TokenBucket(rate=2, burst=1)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.5
+    assert bucket.reserve() == 1.0
+    stats = bucket.get_stats()
+    assert stats['acquired'] == 3
+    assert stats['delayed'] == 2
+    assert stats['total_wait'] == 1.5
+
+
+def test_tokens_refill_up_to_burst(clock):
+    bucket = TokenBucket(rate=1, burst=2)
+    bucket.reserve()
+    bucket.reserve()
+    clock.now += 1
+    assert bucket.reserve() == 0.0
+    clock.now += 100
+    assert [bucket.reserve() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.reserve() == 1.0
+
+
+def test_zero_rate_disables_pacing(clock):
+    bucket = TokenBucket(rate=0, burst=1)
+    assert [bucket.reserve() for _ in range(10)] == [0.0] * 10
+    assert bucket.get_stats()['acquired'] == 0
+
+
+def test_acquire_sleeps_for_the_delay(clock):
+    bucket = TokenBucket(rate=4, burst=1)
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == [0.25]
+
+
+def test_acquire_async_sleeps_for_the_delay(monkeypatch, clock):
+    bucket = TokenBucket(rate=4, burst=1)
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(execution_rate_limiter.asyncio, "sleep", sleep)
+
+    async def acquire_twice():
+        await bucket.acquire_async()
+        await bucket.acquire_async()
+
+    asyncio.run(acquire_twice())
+    assert delays == [0.25]
+
+
+def test_submission_bucket_built_from_context(monkeypatch):
+    monkeypatch.setattr(ExecutionContext, "submit_rate", 3.0)
+    monkeypatch.setattr(ExecutionContext, "submit_burst", 5)
+    execution_rate_limiter.reset_submission_bucket()
+    try:
+        bucket = execution_rate_limiter.get_submission_bucket()
+        assert (bucket.rate, bucket.burst) == (3.0, 5)
+        assert execution_rate_limiter.get_submission_bucket() is bucket
+    finally:
+        execution_rate_limiter.reset_submission_bucket()
@@ -0,0 +1,105 @@
+import pytest
+
+import py_noir_code.src.execution.execution_scheduling_service as execution_scheduling_service
+from py_noir_code.src.execution.execution_scheduling_service import ExecutionQueue, simulate_makespan, \
+    simulate_policies, FIFO, LPT, SPT
+
+
+@pytest.fixture(autouse=True)
+def no_history(monkeypatch):
+    # durations come from the items hints only
+    monkeypatch.setattr(execution_scheduling_service, "get_expected_duration", lambda pipeline: None)
+
+
+def make_item(identifier: int, duration: float = None, nb_datasets: int = 1) -> dict:
+    item = dict(identifier=identifier, datasetParameters=[dict(datasetIds=list(range(nb_datasets)))])
+    if duration is not None:
+        item["expectedDuration"] = duration
+    return item
+
+
+def pop_all(queue: ExecutionQueue) -> list:
+    identifiers = []
+    item = queue.pop()
+    while item is not None:
+        identifiers.append(item["identifier"])
+        item = queue.pop()
+    return identifiers
+
+
+def make_queue(policy: str, items: list) -> ExecutionQueue:
+    queue = ExecutionQueue(policy)
+    queue.extend(items)
+    return queue
+
+
+def test_policies_order():
+    items = [make_item(0, 60), make_item(1, 600), make_item(2, 6), make_item(3, 3600)]
+    assert pop_all(make_queue(LPT, items)) == [3, 1, 0, 2]
+    assert pop_all(make_queue(SPT, items)) == [2, 0, 1, 3]
+    assert pop_all(make_queue(FIFO, items)) == [0, 1, 2, 3]
+
+
+def test_ties_broken_by_dataset_count_then_order():
+    items = [make_item(0, 60), make_item(1, 60, nb_datasets=3), make_item(2, 60), make_item(3, 60, nb_datasets=2)]
+    assert pop_all(make_queue(LPT, items)) == [1, 3, 0, 2]
+    assert pop_all(make_queue(SPT, items)) == [1, 3, 0, 2]
+
+
+def test_items_order_kept_without_prediction():
+    items = [make_item(0, nb_datasets=1), make_item(1, nb_datasets=5), make_item(2, nb_datasets=3)]
+    for policy in (LPT, SPT, FIFO):
+        assert pop_all(make_queue(policy, items)) == [0, 1, 2]
+
+
+def test_items_without_prediction_at_the_mean_duration():
+    items = [make_item(0, 100), make_item(1), make_item(2, 300), make_item(3, 250)]
+    # 1 is predicted at the mean, 216.7 s
+    assert pop_all(make_queue(LPT, items)) == [2, 3, 1, 0]
+    assert pop_all(make_queue(SPT, items)) == [0, 1, 3, 2]
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        ExecutionQueue("random")
+
+
+def test_delayed_items_held_back(monkeypatch, fake_clock):
+    monkeypatch.setattr(execution_scheduling_service.time, "monotonic", fake_clock.monotonic)
+    queue = make_queue(LPT, [make_item(0, 60)])
+    queue.push(make_item(1, 600), delay=30)
+    queue.push(make_item(2, 6))
+    assert len(queue) == 3
+    assert queue.get_wait_time() == 30
+    assert pop_all(queue) == [0, 2]
+    assert len(queue) == 1
+
+    fake_clock.now += 30
+    assert queue.get_wait_time() == 0
+    assert pop_all(queue) == [1]
+    assert queue.get_wait_time() is None
+    assert len(queue) == 0
+
+
+def test_makespan_without_limits():
+    assert simulate_makespan([]) == 0
+    assert simulate_makespan([60, 600, 6]) == 600
+
+
+def test_makespan_on_slots():
+    # 2 slots: 600 | 60 then 60 then 6
+    assert simulate_makespan([600, 60, 60, 6], nb_slots=2) == 600
+    # the long execution started last stretches the batch end
+    assert simulate_makespan([60, 60, 6, 600], nb_slots=2) == 660
+
+
+def test_makespan_with_paced_submissions():
+    # 1 creation per 10 s after a burst of 2: starts at 0, 0, 10, 20
+    assert simulate_makespan([5, 5, 5, 5], submit_rate=0.1, submit_burst=2) == 25
+    assert simulate_makespan([5, 5, 5, 5], submit_rate=0.1) == 35
+
+
+def test_simulated_policies():
+    items = [make_item(identifier, duration) for identifier, duration in enumerate([60, 60, 60, 60, 600])]
+    makespans = simulate_policies(items, nb_slots=2)
+    assert makespans == {LPT: 600, FIFO: 720, SPT: 720}
@@ -0,0 +1,199 @@
+import json
+import threading
+import time
+
+import pytest
+
+from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.execution.execution_journal_service import write_snapshot, SUCCEEDED, FAILED
+from py_noir_code.src.execution.execution_state_store import SharedSQLiteStateStore, CLAIM_RETRY_DELAY, PENDING, \
+    RUNNING, SQLiteStateStore, connect
+
+
+@pytest.fixture(autouse=True)
+def execution_context(monkeypatch):
+    monkeypatch.setattr(ExecutionContext, "claim_size", 2)
+    monkeypatch.setattr(ExecutionContext, "lease_duration", 300)
+    monkeypatch.setattr(ExecutionContext, "scheduling_policy", "fifo")
+
+
+@pytest.fixture
+def batch_files(tmp_path) -> tuple:
+    working_file_name = str(tmp_path / "working.json")
+    save_file_name = str(tmp_path / "save.json")
+    header = dict(nb_processed_items=0, processed_item_ids=[], running_executions={})
+    write_snapshot(working_file_name, [header] + [dict(identifier=identifier) for identifier in range(5)])
+    return working_file_name, save_file_name
+
+
+def make_store(batch_files: tuple, owner: str) -> SharedSQLiteStateStore:
+    store = SharedSQLiteStateStore(*batch_files)
+    store.owner = owner
+    return store
+
+
+def get_identifiers(items: list) -> list:
+    return [item["identifier"] for item in items]
+
+
+def test_processes_claim_disjoint_items(batch_files):
+    first = make_store(batch_files, "host:1")
+    second = make_store(batch_files, "host:2")
+
+    assert get_identifiers(first.load(resume=False)[1:]) == [0, 1]
+    assert get_identifiers(second.load(resume=False)[1:]) == [2, 3]
+    items, _, delay = first.claim()
+    assert get_identifiers(items) == [4]
+    assert delay == 0
+
+    # everything is leased: wait in case another process stops
+    items, _, delay = second.claim()
+    assert items == []
+    assert delay == CLAIM_RETRY_DELAY
+
+
+def test_expired_lease_is_taken_over_with_its_execution(batch_files):
+    first = make_store(batch_files, "host:1")
+    second = make_store(batch_files, "host:2")
+    items = first.load(resume=False)[1:]
+    first.record_creation(items[0], 10, "workflow-10", 1.0)
+    second.load(resume=False)
+
+    # the first process stopped renewing its leases
+    with first.connection:
+        first.connection.execute("UPDATE items SET lease_expires = ? WHERE owner = ?", (time.time() - 1, "host:1"))
+
+    items, running_executions, _ = second.claim()
+    # running executions first, to monitor them again
+    assert get_identifiers(items) == [0, 1]
+    assert running_executions == {"0": dict(execution_id=10, monitoring_id="workflow-10", created_at=1.0)}
+
+
+def test_lost_lease_is_not_written(batch_files):
+    first = make_store(batch_files, "host:1")
+    second = make_store(batch_files, "host:2")
+    items = first.load(resume=False)[1:]
+    second.load(resume=False)
+    with first.connection:
+        first.connection.execute("UPDATE items SET owner = ? WHERE identifier = 0", ("host:2",))
+
+    first.record_creation(items[0], 10, "workflow-10", 1.0)
+    first.record_end(items[0], SUCCEEDED)
+    status, owner = first.connection.execute("SELECT status, owner FROM items WHERE identifier = 0").fetchone()
+    assert status == PENDING
+    assert owner == "host:2"
+
+
+def test_ended_items_release_their_lease(batch_files):
+    first = make_store(batch_files, "host:1")
+    items = first.load(resume=False)[1:]
+    first.record_end(items[0], SUCCEEDED)
+
+    header = first.read_header()
+    assert header["nb_processed_items"] == 1
+    assert header["processed_item_ids"] == [0]
+    assert header["nb_items"] == 5
+    assert first.connection.execute("SELECT owner FROM items WHERE identifier = 0").fetchone()[0] is None
+
+
+def test_close_releases_the_leases(batch_files):
+    first = make_store(batch_files, "host:1")
+    first.load(resume=False)
+    first.close()
+
+    second = make_store(batch_files, "host:2")
+    # the batch in progress is joined, the released items are claimed again
+    assert get_identifiers(second.load(resume=False)[1:]) == [0, 1]
+
+
+def test_batch_files_removed_when_the_batch_is_over(batch_files, tmp_path):
+    first = make_store(batch_files, "host:1")
+    items = first.load(resume=False)[1:]
+    while items:
+        for item in items:
+            first.record_end(item, SUCCEEDED)
+        items, _, _ = first.claim()
+    first.close()
+    assert not (tmp_path / "working.json").exists()
+    assert (tmp_path / "save.sqlite").exists()
+
+
+def test_items_migrated_from_the_working_file(batch_files):
+    store = SQLiteStateStore(*batch_files)
+    # no database yet, the working file is read even when resuming
+    items = store.load(resume=True)
+    assert get_identifiers(items[1:]) == [0, 1, 2, 3, 4]
+    assert store.connection.execute("SELECT COUNT(*) FROM items WHERE status = ?", (PENDING,)).fetchone()[0] == 5
+    assert store.read_state()[1:] == items[1:]
+
+
+def test_state_reloaded_on_resume(batch_files):
+    store = SQLiteStateStore(*batch_files)
+    items = store.load(resume=False)[1:]
+    store.record_creation(items[0], 10, "workflow-10", 1.0)
+    store.record_creation(items[1], 11, "workflow-11", 2.0)
+    store.record_end(items[1], SUCCEEDED)
+    store.record_end(items[3], FAILED, "Killed")
+    store.record_creation(items[2], 12, "workflow-12", 3.0)
+    store.record_retry(dict(items[2], attempt=2), "InitializationFailed")
+    # interrupted, the files are kept
+    store.connection.close()
+
+    resumed = SQLiteStateStore(*batch_files)
+    header, *pending_items = resumed.load(resume=True)
+    assert header["nb_processed_items"] == 2
+    assert header["processed_item_ids"] == [1, 3]
+    assert header["running_executions"] == {"0": dict(execution_id=10, monitoring_id="workflow-10", created_at=1.0)}
+    # the retried item is updated in place, without its former execution
+    assert pending_items == [dict(identifier=0), dict(identifier=2, attempt=2), dict(identifier=4)]
+    row = resumed.connection.execute("SELECT status, execution_id, attempts, error FROM items WHERE identifier = 2")
+    assert row.fetchone() == (PENDING, None, 1, "InitializationFailed")
+
+
+def test_database_in_wal_mode(batch_files):
+    store = SQLiteStateStore(*batch_files)
+    store.load(resume=False)
+    assert store.connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_readers_not_blocked_by_a_writer(batch_files):
+    store = SQLiteStateStore(*batch_files)
+    items = store.load(resume=False)[1:]
+    reader = connect(store.database_file_name, read_only=True)
+    store.connection.execute("BEGIN IMMEDIATE")
+    store.connection.execute("UPDATE items SET status = ? WHERE identifier = 0", (RUNNING,))
+    # the write in progress is not visible, and does not block the reader (e.g. ExecutionStatus)
+    assert reader.execute("SELECT status FROM items WHERE identifier = 0").fetchone()[0] == PENDING
+    store.connection.commit()
+    assert reader.execute("SELECT status FROM items WHERE identifier = 0").fetchone()[0] == RUNNING
+    store.record_end(items[0], SUCCEEDED)
+    assert reader.execute("SELECT status FROM items WHERE identifier = 0").fetchone()[0] == SUCCEEDED
+
+
+def test_concurrent_writers(batch_files):
+    store = SQLiteStateStore(*batch_files)
+    items = store.load(resume=False)[1:]
+    errors = []
+
+    def write(item: dict):
+        # a connection of its own, as another process would
+        connection = connect(store.database_file_name)
+        try:
+            for attempt in range(50):
+                with connection:
+                    connection.execute("UPDATE items SET attempts = attempts + 1, item = ? WHERE identifier = ?",
+                                       (json.dumps(dict(item, attempt=attempt)), item["identifier"]))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=write, args=(item,)) for item in items]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert store.connection.execute("SELECT SUM(attempts) FROM items").fetchone()[0] == 50 * len(items)
+    assert [item["attempt"] for item in store.read_state()[1:]] == [49] * len(items)
@@ -0,0 +1,96 @@
+import datetime
+import logging
+
+import pytest
+
+from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.execution.maintenance_window_service import MaintenanceWindow, get_maintenance_windows, \
+    get_polling_pause_end, get_submission_pause_end, parse_maintenance_windows
+from py_noir_code.src.utils.custom_config_parser import CustomConfigParser
+
+
+def at(day: int, hour: int, minute: int = 0) -> datetime.datetime:
+    return datetime.datetime(2024, 1, day, hour, minute)
+
+
+@pytest.fixture
+def windows(monkeypatch):
+    def set_windows(maintenance_windows: str = None, beginning_hour: int = -1, ending_hour: int = -1,
+                    drain_lead: float = 0):
+        monkeypatch.setattr(ExecutionContext, "maintenance_windows", maintenance_windows)
+        monkeypatch.setattr(ExecutionContext, "server_reboot_beginning_hour", beginning_hour)
+        monkeypatch.setattr(ExecutionContext, "server_reboot_ending_hour", ending_hour)
+        monkeypatch.setattr(ExecutionContext, "maintenance_drain_lead", drain_lead)
+    return set_windows
+
+
+def make_config(options: str) -> CustomConfigParser:
+    config = CustomConfigParser()
+    config.read_string("[Execution context]\nmax_thread = 1\n" + options)
+    return config
+
+
+def test_window_within_a_day():
+    window = MaintenanceWindow(datetime.time(5), datetime.time(7))
+    assert window.get_end(at(2, 5)) == at(2, 7)
+    assert window.get_end(at(2, 6, 59)) == at(2, 7)
+    assert window.get_end(at(2, 7)) is None
+    assert window.get_end(at(2, 4, 59)) is None
+
+
+def test_window_crossing_midnight():
+    window = MaintenanceWindow(datetime.time(23, 30), datetime.time(0, 15))
+    # before midnight, the window ends the next day
+    assert window.get_end(at(1, 23, 30)) == at(2, 0, 15)
+    assert window.get_end(at(1, 23, 59)) == at(2, 0, 15)
+    # after midnight, the window started the day before
+    assert window.get_end(at(2, 0, 0)) == at(2, 0, 15)
+    assert window.get_end(at(2, 0, 14)) == at(2, 0, 15)
+    assert window.get_end(at(2, 0, 15)) is None
+    assert window.get_end(at(2, 12)) is None
+    assert window.get_end(at(2, 23, 29)) is None
+
+
+def test_parse_maintenance_windows():
+    parsed = parse_maintenance_windows("05:00-07:00, 23:30-00:15,")
+    assert [str(window) for window in parsed] == ["05:00-07:00", "23:30-00:15"]
+    assert parse_maintenance_windows(None) == []
+    with pytest.raises(ValueError):
+        parse_maintenance_windows("5h-7h")
+    with pytest.raises(ValueError):
+        parse_maintenance_windows("05:00-05:00")
+
+
+def test_reboot_hours_crossing_midnight(windows):
+    windows(beginning_hour=23, ending_hour=1)
+    assert [str(window) for window in get_maintenance_windows()] == ["23:00-01:00"]
+    assert get_polling_pause_end(at(1, 23, 30).timestamp()) == at(2, 1).timestamp()
+    assert get_polling_pause_end(at(2, 0, 30).timestamp()) == at(2, 1).timestamp()
+    assert get_polling_pause_end(at(2, 1).timestamp()) is None
+
+
+def test_submissions_stop_before_a_window(windows):
+    windows("23:30-00:15", drain_lead=600)
+    assert get_submission_pause_end(at(1, 23, 15).timestamp()) is None
+    assert get_submission_pause_end(at(1, 23, 25).timestamp()) == at(2, 0, 15).timestamp()
+    assert get_polling_pause_end(at(1, 23, 25).timestamp()) is None
+    assert get_submission_pause_end(at(2, 0, 10).timestamp()) == at(2, 0, 15).timestamp()
+
+
+def test_overlapping_windows_pause_until_the_last_end(windows):
+    windows("23:00-01:00, 00:30-02:00")
+    assert get_polling_pause_end(at(2, 0, 45).timestamp()) == at(2, 2).timestamp()
+
+
+def test_single_reboot_hour_is_ignored_with_a_warning(windows, caplog):
+    windows(beginning_hour=5)
+    with caplog.at_level(logging.WARNING):
+        assert get_maintenance_windows() == []
+    assert "Only one of server_reboot_beginning_hour" in caplog.text
+
+
+def test_former_reboot_hour_options_are_read():
+    context = ExecutionContext(make_config("server_reboot_hour_beginning = 5\nserver_reboot_hour_ending = 7\n"))
+    assert (context.server_reboot_beginning_hour, context.server_reboot_ending_hour) == (5, 7)
+    context = ExecutionContext(make_config("server_reboot_beginning_hour = 4\nserver_reboot_hour_beginning = 5\n"))
+    assert (context.server_reboot_beginning_hour, context.server_reboot_ending_hour) == (4, -1)
@@ -0,0 +1,52 @@
+import pytest
+
+import py_noir_code.src.utils.polling_utils as polling_utils
+from py_noir_code.src.utils.polling_utils import ReadinessTimeoutError, wait_until
+
+
+@pytest.fixture
+def clock(monkeypatch, fake_clock):
+    monkeypatch.setattr(polling_utils.time, "monotonic", fake_clock.monotonic)
+    monkeypatch.setattr(polling_utils.time, "sleep", fake_clock.sleep)
+    # upper bound of the jitter, so that the delays are predictable
+    monkeypatch.setattr(polling_utils.random, "uniform", lambda low, high: high)
+    return fake_clock
+
+
+def make_check(values: list):
+    values = iter(values)
+    return lambda: next(values)
+
+
+def test_ready_at_once(clock):
+    assert wait_until(make_check([3]), timeout=60, description="Datasets") == 3
+    assert clock.sleeps == []
+
+
+def test_delay_doubles_up_to_max_delay(clock):
+    check = make_check([0, 0, 0, 0, 0, 5])
+    assert wait_until(check, timeout=600, description="Datasets", initial_delay=1, max_delay=4) == 5
+    assert clock.sleeps == [1, 2, 4, 4, 4]
+
+
+def test_custom_readiness(clock):
+    check = make_check([[1], [1, 2], [1, 2, 3]])
+    assert wait_until(check, timeout=60, description="Datasets", is_ready=lambda value: len(value) == 3) == [1, 2, 3]
+
+
+def test_timeout_reports_the_last_value(clock):
+    with pytest.raises(ReadinessTimeoutError) as error:
+        wait_until(lambda: [], timeout=10, description="Datasets", initial_delay=4, max_delay=4)
+    assert error.value.last_value == []
+    assert "Datasets not ready" in str(error.value)
+    # the last sleep is cut at the timeout, then a last check is made
+    assert clock.sleeps == [4, 4, 2]
+
+
+def test_jitter_stays_within_half_delay(monkeypatch):
+    delays = []
+    monkeypatch.setattr(polling_utils.time, "sleep", delays.append)
+    values = iter([0, 0, 0, 1])
+    wait_until(lambda: next(values), timeout=600, description="Datasets", initial_delay=2, max_delay=30)
+    for delay, nominal_delay in zip(delays, [2, 4, 8]):
+        assert nominal_delay / 2 <= delay <= nominal_delay
@@ -0,0 +1,202 @@
+import asyncio
+import time
+
+import pytest
+from requests.exceptions import ConnectionError, Timeout
+
+import py_noir_code.src.API.retry_policy as retry_policy
+from py_noir_code.src.API.api_context import APIContext
+from py_noir_code.src.API.retry_policy import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN, MAX_BACKOFF, \
+    call_with_retry, call_with_retry_async, get_backoff, is_retryable
+
+
+class FakeResponse(object):
+
+    def __init__(self, status_code: int, headers: dict = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.url = "http://shanoir.test/path"
+        self.released = False
+
+    def release(self):
+        self.released = True
+
+
+@pytest.fixture(autouse=True)
+def api_context(monkeypatch):
+    monkeypatch.setattr(APIContext, "domain", "shanoir.test")
+    monkeypatch.setattr(APIContext, "max_retries", 3)
+    monkeypatch.setattr(APIContext, "retry_backoff", 1.0)
+    monkeypatch.setattr(APIContext, "breaker_failure_threshold", 5)
+    monkeypatch.setattr(APIContext, "breaker_reset_timeout", 60.0)
+    monkeypatch.setattr(retry_policy, "breakers", {})
+    monkeypatch.setattr(retry_policy, "retry_stats", dict(retries=0, gave_up=0))
+    monkeypatch.setattr(retry_policy.time, "sleep", lambda delay: None)
+
+
+def make_call(outcomes: list):
+    """ Build a call returning (or raising) [outcomes] in turn
+    :param outcomes:
+    :return: the call, and the list of its invocations
+    """
+    invocations = []
+
+    def call():
+        outcome = outcomes[len(invocations)]
+        invocations.append(outcome)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return call, invocations
+
+
+def test_is_retryable():
+    assert is_retryable('get')
+    assert is_retryable('PUT')
+    assert not is_retryable('post')
+    assert is_retryable('post', idempotent=True)
+    assert not is_retryable('get', idempotent=False)
+
+
+def test_backoff_uses_retry_after():
+    assert get_backoff(0, FakeResponse(503, {'Retry-After': '7'})) == 7
+    assert get_backoff(0, FakeResponse(503, {'Retry-After': '3600'})) == MAX_BACKOFF
+
+
+def test_backoff_is_jittered_and_capped():
+    for attempt in range(10):
+        backoff = get_backoff(attempt)
+        assert 0 <= backoff <= min(2 ** attempt, MAX_BACKOFF)
+
+
+def test_retryable_status_then_success():
+    call, invocations = make_call([FakeResponse(503), FakeResponse(502), FakeResponse(200)])
+    assert call_with_retry('get', call).status_code == 200
+    assert len(invocations) == 3
+    assert retry_policy.retry_stats == dict(retries=2, gave_up=0)
+
+
+def test_gives_up_after_max_retries():
+    call, invocations = make_call([FakeResponse(503)] * 4)
+    assert call_with_retry('get', call).status_code == 503
+    assert len(invocations) == 4
+    assert retry_policy.retry_stats['gave_up'] == 1
+
+
+def test_transient_error_reraised_after_max_retries():
+    call, invocations = make_call([Timeout()] * 4)
+    with pytest.raises(Timeout):
+        call_with_retry('get', call)
+    assert len(invocations) == 4
+
+
+def test_post_is_not_retried():
+    call, invocations = make_call([ConnectionError()])
+    with pytest.raises(ConnectionError):
+        call_with_retry('post', call)
+    assert len(invocations) == 1
+
+
+def test_client_error_is_not_retried():
+    call, invocations = make_call([FakeResponse(404)])
+    assert call_with_retry('get', call).status_code == 404
+    assert len(invocations) == 1
+
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker("shanoir.test", failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.nb_rejected == 1
+
+
+def test_breaker_success_resets_failures():
+    breaker = CircuitBreaker("shanoir.test", failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_breaker_half_open_lets_a_single_probe():
+    breaker = CircuitBreaker("shanoir.test", failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    breaker.opened_at = time.monotonic() - 61
+
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_breaker_failed_probe_reopens():
+    breaker = CircuitBreaker("shanoir.test", failure_threshold=3, reset_timeout=60)
+    breaker.state = HALF_OPEN
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+
+def test_breaker_cancelled_probe_frees_the_slot():
+    breaker = CircuitBreaker("shanoir.test", failure_threshold=1, reset_timeout=60)
+    breaker.state = HALF_OPEN
+    breaker.before_call()
+    breaker.cancel_call()
+    breaker.before_call()
+
+
+def test_open_breaker_rejects_without_calling():
+    retry_policy.get_circuit_breaker("shanoir.test").state = OPEN
+    retry_policy.get_circuit_breaker("shanoir.test").opened_at = time.monotonic()
+    call, invocations = make_call([FakeResponse(200)])
+    with pytest.raises(CircuitOpenError):
+        call_with_retry('get', call)
+    assert not invocations
+
+
+def test_unexpected_error_does_not_count_as_failure():
+    call, invocations = make_call([ValueError("bad payload")])
+    with pytest.raises(ValueError):
+        call_with_retry('get', call)
+    assert retry_policy.get_circuit_breaker("shanoir.test").nb_failures == 0
+
+
+def test_async_retry_releases_discarded_responses(monkeypatch):
+    async def no_sleep(delay):
+        pass
+
+    monkeypatch.setattr(retry_policy.asyncio, "sleep", no_sleep)
+    responses = [FakeResponse(503), FakeResponse(200)]
+    call, invocations = make_call(responses)
+
+    async def async_call():
+        return call()
+
+    response = asyncio.run(call_with_retry_async('get', async_call))
+    assert response.status_code == 200
+    assert responses[0].released
+    assert not responses[1].released
+
+
+def test_async_transient_errors(monkeypatch):
+    async def no_sleep(delay):
+        pass
+
+    monkeypatch.setattr(retry_policy.asyncio, "sleep", no_sleep)
+    call, invocations = make_call([asyncio.TimeoutError(), FakeResponse(200)])
+
+    async def async_call():
+        return call()
+
+    response = asyncio.run(call_with_retry_async('get', async_call, transient_errors=(asyncio.TimeoutError,)))
+    assert response.status_code == 200
+    assert len(invocations) == 2
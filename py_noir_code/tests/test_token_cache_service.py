@@ -0,0 +1,51 @@
+import os
+import stat
+import threading
+
+import pytest
+
+import py_noir_code.src.security.token_cache_service as token_cache_service
+from py_noir_code.src.security.token_cache_service import clear_cached_tokens, load_cached_tokens, \
+    read_token_cache, save_cached_tokens, write_token_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_path(tmp_path, monkeypatch) -> str:
+    path = str(tmp_path / "cache" / "token_cache.json")
+    monkeypatch.setattr(token_cache_service, "TOKEN_CACHE_PATH", path)
+    return path
+
+
+def test_save_load_clear():
+    assert load_cached_tokens("shanoir.test", "user") == (None, None)
+    save_cached_tokens("shanoir.test", "user", "access", "refresh")
+    assert load_cached_tokens("shanoir.test", "user") == ("access", "refresh")
+    assert load_cached_tokens("other.test", "user") == (None, None)
+    clear_cached_tokens("shanoir.test", "user")
+    assert load_cached_tokens("shanoir.test", "user") == (None, None)
+
+
+def test_cache_readable_by_its_user_only(cache_path):
+    save_cached_tokens("shanoir.test", "user", "access", "refresh")
+    assert stat.S_IMODE(os.stat(cache_path).st_mode) == 0o600
+    assert os.listdir(os.path.dirname(cache_path)) == ["token_cache.json"]
+
+
+def test_concurrent_writers_leave_a_complete_file(cache_path):
+    # each thread stands for a process writing its own tokens, without the process lock
+    errors = []
+
+    def write(index: int):
+        try:
+            for _ in range(50):
+                write_token_cache({"user%s@shanoir.test" % index: dict(refresh_token="x" * 1000 * (index + 1))})
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(index,)) for index in range(8)]
+    [thread.start() for thread in threads]
+    [thread.join() for thread in threads]
+
+    assert errors == []
+    assert len(read_token_cache()) == 1
+    assert os.listdir(os.path.dirname(cache_path)) == ["token_cache.json"]
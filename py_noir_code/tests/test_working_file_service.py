@@ -0,0 +1,86 @@
+import json
+import os
+
+import pytest
+
+from py_noir_code.src.execution.execution_context import ExecutionContext
+from py_noir_code.src.execution.working_file_service import COMPACT_FORMAT, GZIP_MAGIC, TOKEN_FIELD, get_template, \
+    pack_items, read_document, read_working_file, unpack_items, update_working_file_token, write_working_file
+
+
+def make_items() -> list:
+    header = dict(nb_processed_items=0, processed_item_ids=[])
+    items = [dict(identifier=identifier, name="exam_%s" % identifier, pipelineIdentifier="comete_brain_flair/1.3",
+                  datasetParameters=[{"name": "flair_archive", "datasetIds": [identifier]}], studyIdentifier=5,
+                  refreshToken="token") for identifier in range(3)]
+    return [header] + items
+
+
+def test_template_holds_the_shared_fields():
+    template = get_template(make_items()[1:])
+    assert template == dict(pipelineIdentifier="comete_brain_flair/1.3", studyIdentifier=5, refreshToken="token")
+    assert get_template([]) == {}
+
+
+def test_template_drops_fields_missing_from_an_item():
+    items = make_items()[1:]
+    del items[2]["studyIdentifier"]
+    assert "studyIdentifier" not in get_template(items)
+
+
+def test_pack_stores_the_token_once_and_the_deltas():
+    document = pack_items(make_items())
+    assert document["format"] == COMPACT_FORMAT
+    assert document[TOKEN_FIELD] == "token"
+    assert TOKEN_FIELD not in document["template"]
+    assert document["items"][1] == dict(identifier=1, name="exam_1",
+                                        datasetParameters=[{"name": "flair_archive", "datasetIds": [1]}])
+
+
+def test_pack_unpack_round_trip():
+    items = make_items()
+    items[2]["refreshToken"] = "other token"
+    items[1]["attempts"] = 2
+    assert unpack_items(pack_items(items)) == items
+    assert unpack_items(pack_items(items[:1])) == items[:1]
+
+
+def test_former_list_format_is_read_as_is():
+    items = make_items()
+    assert unpack_items(items) is items
+
+
+def test_newer_format_is_rejected():
+    document = pack_items(make_items())
+    document["version"] += 1
+    with pytest.raises(ValueError):
+        unpack_items(document)
+
+
+@pytest.mark.parametrize("compression", ["none", "gzip"])
+def test_write_read_round_trip(tmp_path, monkeypatch, compression):
+    monkeypatch.setattr(ExecutionContext, "working_file_compression", compression)
+    file_name = str(tmp_path / "working.json")
+    write_working_file(file_name, make_items())
+    with open(file_name, "rb") as working_file:
+        assert working_file.read().startswith(GZIP_MAGIC) == (compression == "gzip")
+    assert read_working_file(file_name) == make_items()
+    # no temporary file left next to the working file
+    assert os.listdir(str(tmp_path)) == ["working.json"]
+
+
+def test_update_token_of_a_compact_file(tmp_path):
+    file_name = str(tmp_path / "working.json")
+    write_working_file(file_name, make_items())
+    update_working_file_token(file_name, "new token")
+    assert read_document(file_name)[TOKEN_FIELD] == "new token"
+    assert all(item[TOKEN_FIELD] == "new token" for item in read_working_file(file_name)[1:])
+
+
+def test_update_token_converts_a_former_file(tmp_path):
+    file_name = str(tmp_path / "working.json")
+    with open(file_name, "w") as working_file:
+        json.dump(make_items(), working_file)
+    update_working_file_token(file_name, "new token")
+    assert read_document(file_name)["format"] == COMPACT_FORMAT
+    assert all(item[TOKEN_FIELD] == "new token" for item in read_working_file(file_name)[1:])